@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from backend.services.analytics_service import analytics_service
+
+router = APIRouter()
+
+def _parse_run_ids(run_ids: Optional[str]):
+    if not run_ids:
+        return None
+    try:
+        return [int(r) for r in run_ids.split(",") if r.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="run_ids must be a comma-separated list of integers")
+
+@router.get("/analytics/sources")
+def source_distribution(run_ids: Optional[str] = None):
+    """Leads, average score and high-priority count per source"""
+    ids = _parse_run_ids(run_ids)
+    try:
+        return {"backend": analytics_service.backend, "sources": analytics_service.source_distribution(ids)}
+    except Exception as e:
+        print(f"Analytics Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/conversion-by-priority")
+def conversion_by_priority(run_ids: Optional[str] = None):
+    """Actual conversion rate for each predicted priority"""
+    ids = _parse_run_ids(run_ids)
+    try:
+        return {"backend": analytics_service.backend, "priorities": analytics_service.conversion_by_priority(ids)}
+    except Exception as e:
+        print(f"Analytics Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/score-histogram")
+def score_histogram(bins: int = Query(10, ge=2, le=100), run_ids: Optional[str] = None):
+    """Score distribution per run, for histograms over time"""
+    ids = _parse_run_ids(run_ids)
+    try:
+        return {"backend": analytics_service.backend, "bins": bins, "histogram": analytics_service.score_histogram(bins, ids)}
+    except Exception as e:
+        print(f"Analytics Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
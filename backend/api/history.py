@@ -1,5 +1,10 @@
-from fastapi import APIRouter, HTTPException
-from backend.core.database import get_prediction_history, get_leads_by_run
+from fastapi import APIRouter, HTTPException, Header, Query
+from typing import Optional
+from backend.core.database import get_prediction_history, get_prediction_run, get_leads_page, compare_runs, get_run_top_leads
+from backend.services.serialization_service import negotiate_format, render
+from backend.services.persistence_service import persistence_writer
+from backend.services.retention_service import retention_service
+from backend.services.insight_service import insight_service
 
 router = APIRouter()
 
@@ -8,7 +13,7 @@ async def get_history():
     """Get all prediction runs"""
     try:
         history = get_prediction_history()
-        
+
 
 
         return {"history": history}
@@ -16,58 +21,169 @@ async def get_history():
         print(f"History Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/prediction-history/{run_id}")
-async def get_prediction_by_run(run_id: int):
-    """Get detailed results from a specific prediction run"""
+@router.get("/prediction-history/{run_id}/status")
+async def get_run_status(run_id: int):
+    """Persistence status of a run: pending, complete or failed"""
+    run_metadata = get_prediction_run(run_id)
+    if not run_metadata:
+        raise HTTPException(status_code=404, detail="Prediction run not found")
+    return {
+        "run_id": run_id,
+        "persist_status": run_metadata.get('persist_status'),
+        "queued_chunks": persistence_writer.pending_chunks()
+    }
+
+@router.get("/prediction-history/{run_id}/insights")
+async def get_run_insights(run_id: int):
+    """LLM insights for a run's top leads (filled in by a background stage after scoring)"""
+    run_metadata = get_prediction_run(run_id)
+    if not run_metadata:
+        raise HTTPException(status_code=404, detail="Prediction run not found")
+    top_leads = get_run_top_leads(run_id) or []
+    return {
+        "run_id": run_id,
+        "status": insight_service.get_status(run_id) or ("complete" if any("insight" in e for e in top_leads) else None),
+        "leads": [e for e in top_leads if "insight" in e]
+    }
+
+@router.post("/prediction-history/{run_id}/restore")
+def restore_run(run_id: int):
+    """Bring an archived run's leads back into the database"""
     try:
+        restored = retention_service.restore_run(run_id)
+        return {"run_id": run_id, "restored_leads": restored}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"Restore Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/prediction-history/{run_id}/compare/{other_run_id}")
+async def compare_prediction_runs(
+    run_id: int,
+    other_run_id: int,
+    limit: int = Query(100, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+    sort: str = "abs_delta",
+    status: Optional[str] = Query(None, pattern="^(new|vanished|changed|unchanged)$"),
+    from_priority: Optional[str] = None,
+    to_priority: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    fmt: Optional[str] = Query(None, alias="format")
+):
+    """
+    What changed between two runs (run_id is the baseline), joined by LeadID.
+    Sort by abs_delta, delta_desc, delta_asc or lead_id; filter by status or
+    by a priority migration (from_priority=High&to_priority=Low).
+    """
+    out_format = negotiate_format(accept, fmt)
+    runs = {}
+    for rid in (run_id, other_run_id):
+        runs[rid] = get_prediction_run(rid)
+        if not runs[rid]:
+            raise HTTPException(status_code=404, detail=f"Prediction run {rid} not found")
+        if runs[rid].get('archived_at'):
+            raise HTTPException(status_code=409, detail=f"Run {rid} is archived. POST /prediction-history/{rid}/restore to load it.")
 
-        # Get run metadata first
-        history = get_prediction_history()
-        run_metadata = next((h for h in history if h['run_id'] == run_id), None)
-        
+    try:
+        changes, summary = compare_runs(
+            run_id, other_run_id, limit=limit, offset=offset, sort=sort,
+            status=status, from_priority=from_priority, to_priority=to_priority
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Compare Runs Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return render({
+        "base_run": {"run_id": run_id, "filename": runs[run_id].get('filename'), "timestamp": runs[run_id].get('timestamp')},
+        "other_run": {"run_id": other_run_id, "filename": runs[other_run_id].get('filename'), "timestamp": runs[other_run_id].get('timestamp')},
+        "summary": summary,
+        "changes": changes,
+        "next_offset": offset + limit if len(changes) == limit else None
+    }, out_format, rows_key="changes")
+
+def _prediction_accuracy(priority, actual_converted):
+    try:
+        actual = int(actual_converted) == 1
+    except (TypeError, ValueError):
+        return None  # missing or blank (fillna("")) actuals
+    if priority == "High" and actual: return "correct"
+    elif priority == "Low" and not actual: return "correct"
+    elif priority == "High" and not actual: return "false_positive"
+    elif priority == "Low" and actual: return "missed"
+    return "medium"
+
+def _format_lead(lead):
+    """Shape a stored lead the way the dashboard expects"""
+    raw_data = lead.get('raw_data')
+    score = round(lead.get('prediction_score') or 0, 2)
+    priority = lead.get('priority') or 'Unknown'
+
+    if isinstance(raw_data, dict):
+        # Full row: flatten the original CSV fields (raw_data is already a fresh dict)
+        actual = raw_data.get('Converted') if 'Converted' in raw_data else raw_data.get('converted')
+        raw_data["score"] = score
+        raw_data["priority"] = priority
+        raw_data["explanation"] = lead.get('explanation')
+        raw_data["actual_converted"] = actual
+        raw_data["prediction_accuracy"] = _prediction_accuracy(priority, actual)
+        return raw_data
+
+    # Summary row: only the indexed hot columns
+    return {
+        "LeadID": lead.get('lead_id'),
+        "Source": lead.get('source') or 'Unknown',
+        "score": score,
+        "priority": priority,
+        "explanation": lead.get('explanation')
+    }
+
+@router.get("/prediction-history/{run_id}")
+async def get_prediction_by_run(
+    run_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=50000),
+    cursor: Optional[str] = None,
+    include_raw: bool = True,
+    accept: Optional[str] = Header(None),
+    fmt: Optional[str] = Query(None, alias="format")
+):
+    """
+    Get detailed results from a specific prediction run.
+    Pass limit (and the returned next_cursor) to page through large runs,
+    and include_raw=false to skip decoding the original CSV fields.
+    """
+    out_format = negotiate_format(accept, fmt)
+    try:
+        # Indexed single-run lookup
+        run_metadata = get_prediction_run(run_id)
         if not run_metadata:
             raise HTTPException(status_code=404, detail="Prediction run not found")
-            
-        # Get the leads for this run
-        leads = get_leads_by_run(run_id)
-        
-        # Transform the data to match the expected format
-        results = []
-        for lead in leads:
-            # Extract raw data if available
-            raw_data = lead.get('raw_data', {})
-            if isinstance(raw_data, dict):
-                lead_item = {
-                    **raw_data,
-                    "score": round(lead.get('prediction_score', 0), 2),
-                    "priority": lead.get('priority', 'Unknown'),
-                    "actual_converted": raw_data.get('Converted') if 'Converted' in raw_data else (raw_data.get('converted') if 'converted' in raw_data else None),
-                    "prediction_accuracy": None 
-                }
-                
-                # Re-calculate accuracy if needed for UI
-                if lead_item["actual_converted"] is not None:
-                    actual = int(lead_item["actual_converted"]) == 1
-                    prio = lead_item["priority"]
-                    if prio == "High" and actual: lead_item["prediction_accuracy"] = "correct"
-                    elif prio == "Low" and not actual: lead_item["prediction_accuracy"] = "correct"
-                    elif prio == "High" and not actual: lead_item["prediction_accuracy"] = "false_positive"
-                    elif prio == "Low" and actual: lead_item["prediction_accuracy"] = "missed"
-                    else: lead_item["prediction_accuracy"] = "medium"
-            else:
-                lead_item = {
-                    "score": round(lead.get('prediction_score', 0), 2),
-                    "priority": lead.get('priority', 'Unknown'),
-                    "Source": lead.get('source', 'Unknown')
-                }
-            results.append(lead_item)
-        
-        return {
+        if run_metadata.get('archived_at'):
+            raise HTTPException(status_code=409, detail=f"Run {run_id} is archived. POST /prediction-history/{run_id}/restore to load it.")
+
+        try:
+            leads, next_cursor = get_leads_page(run_id, limit=limit, cursor=cursor, include_raw=include_raw)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        results = [_format_lead(lead) for lead in leads]
+
+        return render({
             "run_id": run_id,
             "filename": run_metadata.get('filename', 'Unknown'),
             "timestamp": run_metadata.get('timestamp'),
             "results": results,
+            "next_cursor": next_cursor,
+            # Whole-run counts, so a first page can be summarised without the rest
+            "total_leads": run_metadata.get('total_leads'),
+            "distribution": {
+                "High": run_metadata.get('high_priority_count') or 0,
+                "Medium": run_metadata.get('medium_priority_count') or 0,
+                "Low": run_metadata.get('low_priority_count') or 0
+            },
+            "persist_status": run_metadata.get('persist_status'),
             "has_actual_data": run_metadata.get('has_actual_data', False),
             "accuracy_metrics": {
                 "overall_accuracy": run_metadata.get('accuracy'),
@@ -78,7 +194,7 @@ async def get_prediction_by_run(run_id: int):
                 "precision_k": run_metadata.get('precision_at_k'),
                 "recall_k": run_metadata.get('recall_at_k')
             } if run_metadata.get('accuracy') is not None else None
-        }
+        }, out_format)
     except HTTPException:
         raise
     except Exception as e:
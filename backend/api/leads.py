@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from backend.core.database import get_lead_profile, get_top_lead_profiles
+
+router = APIRouter()
+
+@router.get("/leads/top")
+async def top_leads(limit: int = Query(50, ge=1, le=1000), priority: Optional[str] = None):
+    """Highest current scores across all runs"""
+    try:
+        return {"leads": get_top_lead_profiles(limit=limit, priority=priority)}
+    except Exception as e:
+        print(f"Top Leads Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/leads/{lead_id}")
+async def lead_profile(lead_id: str):
+    """Current score, priority and score trend for one lead"""
+    profile = get_lead_profile(lead_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return profile
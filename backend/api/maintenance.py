@@ -0,0 +1,57 @@
+from fastapi import APIRouter, HTTPException
+from backend.core.database import get_db_size_bytes
+from backend.services.retention_service import retention_service
+from backend.services.cache_service import cache_service
+from backend.cache.chat_cache import semantic_chat_cache
+from backend.llm.scheduler import llm_scheduler
+from backend.services.llm_service import get_prompt_cache_stats
+
+router = APIRouter()
+
+@router.post("/maintenance/retention")
+def run_retention():
+    """Archive runs outside the retention policy and reclaim space now"""
+    try:
+        return retention_service.apply()
+    except Exception as e:
+        print(f"Retention Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/maintenance/vacuum/enable-incremental")
+def enable_incremental_vacuum():
+    """
+    One-time full VACUUM that switches an older database to incremental
+    auto-vacuum. Locks the database until it finishes: run it in a quiet window.
+    """
+    try:
+        vacuumed = retention_service.ensure_incremental_vacuum()
+        return {"incremental_vacuum": True, "vacuumed": vacuumed,
+                "db_size_mb": round(get_db_size_bytes() / (1024 * 1024), 2)}
+    except Exception as e:
+        print(f"Vacuum Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/maintenance/storage")
+def storage_status():
+    """Database size and pending retention work"""
+    return {
+        "db_size_mb": round(get_db_size_bytes() / (1024 * 1024), 2),
+        "runs_due_for_archive": retention_service.select_runs_to_archive(),
+        "incremental_vacuum": retention_service.incremental_vacuum_enabled(),
+        "policy": {
+            "max_age_days": retention_service.max_age_days,
+            "max_runs": retention_service.max_runs,
+            "max_db_mb": retention_service.max_db_mb,
+            "notification_days": retention_service.notification_days
+        }
+    }
+
+@router.get("/maintenance/cache")
+def cache_status():
+    """Result cache hit/miss/eviction counters and L1 memory use, plus the semantic chat cache"""
+    return {**cache_service.get_stats(), "chat_semantic": semantic_chat_cache.get_stats()}
+
+@router.get("/maintenance/llm")
+def llm_status():
+    """LLM scheduler (slots in use, queue lengths, timeouts, average wait/run times) and prompt caches"""
+    return {**llm_scheduler.get_stats(), "prompt_cache": get_prompt_cache_stats()}
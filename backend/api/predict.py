@@ -1,4 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
 import os
 from backend.core.schemas import PredictRequest
 from backend.core.config import UPLOAD_DIR
@@ -6,11 +8,15 @@ from backend.services.csv_service import read_csv_safe
 from backend.services.prediction_orchestrator import orchestrate_prediction
 from backend.services.ml_service import ml_service
 from backend.services.explainability_service import ExplainabilityService
+from backend.services.serialization_service import negotiate_format, render
 
 router = APIRouter()
 
 @router.post("/predict")
-async def predict_leads(request: PredictRequest):
+async def predict_leads(request: PredictRequest, accept: Optional[str] = Header(None), fmt: Optional[str] = Query(None, alias="format")):
+    # Resolve the wire format up front so a bad ?format= fails before scoring
+    out_format = negotiate_format(accept, fmt)
+
     file_path = os.path.join(UPLOAD_DIR, request.filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
@@ -24,7 +30,9 @@ async def predict_leads(request: PredictRequest):
         if not ml_service:
              raise HTTPException(status_code=503, detail="ML Service unavailable")
 
-        result = orchestrate_prediction(df, request.filename)
+        # Scoring and the persistence enqueue (which blocks while the write queue
+        # is full) run off the event loop
+        result = await run_in_threadpool(orchestrate_prediction, df, request.filename)
         
         # 3. Explainability (Optional)
         if request.explain and ml_service.get_model():
@@ -55,12 +63,16 @@ async def predict_leads(request: PredictRequest):
                     processed_row = processed_row[features]
                     
                     explanation_image = ExplainabilityService.explain_prediction(processed_row, features)
-                    result["explanation_image"] = explanation_image
+                    # New dict: result may be the cached object (shared with L1 and LATEST_ANALYSIS_RESULT)
+                    result = {**result, "explanation_image": explanation_image}
                  except Exception as e:
                      print(f"Explain failed: {e}")
 
-        return result
+        return render(result, out_format)
         
+    except HTTPException:
+        # 406 from the encoders, 503 above: not orchestration errors
+        raise
     except Exception as e:
         print(f"Orchestration Error: {e}")
         import traceback
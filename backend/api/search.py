@@ -1,16 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from backend.core.database import search_leads
 
 router = APIRouter()
 
 @router.get("/search")
-async def search_endpoint(q: str):
-    """Search leads"""
+def search_endpoint(q: str, limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """Search leads (ranked, paginated with limit/offset)"""
     try:
-        results = search_leads(q)
+        # Fetch one extra row to know whether another page exists
+        results = search_leads(q, limit=limit + 1, offset=offset)
+        has_more = len(results) > limit
         formatted_results = []
-        for lead in results:
-             raw_data = lead.get('raw_data', {})
+        for lead in results[:limit]:
+             raw_data = lead.get('raw_data') or {}
+             if not isinstance(raw_data, dict):
+                 raw_data = {}
              formatted = {
                  "id": lead.get('id'),
                  "lead_id": lead.get('lead_id'),
@@ -20,7 +24,10 @@ async def search_endpoint(q: str):
                  "company": raw_data.get('Company') or raw_data.get('company') or 'Unknown'
              }
              formatted_results.append(formatted)
-        return {"results": formatted_results}
+        return {
+            "results": formatted_results,
+            "next_offset": offset + limit if has_more else None
+        }
     except Exception as e:
         print(f"Search Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
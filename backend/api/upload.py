@@ -3,6 +3,7 @@ import os
 import shutil
 from backend.core.config import UPLOAD_DIR, MAX_FILE_SIZE
 from backend.services.csv_service import read_csv_safe
+from backend.services.analysis_service import AnalysisService
 
 router = APIRouter()
 
@@ -38,6 +39,9 @@ async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File
              
         columns = df.columns.tolist()
         preview = df.head().fillna("").to_dict(orient="records")
+
+        # Build the chat analysis context after the response is sent
+        background_tasks.add_task(AnalysisService.precompute_context, file_location, file.filename, df)
         
         return {"filename": file.filename, "columns": columns, "preview": preview}
     except HTTPException:
@@ -0,0 +1,133 @@
+"""
+Mixed read/write benchmark for core/database.py.
+
+Runs the same workload twice against a scratch database:
+  - legacy: a new rollback-journal connection per helper call (old behaviour)
+  - pooled: per-thread WAL connections with tuned pragmas (current behaviour)
+
+One writer thread keeps inserting 5,000-lead batches while reader threads hit
+the history/notification helpers, and read latency / throughput are reported.
+
+Usage (from the project root):
+    python -m backend.benchmarks.db_concurrency --seconds 10 --readers 4
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from backend.core import database
+
+
+def _legacy_connect():
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _fake_leads(run_id, n, offset=0):
+    return [{
+        "lead_data": {
+            "LeadID": f"L{offset + i}", "Source": ["Google", "Referral", "Organic"][i % 3],
+            "TimeOnSite": i % 600, "PagesVisited": i % 12, "EmailOpened": i % 2,
+            "MeetingBooked": i % 5 == 0, "Converted": i % 7 == 0
+        },
+        "prediction_score": (i % 100) / 100,
+        "priority": "High" if i % 100 >= 70 else "Low",
+        "run_id": run_id
+    } for i in range(n)]
+
+
+def run_workload(mode, seconds, readers, batch_size):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    database.DB_NAME = path
+    database.close_db_connection()
+
+    original_get = database.get_db_connection
+    if mode == "legacy":
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        database.get_db_connection = _legacy_connect
+
+    try:
+        database.init_db()
+        run_id = database.save_prediction_run("bench.csv", 0, 0, 0, 0)
+        database.save_leads_batch(_fake_leads(run_id, batch_size))
+
+        stop = threading.Event()
+        latencies = []
+        lat_lock = threading.Lock()
+        written = [0]
+        errors = [0]
+
+        def writer():
+            offset = batch_size
+            while not stop.is_set():
+                database.save_leads_batch(_fake_leads(run_id, batch_size, offset))
+                database.create_notification("info", "bench batch")
+                offset += batch_size
+                written[0] += batch_size
+            database.close_db_connection()
+
+        def reader():
+            local = []
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    database.get_recent_leads(50)
+                    database.get_prediction_history()
+                    database.get_notifications(limit=10)
+                except sqlite3.OperationalError:
+                    errors[0] += 1
+                local.append(time.perf_counter() - t0)
+            with lat_lock:
+                latencies.extend(local)
+            database.close_db_connection()
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        database.get_db_connection = original_get
+        database.close_db_connection()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    return {
+        "mode": mode,
+        "reads_per_s": len(latencies) / seconds,
+        "read_p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "read_p95_ms": p95 * 1000,
+        "rows_written_per_s": written[0] / seconds,
+        "lock_errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'reads/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'rows/s':>10} {'lock errs':>10}")
+    for mode in ("legacy", "pooled"):
+        r = run_workload(mode, args.seconds, args.readers, args.batch_size)
+        print(f"{r['mode']:<8} {r['reads_per_s']:>10.1f} {r['read_p50_ms']:>9.2f} {r['read_p95_ms']:>9.2f} "
+              f"{r['rows_written_per_s']:>10.0f} {r['lock_errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Run-detail and recent-leads latency as the leads table grows.
+
+Fills a scratch database in steps (many runs of --run-size leads each) and, at
+every step, times the two hot queries with and without the schema indexes
+(`NOT INDEXED` forces the old full-scan plan on the same data).
+
+Usage (from the project root):
+    python -m backend.benchmarks.run_detail_latency --sizes 100000,1000000,10000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from backend.core.migrations import migrate
+
+RUN_DETAIL_SQL = 'SELECT * FROM leads {hint} WHERE run_id = ? ORDER BY prediction_score DESC'
+RECENT_SQL = 'SELECT * FROM leads {hint} ORDER BY created_at DESC LIMIT 50'
+
+
+def _fill(conn, start_rows, end_rows, run_size):
+    sources = ["Google", "Referral", "Organic", "LinkedIn", "Email"]
+    rows = start_rows
+    while rows < end_rows:
+        n = min(run_size, end_rows - rows)
+        cur = conn.execute("INSERT INTO prediction_runs (filename, total_leads) VALUES ('bench.csv', ?)", (n,))
+        run_id = cur.lastrowid
+        conn.executemany('''
+            INSERT INTO leads (run_id, lead_id, source, time_on_site, pages_visited, prediction_score, priority, raw_data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ((run_id, f"L{i}", sources[i % 5], i % 600, i % 12, random.random(), "Low", '{"LeadID":"L%d"}' % i)
+              for i in range(n)))
+        conn.commit()
+        rows += n
+    return rows
+
+
+def _time(conn, sql, params, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000", help="Comma-separated table sizes to measure at")
+    parser.add_argument("--run-size", type=int, default=20000, help="Leads per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrate(conn)
+
+    print(f"{'rows':>12} {'run detail scan':>16} {'run detail idx':>15} {'recent scan':>12} {'recent idx':>11}  (ms)")
+    rows = 0
+    try:
+        for size in sizes:
+            rows = _fill(conn, rows, size, args.run_size)
+            conn.execute("ANALYZE")
+            run_id = random.randint(1, conn.execute("SELECT MAX(run_id) FROM prediction_runs").fetchone()[0])
+
+            detail_scan = _time(conn, RUN_DETAIL_SQL.format(hint="NOT INDEXED"), (run_id,), args.repeat)
+            detail_idx = _time(conn, RUN_DETAIL_SQL.format(hint=""), (run_id,), args.repeat)
+            recent_scan = _time(conn, RECENT_SQL.format(hint="NOT INDEXED"), (), args.repeat)
+            recent_idx = _time(conn, RECENT_SQL.format(hint=""), (), args.repeat)
+            print(f"{rows:>12,} {detail_scan:>16.1f} {detail_idx:>15.1f} {recent_scan:>12.1f} {recent_idx:>11.2f}")
+    finally:
+        conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
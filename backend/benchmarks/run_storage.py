@@ -0,0 +1,84 @@
+"""
+JSON-per-row vs columnar run storage.
+
+Stores the same synthetic run both ways in scratch databases and reports disk
+use, write time and full run-detail read time (rows decoded back to dicts).
+
+Usage (from the project root):
+    python -m backend.benchmarks.run_storage --rows 100000 --columns 20
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from backend.core import database, run_store
+
+
+def _fake_run(rows, columns):
+    sources = ["Google", "Referral", "Organic", "LinkedIn", "Email"]
+    leads = []
+    for i in range(rows):
+        lead_data = {"LeadID": f"L{i}", "Source": sources[i % 5], "TimeOnSite": i % 600, "PagesVisited": i % 12}
+        for c in range(columns - 4):
+            lead_data[f"Feature_{c}"] = (i * (c + 1)) % 97 if c % 2 else ["a", "b", "c"][i % 3]
+        leads.append({"lead_data": lead_data, "prediction_score": (i % 1000) / 1000, "priority": "Low", "row_idx": i})
+    return leads
+
+
+def _measure(columnar, leads, workdir):
+    database.DB_NAME = os.path.join(workdir, "columnar.db" if columnar else "json.db")
+    run_store.RUN_STORE_DIR = os.path.join(workdir, "runs")
+    database.close_db_connection()
+    database.init_db()
+
+    run_id = database.save_prediction_run("bench.csv", len(leads), 0, 0, 0)
+    for item in leads:
+        item["run_id"] = run_id
+
+    t0 = time.perf_counter()
+    conn = database.get_db_connection()
+    if columnar:
+        path = run_store.write_run_payload(run_id, [item["lead_data"] for item in leads])
+        database.set_run_payload_path(run_id, path)
+    database.insert_leads(conn, leads, store_raw=not columnar)
+    conn.commit()
+    write_s = time.perf_counter() - t0
+
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    t0 = time.perf_counter()
+    rows = database.get_leads_by_run(run_id)
+    read_s = time.perf_counter() - t0
+    assert len(rows) == len(leads) and isinstance(rows[0]["raw_data"], dict)
+
+    size = os.path.getsize(database.DB_NAME)
+    if columnar:
+        size += os.path.getsize(path)
+    database.close_db_connection()
+    return size, write_s, read_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=20)
+    args = parser.parse_args()
+
+    if not run_store.RUN_STORE_AVAILABLE:
+        print("pyarrow is not installed; columnar storage is unavailable.")
+        return
+
+    leads = _fake_run(args.rows, args.columns)
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'storage':<10} {'disk MB':>9} {'write s':>9} {'read s':>9}")
+        for columnar in (False, True):
+            size, write_s, read_s = _measure(columnar, leads, workdir)
+            print(f"{'columnar' if columnar else 'json':<10} {size / 1e6:>9.1f} {write_s:>9.2f} {read_s:>9.2f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,31 @@
 import hashlib
 import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from backend.core.config import CHAT_SEMANTIC_THRESHOLD, CHAT_SEMANTIC_MAX_ENTRIES, CHAT_SEMANTIC_MAX_SCOPES
 from .redis_client import get_redis
 
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+# Words that flip or narrow what a question asks while barely moving its embedding,
+# mapped to one token per meaning so synonyms ("top" / "best") still share a guard
+_GUARD_WORDS = {
+    "high": "high", "hot": "high",
+    "medium": "medium", "warm": "medium",
+    "low": "low", "cold": "low",
+    "top": "top", "best": "top", "highest": "top", "most": "top", "greatest": "top",
+    "bottom": "bottom", "worst": "bottom", "lowest": "bottom", "least": "bottom",
+    "first": "first", "last": "last",
+    "not": "not", "no": "not", "non": "not", "without": "not", "except": "not", "excluding": "not",
+    "converted": "converted", "won": "converted",
+    "unconverted": "unconverted", "lost": "unconverted",
+    "above": ">", "over": ">", "more": ">", ">": ">", ">=": ">=",
+    "below": "<", "under": "<", "less": "<", "fewer": "<", "<": "<", "<=": "<=",
+}
+
 class ChatCache:
     TTL = 3600 * 24 # 24 Hours cache
     
@@ -23,7 +47,7 @@ class ChatCache:
             val = r.get(key)
             if val:
                 print("⚡ Cache Hit for chat query")
-                return val
+                return val.decode("utf-8")
         except Exception as e:
             print(f"Cache Read Error: {e}")
             return None
@@ -38,3 +62,144 @@ class ChatCache:
             r.setex(key, ChatCache.TTL, response)
         except Exception as e:
             print(f"Cache Write Error: {e}")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace ("Top leads??" -> "top leads")"""
+    text = re.sub(r"[^\w\s.%<>=]", " ", str(text).lower())  # keep comparisons: "> 0.5" != "< 0.5"
+    return " ".join(text.replace(". ", " ").rstrip(".").split())
+
+
+def query_guard(norm: str, vocabulary=()) -> tuple:
+    """
+    What two similar queries must share for one's answer to serve the other:
+    the numbers, the guard words, and any dataset values (vocabulary, e.g.
+    source names) they mention. "high priority" vs "low priority" or "google"
+    vs "linkedin" embed close together but are different questions; guard
+    words are compared by meaning, so "top" and "best" match.
+    """
+    terms = {_GUARD_WORDS[w] for w in norm.split() if w in _GUARD_WORDS}
+    padded = f" {norm} "
+    terms.update(v for v in vocabulary if f" {v} " in padded)
+    return tuple(_NUMBER_RE.findall(norm)), frozenset(terms)
+
+
+class SemanticChatCache:
+    """
+    In-process cache of LLM chat answers looked up by meaning, not bytes.
+
+    Queries are normalized and embedded with the all-MiniLM-L6-v2 model that
+    RAGService already loads; unit vectors make the dot product the cosine
+    similarity. Entries live in a small per-scope matrix (scope = dataset
+    fingerprint, e.g. the uploaded file's hash), so answers never leak across
+    datasets. A cached answer is returned when its query is at least
+    `threshold` similar AND has the same guard (see query_guard): same
+    numbers ("top 5" != "top 10"), direction/priority/negation words and
+    dataset values ("google" != "linkedin").
+
+    Scopes are LRU-bounded (max_scopes), each holds at most max_entries.
+    """
+    def __init__(self, threshold: float = CHAT_SEMANTIC_THRESHOLD, max_entries: int = CHAT_SEMANTIC_MAX_ENTRIES,
+                 max_scopes: int = CHAT_SEMANTIC_MAX_SCOPES, ttl: int = ChatCache.TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self.ttl = ttl
+        self._scopes: "OrderedDict[str, dict]" = OrderedDict()  # scope -> {"vectors": (n, d) array, "entries": [...]}
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "lookup_ms_total": 0.0, "hit_similarity_total": 0.0}
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            from backend.services.rag_service import rag_service
+        except Exception:
+            return None
+        if getattr(rag_service, "model", None) is None:
+            return None
+        vec = rag_service.model.encode([text], normalize_embeddings=True)[0]
+        return np.asarray(vec, dtype="float32")
+
+    def lookup(self, query: str, scope: str, vocabulary=()):
+        """
+        Returns (answer or None, query embedding). Pass the embedding back to
+        store() on a miss so the query isn't embedded twice. vocabulary: the
+        dataset's categorical values, lowercased (see query_guard).
+        """
+        start = time.perf_counter()
+        norm = normalize_query(query)
+        guard = query_guard(norm, vocabulary)
+        vec = self._embed(norm)
+        answer, similarity = None, None
+
+        if vec is not None:
+            now = time.time()
+            with self._lock:
+                bucket = self._scopes.get(scope)
+                if bucket is not None:
+                    self._scopes.move_to_end(scope)
+                    sims = bucket["vectors"] @ vec
+                    for idx in np.argsort(-sims)[:5]:
+                        if sims[idx] < self.threshold:
+                            break
+                        entry_guard, response, expires_at = bucket["entries"][idx]
+                        if expires_at > now and entry_guard == guard:
+                            answer, similarity = response, float(sims[idx])
+                            break
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["lookup_ms_total"] += (time.perf_counter() - start) * 1000
+            if answer is not None:
+                self.stats["hits"] += 1
+                self.stats["hit_similarity_total"] += similarity
+            else:
+                self.stats["misses"] += 1
+        if answer is not None:
+            print(f"⚡ Semantic cache hit (similarity {similarity:.3f})")
+        return answer, vec
+
+    def store(self, query: str, scope: str, response: str, embedding: Optional[np.ndarray] = None,
+              vocabulary=()):
+        norm = normalize_query(query)
+        vec = embedding if embedding is not None else self._embed(norm)
+        if vec is None:
+            return
+        entry = (query_guard(norm, vocabulary), response, time.time() + self.ttl)
+
+        with self._lock:
+            bucket = self._scopes.get(scope)
+            if bucket is None:
+                bucket = {"vectors": np.empty((0, vec.shape[0]), dtype="float32"), "entries": []}
+                self._scopes[scope] = bucket
+                while len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+            self._scopes.move_to_end(scope)
+
+            # Drop expired entries and the oldest ones beyond capacity
+            now = time.time()
+            keep = [i for i, (_, _, expires_at) in enumerate(bucket["entries"]) if expires_at > now]
+            keep = keep[-(self.max_entries - 1):] if self.max_entries > 1 else []
+            bucket["vectors"] = np.vstack([bucket["vectors"][keep], vec[None, :]])
+            bucket["entries"] = [bucket["entries"][i] for i in keep] + [entry]
+            self.stats["stores"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats["lookups"]
+            hits = self.stats["hits"]
+            return {
+                "lookups": lookups,
+                "hits": hits,
+                "misses": self.stats["misses"],
+                "stores": self.stats["stores"],
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "avg_lookup_ms": round(self.stats["lookup_ms_total"] / lookups, 3) if lookups else None,
+                "avg_hit_similarity": round(self.stats["hit_similarity_total"] / hits, 4) if hits else None,
+                "scopes": len(self._scopes),
+                "entries": sum(len(b["entries"]) for b in self._scopes.values()),
+                "threshold": self.threshold
+            }
+
+
+# Global Instance
+semantic_chat_cache = SemanticChatCache()
@@ -0,0 +1,135 @@
+"""
+Binary encoding for cached results.
+
+A cached value is stored as a small JSON header plus N body chunks. For a dict
+with a row list (e.g. a prediction result's "results"), the header carries
+every other field, so a summary can be read without touching the leads. The
+rows are split into chunks of chunk_rows, each encoded and compressed on its
+own, which keeps single Redis values small.
+
+Codecs are pluggable: "msgpack+zstd" when both libraries are installed,
+plain "json" otherwise. The header names the codec that wrote the body, so
+readers decode whatever a writer used.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+HEADER_VERSION = 1
+
+
+def _to_builtin(obj):
+    # numpy scalars (counts, metrics) and anything else json/msgpack can't take
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+class JsonCodec:
+    name = "json"
+
+    def dumps(self, obj: Any) -> Tuple[bytes, int]:
+        data = json.dumps(obj, separators=(',', ':'), default=_to_builtin).encode("utf-8")
+        return data, len(data)
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackZstdCodec:
+    name = "msgpack+zstd"
+
+    def __init__(self, level: int = 3):
+        self.level = level
+
+    def dumps(self, obj: Any) -> Tuple[bytes, int]:
+        raw = msgpack.packb(obj, default=_to_builtin, use_bin_type=True)
+        return zstandard.compress(raw, self.level), len(raw)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(zstandard.decompress(data), raw=False)
+
+
+CODECS = {"json": JsonCodec()}
+if MSGPACK_AVAILABLE and ZSTD_AVAILABLE:
+    CODECS["msgpack+zstd"] = MsgpackZstdCodec()
+
+
+def get_codec(name: Optional[str] = None):
+    """Codec by name; defaults to the best one installed"""
+    if name and name in CODECS:
+        return CODECS[name]
+    return CODECS.get("msgpack+zstd", CODECS["json"])
+
+
+def encode_value(value: Any, codec=None, rows_key: str = "results",
+                 chunk_rows: int = 5000) -> Tuple[bytes, List[bytes], int]:
+    """
+    Returns (header, chunks, raw_size). raw_size is the uncompressed body
+    size, a fair estimate of the value's in-memory footprint.
+    """
+    codec = codec or get_codec()
+    rows = value.get(rows_key) if isinstance(value, dict) else None
+
+    if isinstance(rows, list):
+        summary = {k: v for k, v in value.items() if k != rows_key}
+        slices = [rows[i:i + chunk_rows] for i in range(0, len(rows), chunk_rows)]
+        header = {"v": HEADER_VERSION, "codec": codec.name, "rows_key": rows_key,
+                  "rows": len(rows), "chunks": len(slices), "summary": summary}
+    else:
+        slices = [value]
+        header = {"v": HEADER_VERSION, "codec": codec.name, "rows_key": None, "chunks": 1}
+
+    chunks, raw_size = [], 0
+    for part in slices:
+        data, size = codec.dumps(part)
+        chunks.append(data)
+        raw_size += size
+    # Readers refilling an in-process cache size the entry by this, not the compressed bytes
+    header["raw_size"] = raw_size
+
+    header_bytes = json.dumps(header, separators=(',', ':'), default=_to_builtin).encode("utf-8")
+    return header_bytes, chunks, raw_size + len(header_bytes)
+
+
+def parse_header(data: bytes) -> Optional[Dict[str, Any]]:
+    """Header dict, or None if data isn't a codec header (e.g. a legacy JSON value)"""
+    try:
+        header = json.loads(data)
+    except ValueError:
+        return None
+    if isinstance(header, dict) and header.get("v") == HEADER_VERSION and "codec" in header:
+        return header
+    return None
+
+
+def summary_from_header(header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Non-row fields of a chunked dict value, without decoding any chunk"""
+    return header.get("summary")
+
+
+def decode_value(header: Dict[str, Any], chunks: List[bytes]) -> Any:
+    codec = CODECS.get(header["codec"])
+    if codec is None:
+        raise ValueError(f"Cache codec '{header['codec']}' is not available")
+
+    if header.get("rows_key") is None:
+        return codec.loads(chunks[0])
+
+    rows = []
+    for data in chunks:
+        rows.extend(codec.loads(data))
+    value = dict(header["summary"])
+    value[header["rows_key"]] = rows
+    return value
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with per-entry TTLs and a byte budget.
+
+    Entries are evicted least-recently-used first whenever the total size
+    goes over max_bytes or the count over max_items; expired entries are
+    dropped when touched and swept on every write. Sizes are supplied by the
+    caller (e.g. the length of the entry's serialized form), so accounting
+    costs nothing extra on the hot path.
+
+    Values are returned as stored (no copy), so callers must not mutate them.
+    """
+    def __init__(self, max_bytes: int, max_items: int = 1024):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        # A single entry may take at most a quarter of the budget, so one
+        # huge result can't flush everything else out
+        self.max_entry_bytes = max_bytes // 4
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: str, value: Any, size: int, ttl: float) -> bool:
+        """Store value; returns False if it's too large for this cache"""
+        if size > self.max_entry_bytes:
+            self.stats["rejected"] += 1
+            return False
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            self._sweep_expired()
+            while self._data and (self._bytes > self.max_bytes or len(self._data) > self.max_items):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+        return True
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _sweep_expired(self):
+        now = time.monotonic()
+        expired = [k for k, (_, _, expires_at) in self._data.items() if expires_at <= now]
+        for k in expired:
+            self._remove(k)
+        self.stats["expirations"] += len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_items": self.max_items
+            }
@@ -1,45 +1,179 @@
-import redis
-import os
+import threading
 import time
+from typing import Any, Callable, Dict, List, Optional
+from backend.core.config import (
+    REDIS_URL, REDIS_CONNECT_TIMEOUT, REDIS_SOCKET_TIMEOUT, REDIS_MAX_CONNECTIONS,
+    REDIS_BACKOFF_BASE, REDIS_BACKOFF_MAX
+)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    print("⚠️ Redis library not installed. Caching falls back to in-memory.")
+
 
 class RedisClient:
-    _instance = None
-    _attempted = False
-    
-    @classmethod
-    def get_instance(cls):
-        # If we already have a connection, return it
-        if cls._instance:
-            return cls._instance
-            
-        # If we failed before, don't retry incessantly
-        if cls._attempted:
-            return None
-
-        # First attempt
-        cls._attempted = True
-        
-        # Use docker service name 'redis' by default
-        redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
+    """
+    The one Redis connection pool shared by every cache in the process.
+
+    Connects lazily (importing never blocks on Redis), with connect and
+    command timeouts. A circuit breaker wraps every call: after a failure the
+    circuit opens and callers get their default (cache bypassed) without
+    touching the network; after an exponentially growing backoff one probe
+    call is let through (half-open), which closes the circuit on success or
+    doubles the backoff on failure.
+
+    Values are bytes (decode_responses=False); text callers decode themselves.
+    """
+    def __init__(self, url: str = REDIS_URL, connect_timeout: float = REDIS_CONNECT_TIMEOUT,
+                 socket_timeout: float = REDIS_SOCKET_TIMEOUT, max_connections: int = REDIS_MAX_CONNECTIONS,
+                 backoff_base: float = REDIS_BACKOFF_BASE, backoff_max: float = REDIS_BACKOFF_MAX):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.socket_timeout = socket_timeout
+        self.max_connections = max_connections
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._client = None
+        self._lock = threading.Lock()
+        self._state = "closed"          # closed | open | half_open
+        self._failures = 0              # consecutive
+        self._retry_at = 0.0
+        self._probing = False
+        self.stats = {"calls": 0, "errors": 0, "short_circuited": 0, "circuit_opened": 0,
+                      "last_error": None, "last_success_at": None, "total_latency_ms": 0.0}
+
+    def _get_client(self):
+        if self._client is None:
+            pool = redis.ConnectionPool.from_url(
+                self.url,
+                socket_connect_timeout=self.connect_timeout,
+                socket_timeout=self.socket_timeout,
+                max_connections=self.max_connections,
+                health_check_interval=30
+            )
+            self._client = redis.Redis(connection_pool=pool)
+        return self._client
+
+    # --- Circuit breaker ---
+
+    @property
+    def healthy(self) -> bool:
+        """Circuit closed (last call succeeded); doesn't consume the half-open probe"""
+        return REDIS_AVAILABLE and self._state == "closed"
+
+    def available(self) -> bool:
+        """False while the circuit is open (cache should be bypassed)"""
+        if not REDIS_AVAILABLE:
+            return False
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if time.monotonic() < self._retry_at or self._probing:
+                return False
+            # Backoff elapsed: let a single probe through
+            self._state = "half_open"
+            self._probing = True
+            return True
+
+    def _record_success(self, latency: float):
+        with self._lock:
+            if self._state != "closed":
+                print(f"✅ Redis reachable again at {self.url}")
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+            self.stats["last_success_at"] = time.time()
+            self.stats["total_latency_ms"] += latency * 1000
+
+    def _record_failure(self, error: Exception):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(error)
+            backoff = min(self.backoff_base * (2 ** (self._failures - 1)), self.backoff_max)
+            self._retry_at = time.monotonic() + backoff
+            if self._state == "closed":
+                # Log the outage once, not on every failed probe
+                self.stats["circuit_opened"] += 1
+                msg = str(error)
+                if "not known" in msg or "Connection refused" in msg:
+                    print(f"ℹ️ Redis not available ({msg}). Caching bypassed, retrying in {backoff:.0f}s.")
+                else:
+                    print(f"⚠️ Redis error: {error}. Caching bypassed, retrying in {backoff:.0f}s.")
+            self._state = "open"
+
+    def execute(self, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        """
+        Run fn(client) through the breaker. Returns default (without raising)
+        when the circuit is open or the call fails.
+        """
+        if not self.available():
+            self.stats["short_circuited"] += 1
+            return default
+        self.stats["calls"] += 1
+        start = time.perf_counter()
         try:
-            # Short timeout to fail fast
-            client = redis.from_url(redis_url, decode_responses=True, socket_connect_timeout=1)
-            # Test connection
-            client.ping()
-            print(f"✅ Connected to Redis at {redis_url}")
-            cls._instance = client
+            result = fn(self._get_client())
         except Exception as e:
-            # Determine if we should log explicitly
-            # Simple "host not found" is expected in local dev without docker
-            msg = str(e)
-            if "not known" in msg or "Connection refused" in msg:
-                 print(f"ℹ️ Redis not available ({msg}). Caching disabled.")
-            else:
-                 print(f"⚠️ Redis connection error: {e}")
-            cls._instance = None
-            
-        return cls._instance
+            self._record_failure(e)
+            return default
+        self._record_success(time.perf_counter() - start)
+        return result
+
+    # --- Commands ---
+
+    def ping(self) -> bool:
+        return bool(self.execute(lambda r: r.ping(), default=False))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute(lambda r: r.get(key))
+
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return self.execute(lambda r: r.mget(keys), default=[None] * len(keys))
+
+    def setex(self, key: str, ttl: int, value) -> bool:
+        return bool(self.execute(lambda r: r.setex(key, ttl, value), default=False))
+
+    def set_many(self, items: Dict[str, Any], ttl: int, transaction: bool = True) -> bool:
+        """SETEX every item in one pipelined round trip (atomically by default), in dict order"""
+        def run(r):
+            pipe = r.pipeline(transaction=transaction)
+            for key, value in items.items():
+                pipe.setex(key, ttl, value)
+            return pipe.execute()
+        return self.execute(run) is not None
+
+    def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return self.execute(lambda r: r.delete(*keys), default=0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            successes = self.stats["calls"] - self.stats["errors"]
+            return {
+                **{k: v for k, v in self.stats.items() if k != "total_latency_ms"},
+                "available": REDIS_AVAILABLE,
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in_s": round(max(0.0, self._retry_at - time.monotonic()), 1) if self._state == "open" else 0,
+                "avg_latency_ms": round(self.stats["total_latency_ms"] / successes, 3) if successes > 0 else None,
+                "pool": {"max_connections": self.max_connections,
+                         "connect_timeout_s": self.connect_timeout, "socket_timeout_s": self.socket_timeout}
+            }
+
+
+# Shared instance
+redis_client = RedisClient()
 
 # Functional helper
 def get_redis():
-    return RedisClient.get_instance()
+    """The shared client (its calls return defaults while Redis is down), or None without the library"""
+    return redis_client if REDIS_AVAILABLE else None
@@ -6,6 +6,9 @@ load_dotenv()
 UPLOAD_DIR = "backend/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# backend/data/leads.db (here so tools can find it without importing database.py, which migrates on import)
+DB_PATH = os.getenv("LEADS_DB_PATH") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "leads.db")
+
 MAX_FILE_SIZE = 50 * 1024 * 1024 # 50MB
 
 
@@ -14,4 +17,70 @@ MAX_ROWS = 20000   # cap for very large CSVs to prevent OOM
 
 # Caching
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 1.0))   # seconds; an unreachable Redis fails fast
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2.0))     # per command
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 32))
+REDIS_BACKOFF_BASE = 1.0     # circuit breaker: first retry after 1s, doubling per failure...
+REDIS_BACKOFF_MAX = 60.0     # ...up to a minute
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_MB", 256)) * 1024 * 1024   # in-process tier budget
+CACHE_L1_MAX_ITEMS = 1024
+CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", 300))   # L1 lifetime cap while Redis is up (bounds cross-worker staleness)
+CACHE_CODEC = os.getenv("CACHE_CODEC")   # "msgpack+zstd" or "json"; unset = best installed (see cache/codec.py)
+CACHE_CHUNK_ROWS = 5000                  # rows per Redis value for chunked results
+
+ANALYSIS_CONTEXT_TTL = 24 * 3600         # chat deep-analysis context per (file hash, model version)
+ANALYSIS_PRECOMPUTE_MAX_PENDING = 4      # files queued for a context warm-up; more are left to the first chat turn
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", 100000))   # rows sampled for quantiles/correlations/counts
+PROFILE_TOP_PAIRS = 20                   # strongest correlated column pairs reported
+TOP_LEADS_K = 50                         # ranked leads indexed per run for "top N leads" chat answers
+INSIGHT_TOP_LEADS = int(os.getenv("INSIGHT_TOP_LEADS", 0))    # top leads given LLM insights after scoring; 0 = off
+                                                              # (opt-in: without a Gemini key this loads the local llama model)
+INSIGHT_BATCH_SIZE = 8                   # leads per LLM call
+INSIGHT_MAX_PARALLEL = 2                 # batch calls in flight (the LLM scheduler still caps per provider)
+INSIGHT_CACHE_TTL = 7 * 24 * 3600        # insight per lead-feature signature
+
+# Semantic chat cache (see cache/chat_cache.py): cosine similarity needed to reuse an answer
+CHAT_SEMANTIC_THRESHOLD = float(os.getenv("CHAT_SEMANTIC_THRESHOLD", 0.88))
+CHAT_SEMANTIC_MAX_ENTRIES = 256   # answers kept per dataset
+CHAT_SEMANTIC_MAX_SCOPES = 32     # datasets kept
+
+
+# LLM scheduler (see llm/scheduler.py): generations allowed at once per provider
+LLM_CONCURRENCY = {
+    "gemini": int(os.getenv("LLM_GEMINI_CONCURRENCY", 4)),
+    "llama": int(os.getenv("LLM_LLAMA_CONCURRENCY", 1)),   # one Llama instance can't run two generations at once
+}
+LLM_DEFAULT_CONCURRENCY = 1
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 32))                      # waiters per provider
+LLM_INTERACTIVE_TIMEOUT = float(os.getenv("LLM_INTERACTIVE_TIMEOUT", 60))  # seconds, queueing + generation
+LLM_BATCH_TIMEOUT = float(os.getenv("LLM_BATCH_TIMEOUT", 300))
+LLAMA_PROMPT_CACHE_MB = int(os.getenv("LLAMA_PROMPT_CACHE_MB", 512))   # saved llama states for prompt-prefix reuse; 0 = off
+
+# SQLite tuning (see core/database.py)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")          # safe with WAL, far fewer fsyncs than FULL
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))    # page cache per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 30))       # seconds to wait on a locked db
+SQLITE_STATEMENT_CACHE = 256                                            # prepared statements kept per connection
+
+# Write-behind persistence queue (see services/persistence_service.py)
+PERSIST_CHUNK_ROWS = 5000            # leads per queued chunk
+PERSIST_QUEUE_MAX_CHUNKS = int(os.getenv("PERSIST_QUEUE_MAX_CHUNKS", 40))   # bound: ~200k leads in memory
+PERSIST_GROUP_COMMIT_ROWS = 20000    # leads written per transaction
+PERSIST_ORPHAN_MINUTES = int(os.getenv("PERSIST_ORPHAN_MINUTES", 10))   # 'pending' runs older than this at startup
+                                                                        # lost their queue (crash/restart): marked failed
+
+# Retention (see services/retention_service.py). 0 disables a limit; all off by default,
+# since archived runs must be restored before they can be opened again
+RETENTION_MAX_AGE_DAYS = int(os.getenv("RETENTION_MAX_AGE_DAYS", 0))
+RETENTION_MAX_RUNS = int(os.getenv("RETENTION_MAX_RUNS", 0))            # live (unarchived) runs kept in the db
+RETENTION_MAX_DB_MB = int(os.getenv("RETENTION_MAX_DB_MB", 0))
+RETENTION_NOTIFICATION_DAYS = int(os.getenv("RETENTION_NOTIFICATION_DAYS", 0))
+RETENTION_INTERVAL_MINUTES = int(os.getenv("RETENTION_INTERVAL_MINUTES", 60))
+VACUUM_PAGES_PER_STEP = 2000      # pages freed per incremental_vacuum step (short write locks)
+
+# Lead identity table: score points kept per lead (newest last)
+LEAD_SCORE_HISTORY_LEN = 20
 
+# Embedded analytics store (optional, needs duckdb)
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").lower() == "true"
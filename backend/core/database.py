@@ -1,85 +1,88 @@
 import sqlite3
 import json
+import re
+import threading
 from datetime import datetime
 import os
+from backend.core.config import (
+    DB_PATH, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE,
+    SQLITE_BUSY_TIMEOUT, SQLITE_STATEMENT_CACHE, LEAD_SCORE_HISTORY_LEN
+)
+from backend.core.migrations import migrate
+from backend.core.run_store import RUN_STORE_AVAILABLE, read_run_payload
 
 
 # Point to backend/data/leads.db
-DB_NAME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "leads.db")
+DB_NAME = DB_PATH
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+# --- Connection Management ---
+# sqlite3 connections can't be shared across threads, so each thread keeps one
+# long-lived, pre-tuned connection instead of paying connect + pragma setup per call.
+_local = threading.local()
+# Every thread's pooled connection, so shutdown can close them all
+_pooled = set()
+_pooled_lock = threading.Lock()
+
+def _configure_connection(conn):
+    """Apply journaling and cache pragmas to a fresh connection"""
+    # Must come first: only takes effect before a brand-new file is initialised
+    # (existing files need one VACUUM, see RetentionService.ensure_incremental_vacuum)
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL: readers no longer block behind a writer (and vice versa)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')  # negative = KiB
+    conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+def open_db_connection(check_same_thread=True):
+    """Open a new tuned connection (for callers that manage their own lifetime)"""
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        cached_statements=SQLITE_STATEMENT_CACHE,  # prepared statement reuse
+        check_same_thread=check_same_thread
+    )
     conn.row_factory = sqlite3.Row
+    _configure_connection(conn)
+    return conn
+
+def get_db_connection():
+    """Return this thread's pooled connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # Only its own thread uses it; check_same_thread is off so shutdown can close it
+        conn = open_db_connection(check_same_thread=False)
+        _local.conn = conn
+        with _pooled_lock:
+            _pooled.add(conn)
     return conn
 
+def close_db_connection():
+    """Close this thread's pooled connection"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        with _pooled_lock:
+            _pooled.discard(conn)
+        conn.close()
+        _local.conn = None
+
+def close_all_db_connections():
+    """Close every thread's pooled connection (on shutdown); threads reopen on next use"""
+    close_db_connection()
+    with _pooled_lock:
+        conns = list(_pooled)
+        _pooled.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Closing DB connection failed: {e}")
+
 def init_db():
+    """Apply any pending schema migrations (cheap no-op when up to date)"""
     conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Create Prediction Runs Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS prediction_runs (
-            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            total_leads INTEGER,
-            high_priority_count INTEGER,
-            medium_priority_count INTEGER,
-            low_priority_count INTEGER,
-            accuracy REAL,
-            f1_score REAL,
-            pr_auc REAL,
-            precision_at_k REAL,
-            recall_at_k REAL,
-            has_actual_data INTEGER DEFAULT 0
-        )
-    ''')
-    
-    # Simple migration: Add columns if they don't exist
-    try:
-        c.execute('ALTER TABLE prediction_runs ADD COLUMN f1_score REAL')
-        c.execute('ALTER TABLE prediction_runs ADD COLUMN pr_auc REAL')
-        c.execute('ALTER TABLE prediction_runs ADD COLUMN precision_at_k REAL')
-        c.execute('ALTER TABLE prediction_runs ADD COLUMN recall_at_k REAL')
-    except:
-        # Columns likely exist
-        pass
-
-    # ... leads and notifications tables ... 
-    
-    # Create Leads Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS leads (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            run_id INTEGER,
-            lead_id TEXT,
-            source TEXT,
-            time_on_site INTEGER,
-            pages_visited INTEGER,
-            email_opened INTEGER,
-            meeting_booked INTEGER,
-            converted INTEGER,
-            prediction_score REAL,
-            priority TEXT,
-            raw_data TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (run_id) REFERENCES prediction_runs (run_id)
-        )
-    ''')
-    
-    # Create Notifications Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT NOT NULL, 
-            message TEXT NOT NULL,
-            is_read INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    return migrate(conn)
 
 # ... save_lead, get_recent_leads ...
 
@@ -111,19 +114,24 @@ def save_lead(lead_data, prediction_score=None, run_id=None, priority=None):
         lead_db_id = c.lastrowid
     except Exception as e:
         print(f"DB Error: {e}")
+        conn.rollback()
         lead_db_id = None
         
-    conn.close()
     return lead_db_id
 
 def get_recent_leads(limit=50):
     conn = get_db_connection()
     leads = conn.execute('SELECT * FROM leads ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
-    conn.close()
     return [dict(ix) for ix in leads]
 
-def save_prediction_run(filename, total_leads, high_count, medium_count, low_count, accuracy=None, has_actual_data=False, metrics=None):
-    """Save a prediction run to the database and return the run_id"""
+def save_prediction_run(filename, total_leads, high_count, medium_count, low_count, accuracy=None, has_actual_data=False, metrics=None, persist_status='complete',
+                        model_version=None, base_run_id=None, rescored_leads=None, top_leads=None):
+    """
+    Save a prediction run to the database and return the run_id.
+    Use persist_status='pending' when the leads are written later by the persistence queue.
+    base_run_id/rescored_leads record an incremental run (only changed rows re-scored).
+    top_leads is the run's ranked top-K index (see top_leads_service).
+    """
     conn = get_db_connection()
     c = conn.cursor()
     
@@ -133,48 +141,279 @@ def save_prediction_run(filename, total_leads, high_count, medium_count, low_cou
         c.execute('''
             INSERT INTO prediction_runs (
                 filename, total_leads, high_priority_count, medium_priority_count, low_priority_count, 
-                accuracy, f1_score, pr_auc, precision_at_k, recall_at_k, has_actual_data
+                accuracy, f1_score, pr_auc, precision_at_k, recall_at_k, has_actual_data, persist_status,
+                model_version, base_run_id, rescored_leads, top_leads
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             filename, total_leads, high_count, medium_count, low_count, 
             accuracy, 
             metrics.get('f1_score'), metrics.get('pr_auc'), 
             metrics.get('precision_at_k'), metrics.get('recall_at_k'),
-            1 if has_actual_data else 0
+            1 if has_actual_data else 0,
+            persist_status,
+            model_version, base_run_id, rescored_leads,
+            json.dumps(top_leads) if top_leads is not None else None
         ))
         conn.commit()
         run_id = c.lastrowid
     except Exception as e:
         print(f"DB Error saving prediction run: {e}")
+        conn.rollback()
         run_id = None
     
-    conn.close()
     return run_id
 
+RUN_COLUMNS = '''
+    run_id, filename, timestamp, total_leads, 
+    high_priority_count, medium_priority_count, low_priority_count, 
+    accuracy, f1_score, pr_auc, precision_at_k, recall_at_k, has_actual_data, persist_status, payload_path,
+    archived_at, archive_path, model_version, base_run_id, rescored_leads
+'''
+
 def get_prediction_history():
-    """Get all prediction runs ordered by most recent first"""
+    """Get all durably saved prediction runs ordered by most recent first"""
     conn = get_db_connection()
-    runs = conn.execute('''
-        SELECT run_id, filename, timestamp, total_leads, 
-               high_priority_count, medium_priority_count, low_priority_count, 
-               accuracy, f1_score, pr_auc, precision_at_k, recall_at_k, has_actual_data
+    runs = conn.execute(f'''
+        SELECT {RUN_COLUMNS}
         FROM prediction_runs 
+        WHERE persist_status = 'complete'
         ORDER BY timestamp DESC
     ''').fetchall()
-    conn.close()
     return [dict(run) for run in runs]
 
+def get_prediction_run(run_id):
+    """Get a single run's metadata by primary key, whatever its persist_status (None if missing)"""
+    conn = get_db_connection()
+    run = conn.execute(f'''
+        SELECT {RUN_COLUMNS}
+        FROM prediction_runs 
+        WHERE run_id = ?
+    ''', (run_id,)).fetchone()
+    return dict(run) if run else None
+
+def get_delta_base_run(filename, model_version):
+    """
+    Latest live run of the same file scored by the same model, whose leads
+    can be carried forward into a re-upload (None if there isn't one)
+    """
+    conn = get_db_connection()
+    run = conn.execute(f'''
+        SELECT {RUN_COLUMNS}
+        FROM prediction_runs
+        WHERE filename = ? AND model_version = ?
+          AND persist_status = 'complete' AND archived_at IS NULL
+        ORDER BY run_id DESC
+        LIMIT 1
+    ''', (filename, model_version)).fetchone()
+    return dict(run) if run else None
+
+def get_latest_top_leads():
+    """
+    (run_id, top_leads) of the latest saved run; top_leads is None for runs
+    saved before the index existed. (None, None) when there are no runs.
+    """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT run_id, top_leads
+        FROM prediction_runs
+        WHERE persist_status = 'complete'
+        ORDER BY timestamp DESC, run_id DESC
+        LIMIT 1
+    ''').fetchone()
+    if not row:
+        return None, None
+    return row['run_id'], json.loads(row['top_leads']) if row['top_leads'] else None
+
+def get_run_top_leads(run_id):
+    """A run's top-K index (None if the run or its index doesn't exist)"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT top_leads FROM prediction_runs WHERE run_id = ?', (run_id,)).fetchone()
+    return json.loads(row['top_leads']) if row and row['top_leads'] else None
+
+def set_run_top_leads(run_id, top_leads, conn=None):
+    """Replace a run's top-K index (e.g. once insights are attached)"""
+    conn = conn or get_db_connection()
+    with conn:
+        conn.execute('UPDATE prediction_runs SET top_leads = ? WHERE run_id = ?', (json.dumps(top_leads), run_id))
+
+def get_run_row_hashes(run_id):
+    """{lead_id: (row_hash, prediction_score, priority, explanation)} for a run's hashed rows"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT lead_id, row_hash, prediction_score, priority, explanation
+        FROM leads
+        WHERE run_id = ? AND row_hash IS NOT NULL
+    ''', (run_id,)).fetchall()
+    return {r['lead_id']: (r['row_hash'], r['prediction_score'], r['priority'], r['explanation']) for r in rows}
+
+
+def set_run_persist_status(run_id, status, conn=None):
+    """Mark a run's leads as 'pending', 'complete' or 'failed'"""
+    conn = conn or get_db_connection()
+    with conn:
+        conn.execute('UPDATE prediction_runs SET persist_status = ? WHERE run_id = ?', (status, run_id))
+
+def fail_orphaned_runs(older_than_minutes, exclude=(), conn=None):
+    """
+    Mark runs still 'pending' after older_than_minutes as 'failed' (their
+    queued leads died with the process that held them). Returns the run ids.
+    """
+    conn = conn or get_db_connection()
+    rows = conn.execute(
+        "SELECT run_id FROM prediction_runs WHERE persist_status = 'pending' AND timestamp < datetime('now', ?)",
+        (f"-{int(older_than_minutes)} minutes",)
+    ).fetchall()
+    run_ids = [r['run_id'] for r in rows if r['run_id'] not in exclude]
+    if run_ids:
+        with conn:
+            conn.executemany("UPDATE prediction_runs SET persist_status = 'failed' WHERE run_id = ?",
+                             [(run_id,) for run_id in run_ids])
+    return run_ids
+
+def set_run_payload_path(run_id, path, conn=None):
+    """Point a run at its columnar payload file"""
+    conn = conn or get_db_connection()
+    with conn:
+        conn.execute('UPDATE prediction_runs SET payload_path = ? WHERE run_id = ?', (path, run_id))
+
+def set_run_archived(run_id, archive_path, conn=None):
+    """Record that a run's leads were moved to an archive file (None = restored)"""
+    conn = conn or get_db_connection()
+    with conn:
+        if archive_path:
+            conn.execute('''
+                UPDATE prediction_runs SET archived_at = CURRENT_TIMESTAMP, archive_path = ?, payload_path = NULL
+                WHERE run_id = ?
+            ''', (archive_path, run_id))
+        else:
+            conn.execute('UPDATE prediction_runs SET archived_at = NULL, archive_path = NULL WHERE run_id = ?', (run_id,))
+
+def delete_run_leads(run_id, batch_size=5000, conn=None):
+    """
+    Delete a run's leads in small transactions so readers and the
+    persistence writer never wait behind one huge delete.
+    """
+    conn = conn or get_db_connection()
+    deleted = 0
+    while True:
+        with conn:
+            cur = conn.execute('''
+                DELETE FROM leads WHERE id IN (
+                    SELECT id FROM leads WHERE run_id = ? LIMIT ?
+                )
+            ''', (run_id, batch_size))
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+
+def delete_old_notifications(max_age_days):
+    conn = get_db_connection()
+    with conn:
+        cur = conn.execute(
+            "DELETE FROM notifications WHERE created_at < datetime('now', ?)", (f'-{int(max_age_days)} days',)
+        )
+    return cur.rowcount
+
+def get_db_size_bytes():
+    """Bytes in use by the database file (excluding free pages)"""
+    conn = get_db_connection()
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return (page_count - free_pages) * page_size
 
+def _search_text(lead_data):
+    # String values only: IDs, names, emails, sources (numbers aren't worth indexing)
+    return " ".join(v for v in lead_data.values() if isinstance(v, str) and v)
+
+def insert_leads(conn, leads_data_list, store_raw=True):
+    """
+    Insert lead rows on the given connection without committing.
+    Callers own the transaction (save_leads_batch, the persistence queue).
+    
+    store_raw=False is for runs whose full rows are in the columnar run store:
+    raw_data stays NULL and only the hot columns, row_idx and search_text are kept.
+    """
+    data_to_insert = []
+    
+    for item in leads_data_list:
+        lead_data = item.get('lead_data', {})
+        prediction_score = item.get('prediction_score')
+        run_id = item.get('run_id')
+        priority = item.get('priority')
+        
+        if store_raw:
+            # Fast JSON dump
+            raw_data_json = json.dumps(lead_data, separators=(',', ':')) # compact json
+            search_text = None
+        else:
+            raw_data_json = None
+            search_text = _search_text(lead_data)
+        
+        data_to_insert.append((
+            run_id,
+            str(lead_data.get('LeadID', '')),
+            lead_data.get('Source', ''),
+            lead_data.get('TimeOnSite', 0),
+            lead_data.get('PagesVisited', 0),
+            lead_data.get('EmailOpened', 0),
+            lead_data.get('MeetingBooked', 0),
+            lead_data.get('Converted', 0),
+            prediction_score,
+            priority,
+            raw_data_json,
+            item.get('row_idx'),
+            search_text,
+            item.get('row_hash'),
+            item.get('explanation')
+        ))
+    
+    conn.executemany('''
+        INSERT INTO leads (run_id, lead_id, source, time_on_site, pages_visited, email_opened, meeting_booked, converted, prediction_score, priority, raw_data, row_idx, search_text, row_hash, explanation)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', data_to_insert)
+
+def copy_leads(conn, leads_data_list):
+    """
+    Carry unchanged leads forward from item['carried_from'] (the base run) into
+    item['run_id'] without committing. The row is copied inside SQLite, so no
+    JSON or Python-side encoding happens. Only for runs in the columnar store:
+    raw_data stays NULL and row_idx points into the new run's payload.
+    
+    If the base rows are gone (the base run was archived meanwhile), the
+    chunk is inserted from the in-memory items instead.
+    """
+    if not leads_data_list:
+        return
+    cur = conn.executemany('''
+        INSERT INTO leads (run_id, lead_id, source, time_on_site, pages_visited, email_opened, meeting_booked, converted, prediction_score, priority, raw_data, row_idx, search_text, row_hash, explanation)
+        SELECT ?, lead_id, source, time_on_site, pages_visited, email_opened, meeting_booked, converted, prediction_score, priority, NULL, ?, search_text, row_hash, explanation
+        FROM leads
+        WHERE run_id = ? AND lead_id = ?
+        LIMIT 1
+    ''', [
+        (item['run_id'], item.get('row_idx'), item['carried_from'], str(item.get('lead_data', {}).get('LeadID', '')))
+        for item in leads_data_list
+    ])
+    if cur.rowcount == len(leads_data_list):
+        return
+    
+    run_id = leads_data_list[0]['run_id']
+    row_idxs = [item.get('row_idx') for item in leads_data_list]
+    conn.execute(
+        f"DELETE FROM leads WHERE run_id = ? AND row_idx IN ({', '.join('?' for _ in row_idxs)})",
+        [run_id] + row_idxs
+    )
+    insert_leads(conn, leads_data_list, store_raw=False)
 
 def save_leads_batch(leads_data_list):
-    """Save multiple leads in a single transaction for performance"""
+    """Save multiple leads synchronously, committing in chunks"""
     
     if not leads_data_list:
         return
         
     conn = get_db_connection()
-    c = conn.cursor()
     
     try:
         # Chunking for stability (SQLite can perform poorly with massive single transactions)
@@ -182,135 +421,346 @@ def save_leads_batch(leads_data_list):
         total_items = len(leads_data_list)
         
         for i in range(0, total_items, BATCH_SIZE):
-            chunk = leads_data_list[i:i + BATCH_SIZE]
-            data_to_insert = []
-            
-            for item in chunk:
-                lead_data = item.get('lead_data', {})
-                prediction_score = item.get('prediction_score')
-                run_id = item.get('run_id')
-                priority = item.get('priority')
-                
-                # Fast JSON dump
-                raw_data_json = json.dumps(lead_data, separators=(',', ':')) # compact json
-                
-                data_to_insert.append((
-                    run_id,
-                    str(lead_data.get('LeadID', '')),
-                    lead_data.get('Source', ''),
-                    lead_data.get('TimeOnSite', 0),
-                    lead_data.get('PagesVisited', 0),
-                    lead_data.get('EmailOpened', 0),
-                    lead_data.get('MeetingBooked', 0),
-                    lead_data.get('Converted', 0),
-                    prediction_score,
-                    priority,
-                    raw_data_json
-                ))
-            
-            c.executemany('''
-                INSERT INTO leads (run_id, lead_id, source, time_on_site, pages_visited, email_opened, meeting_booked, converted, prediction_score, priority, raw_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', data_to_insert)
-            conn.commit() # Commit each chunk
+            with conn:  # Commit each chunk (rolled back if it fails)
+                insert_leads(conn, leads_data_list[i:i + BATCH_SIZE])
     except Exception as e:
         print(f"DB Batch Error: {e}")
-    finally:
-        conn.close()
 
-def get_leads_by_run(run_id):
-    """Get all leads from a specific prediction run"""
-    conn = get_db_connection()
-    leads = conn.execute('''
-        SELECT * FROM leads 
-        WHERE run_id = ? 
-        ORDER BY prediction_score DESC
-    ''', (run_id,)).fetchall()
-    conn.close()
-    
-    # Parse raw_data JSON back to dict
-    result = []
-    for lead in leads:
-        lead_dict = dict(lead)
-        if lead_dict.get('raw_data'):
+def _decode_raw_data(conn, lead_dicts):
+    """
+    Fill lead['raw_data'] with the original row: json-decoded for legacy rows,
+    read from the run's Parquet payload (only the needed rows) otherwise.
+    """
+    by_run = {}
+    for lead in lead_dicts:
+        raw = lead.get('raw_data')
+        if raw:
             try:
-                lead_dict['raw_data'] = json.loads(lead_dict['raw_data'])
+                lead['raw_data'] = json.loads(raw)
             except:
                 pass
-        result.append(lead_dict)
+        elif lead.get('row_idx') is not None:
+            by_run.setdefault(lead['run_id'], []).append(lead)
     
-    return result
+    if not by_run or not RUN_STORE_AVAILABLE:
+        return
+    
+    for run_id, leads in by_run.items():
+        row = conn.execute('SELECT payload_path FROM prediction_runs WHERE run_id = ?', (run_id,)).fetchone()
+        if not row or not row['payload_path'] or not os.path.exists(row['payload_path']):
+            continue
+        try:
+            rows = read_run_payload(row['payload_path'], [l['row_idx'] for l in leads])
+        except Exception as e:
+            print(f"Run payload read error (run {run_id}): {e}")
+            continue
+        for lead, raw in zip(leads, rows):
+            lead['raw_data'] = raw
+
+# Hot columns served straight from idx_leads_run_score / the leads row
+LEAD_SUMMARY_COLUMNS = [
+    'id', 'run_id', 'lead_id', 'source', 'time_on_site', 'pages_visited',
+    'email_opened', 'meeting_booked', 'converted', 'prediction_score', 'priority', 'explanation', 'row_hash',
+    'created_at'
+]
+
+def _encode_cursor(lead):
+    score = lead['prediction_score']
+    return f"{'null' if score is None else repr(score)}:{lead['id']}"
+
+def _decode_cursor(cursor):
+    try:
+        score, lead_pk = cursor.rsplit(":", 1)
+        return (None if score == "null" else float(score)), int(lead_pk)
+    except (ValueError, AttributeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def get_leads_page(run_id, limit=None, cursor=None, include_raw=True):
+    """
+    Get leads from a run ordered by score (desc), one keyset page at a time.
+    
+    - limit: page size (None = rest of the run)
+    - cursor: opaque position returned by the previous page
+    - include_raw: select and json-decode raw_data; skip it for summary views
+    
+    Returns (leads, next_cursor); next_cursor is None on the last page.
+    """
+    conn = get_db_connection()
+    columns = LEAD_SUMMARY_COLUMNS + (['raw_data', 'row_idx'] if include_raw else [])
+    select = f"SELECT {', '.join(columns)} FROM leads WHERE run_id = ?"
+    wanted = limit + 1 if limit else None  # one extra row tells us if there's a next page
+
+    last_score, last_id = _decode_cursor(cursor) if cursor else (float("inf"), 0)
+    leads = []
+    if last_score is not None:
+        # Scored rows, matching the index order (score DESC, rowid ASC); the
+        # <= bound lets SQLite seek instead of filtering from the top of the run
+        sql = select + " AND prediction_score <= ? AND (prediction_score < ? OR id > ?) ORDER BY prediction_score DESC, id ASC"
+        params = [run_id, last_score, last_score, last_id]
+        if wanted:
+            sql += " LIMIT ?"
+            params.append(wanted)
+        leads = conn.execute(sql, params).fetchall()
+        last_id = 0
+
+    if not wanted or len(leads) < wanted:
+        # Rows without a score sort last (NULL is lowest in SQLite), paged by id
+        sql = select + " AND prediction_score IS NULL AND id > ? ORDER BY id ASC"
+        params = [run_id, last_id]
+        if wanted:
+            sql += " LIMIT ?"
+            params.append(wanted - len(leads))
+        leads += conn.execute(sql, params).fetchall()
+    
+    next_cursor = None
+    if limit and len(leads) > limit:
+        leads = leads[:limit]
+        next_cursor = _encode_cursor(leads[-1])
+    
+    result = [dict(lead) for lead in leads]
+    if include_raw:
+        _decode_raw_data(conn, result)
+    
+    return result, next_cursor
+
+def get_leads_by_run(run_id, limit=None, include_raw=True):
+    """Get leads from a specific prediction run (highest score first)"""
+    leads, _ = get_leads_page(run_id, limit=limit, include_raw=include_raw)
+    return leads
+
+# --- Lead Profiles (latest state per LeadID) ---
+
+def update_lead_profiles(run_id, conn=None):
+    """
+    Fold a completed run into lead_profiles in one set-based upsert:
+    latest score/priority, runs_seen and the capped score history.
+    Runs older than a profile's latest (e.g. a restored archive) don't overwrite it.
+    """
+    conn = conn or get_db_connection()
+    with conn:
+        conn.execute(f'''
+            INSERT INTO lead_profiles (
+                lead_id, latest_score, latest_priority, latest_run_id, source, runs_seen, score_history
+            )
+            SELECT lead_id, prediction_score, priority, run_id, source, 1,
+                   json_array(json_array(run_id, round(prediction_score, 4)))
+            FROM leads
+            WHERE run_id = ? AND lead_id IS NOT NULL AND lead_id != ''
+            ON CONFLICT(lead_id) DO UPDATE SET
+                latest_score = excluded.latest_score,
+                latest_priority = excluded.latest_priority,
+                latest_run_id = excluded.latest_run_id,
+                source = excluded.source,
+                runs_seen = lead_profiles.runs_seen + 1,
+                score_history = CASE
+                    WHEN json_array_length(lead_profiles.score_history) >= {int(LEAD_SCORE_HISTORY_LEN)}
+                    THEN json_remove(json_insert(lead_profiles.score_history, '$[#]', json_array(excluded.latest_run_id, round(excluded.latest_score, 4))), '$[0]')
+                    ELSE json_insert(lead_profiles.score_history, '$[#]', json_array(excluded.latest_run_id, round(excluded.latest_score, 4)))
+                END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE excluded.latest_run_id > lead_profiles.latest_run_id
+        ''', (run_id,))
+
+def _profile_dict(row):
+    profile = dict(row)
+    history = json.loads(profile.get('score_history') or '[]')
+    profile['score_history'] = [{"run_id": r, "score": sc} for r, sc in history]
+    # Trend: change between the last two runs that scored this lead (unscored points skipped)
+    scored = [sc for _, sc in history if sc is not None]
+    profile['trend'] = round(scored[-1] - scored[-2], 4) if len(scored) > 1 else None
+    return profile
+
+def get_lead_profile(lead_id):
+    """Current score, priority and score history for one lead (None if unknown)"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM lead_profiles WHERE lead_id = ?', (str(lead_id),)).fetchone()
+    return _profile_dict(row) if row else None
+
+def get_top_lead_profiles(limit=50, priority=None):
+    """Global top-N leads by current score (walks idx_lead_profiles_score)"""
+    conn = get_db_connection()
+    sql = 'SELECT * FROM lead_profiles'
+    params = []
+    if priority:
+        sql += ' WHERE latest_priority = ?'
+        params.append(priority)
+    sql += ' ORDER BY latest_score DESC LIMIT ?'
+    params.append(limit)
+    return [_profile_dict(r) for r in conn.execute(sql, params).fetchall()]
+
+# --- Run Comparison ---
+
+# Both sides are read through idx_leads_run_lead; a full outer join is spelled
+# as two LEFT JOINs so it works on SQLite builds older than 3.39.
+# A lead_id repeated within a run is represented by its first row: with a
+# lone MIN() aggregate SQLite takes the bare columns (score, priority) from
+# the row holding the minimum, so the pair always comes from one row.
+# New/vanished is decided by which side has a row (first_id), not by the
+# score, which may be NULL in a run that has the lead.
+_COMPARE_CTE = '''
+    WITH a AS (
+        SELECT lead_id, prediction_score AS score, priority, MIN(id) AS first_id
+        FROM leads WHERE run_id = ? AND lead_id IS NOT NULL AND lead_id != ''
+        GROUP BY lead_id
+    ),
+    b AS (
+        SELECT lead_id, prediction_score AS score, priority, MIN(id) AS first_id
+        FROM leads WHERE run_id = ? AND lead_id IS NOT NULL AND lead_id != ''
+        GROUP BY lead_id
+    ),
+    diff AS (
+        SELECT a.lead_id, a.first_id AS old_id, b.first_id AS new_id,
+               a.score AS old_score, b.score AS new_score,
+               a.priority AS old_priority, b.priority AS new_priority
+        FROM a LEFT JOIN b ON b.lead_id = a.lead_id
+        UNION ALL
+        SELECT b.lead_id, NULL, b.first_id, NULL, b.score, NULL, b.priority
+        FROM b LEFT JOIN a ON a.lead_id = b.lead_id
+        WHERE a.lead_id IS NULL
+    ),
+    changes AS (
+        SELECT lead_id, old_score, new_score, old_priority, new_priority,
+               new_score - old_score AS delta,
+               CASE
+                   WHEN old_id IS NULL THEN 'new'
+                   WHEN new_id IS NULL THEN 'vanished'
+                   WHEN new_score IS NOT old_score OR new_priority IS NOT old_priority THEN 'changed'
+                   ELSE 'unchanged'
+               END AS status
+        FROM diff
+    )
+'''
+
+COMPARE_SORTS = {
+    "abs_delta": "ABS(delta) DESC NULLS LAST, lead_id",
+    "delta_desc": "delta DESC NULLS LAST, lead_id",
+    "delta_asc": "delta ASC NULLS LAST, lead_id",
+    "lead_id": "lead_id",
+}
+
+def compare_runs(base_run_id, other_run_id, limit=100, offset=0, sort="abs_delta",
+                 status=None, from_priority=None, to_priority=None):
+    """
+    Join two runs on lead_id and page through what changed.
+
+    Each row carries old/new score and priority, delta (new - old) and a
+    status: new (only in other run), vanished (only in base run), changed or
+    unchanged. Leads repeated within a run are collapsed to one row per id.
+    Returns (changes, summary) where summary holds status counts and the
+    priority migration matrix ("High->Low": n) over the whole comparison.
+    """
+    if sort not in COMPARE_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(COMPARE_SORTS)}")
+
+    conn = get_db_connection()
+    base_params = [base_run_id, other_run_id]
+
+    filters, params = [], []
+    if status:
+        filters.append("status = ?")
+        params.append(status)
+    if from_priority:
+        filters.append("old_priority = ?")
+        params.append(from_priority)
+    if to_priority:
+        filters.append("new_priority = ?")
+        params.append(to_priority)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    rows = conn.execute(
+        f"{_COMPARE_CTE} SELECT * FROM changes {where} ORDER BY {COMPARE_SORTS[sort]} LIMIT ? OFFSET ?",
+        base_params + params + [limit, offset]
+    ).fetchall()
+
+    summary = {"new": 0, "vanished": 0, "changed": 0, "unchanged": 0, "priority_migrations": {}}
+    for row in conn.execute(f'''{_COMPARE_CTE}
+        SELECT status, old_priority, new_priority, COUNT(*) AS n
+        FROM changes GROUP BY status, old_priority, new_priority
+    ''', base_params).fetchall():
+        summary[row['status']] += row['n']
+        if row['status'] == 'changed' and row['old_priority'] != row['new_priority']:
+            key = f"{row['old_priority']}->{row['new_priority']}"
+            summary["priority_migrations"][key] = summary["priority_migrations"].get(key, 0) + row['n']
+
+    return [dict(r) for r in rows], summary
 
 # --- Search & Notifications ---
 
-def search_leads(query):
-    """Search leads by ID, source, or raw data content"""
+def _fts_match_expression(query):
+    """Turn free text into an FTS5 query: every term must match, as a prefix"""
+    terms = re.findall(r"[\w\-]+", query)
+    # Quote each term so FTS5 operators/punctuation in user input are literal
+    return " ".join('"' + t.replace('"', '""') + '"*' for t in terms)
+
+def _has_fts(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_fts'").fetchone()
+    return row is not None
+
+def search_leads(query, limit=50, offset=0):
+    """
+    Search leads by ID, source, or raw data content.
+    Uses the FTS5 index (prefix matching, best matches first); falls back to a
+    LIKE scan on SQLite builds without FTS5.
+    """
     conn = get_db_connection()
-    search_term = f"%{query}%"
-    try:
+    
+    if _has_fts(conn):
+        match = _fts_match_expression(query)
+        if not match:
+            return []
+        # bm25 column weights: an ID hit beats a source hit beats a raw_data/search_text hit
+        leads = conn.execute('''
+            SELECT l.* FROM leads_fts
+            JOIN leads l ON l.id = leads_fts.rowid
+            WHERE leads_fts MATCH ?
+            ORDER BY bm25(leads_fts, 10.0, 5.0, 1.0, 1.0)
+            LIMIT ? OFFSET ?
+        ''', (match, limit, offset)).fetchall()
+    else:
+        search_term = f"%{query}%"
         leads = conn.execute('''
             SELECT * FROM leads 
             WHERE lead_id LIKE ? 
             OR source LIKE ? 
             OR raw_data LIKE ?
+            OR search_text LIKE ?
             ORDER BY created_at DESC 
-            LIMIT 50
-        ''', (search_term, search_term, search_term)).fetchall()
-        
-        # Parse results
-        result = []
-        for lead in leads:
-            lead_dict = dict(lead)
-            if lead_dict.get('raw_data'):
-                try:
-                    lead_dict['raw_data'] = json.loads(lead_dict['raw_data'])
-                except:
-                    pass
-            result.append(lead_dict)
-        return result
-    finally:
-        conn.close()
+            LIMIT ? OFFSET ?
+        ''', (search_term, search_term, search_term, search_term, limit, offset)).fetchall()
+    
+    # Parse results
+    result = [dict(lead) for lead in leads]
+    _decode_raw_data(conn, result)
+    return result
 
 def create_notification(noti_type, message):
     """Create a new notification"""
     conn = get_db_connection()
     try:
-        conn.execute('INSERT INTO notifications (type, message) VALUES (?, ?)', (noti_type, message))
-        conn.commit()
+        with conn:
+            conn.execute('INSERT INTO notifications (type, message) VALUES (?, ?)', (noti_type, message))
         return True
     except Exception as e:
         print(f"Notification Error: {e}")
         return False
-    finally:
-        conn.close()
 
 def get_notifications(limit=10, unread_only=False):
     """Get notifications"""
     conn = get_db_connection()
-    try:
-        query = 'SELECT * FROM notifications'
-        if unread_only:
-            query += ' WHERE is_read = 0'
-        query += ' ORDER BY created_at DESC LIMIT ?'
-        
-        notis = conn.execute(query, (limit,)).fetchall()
-        return [dict(n) for n in notis]
-    finally:
-        conn.close()
+    query = 'SELECT * FROM notifications'
+    if unread_only:
+        query += ' WHERE is_read = 0'
+    query += ' ORDER BY created_at DESC LIMIT ?'
+    
+    notis = conn.execute(query, (limit,)).fetchall()
+    return [dict(n) for n in notis]
 
 def mark_notification_read(noti_id):
     """Mark a notification as read"""
     conn = get_db_connection()
-    try:
+    with conn:
         conn.execute('UPDATE notifications SET is_read = 1 WHERE id = ?', (noti_id,))
-        conn.commit()
-        return True
-    finally:
-        conn.close()
+    return True
 
-# Initialize on module load
-if not os.path.exists(DB_NAME):
-    init_db()
-else:
-    # Ensure table exists even if file exists
-    init_db()
+# Initialize on module load (only pending migrations do any work)
+init_db()
@@ -0,0 +1,341 @@
+"""
+Versioned schema migrations for the leads database.
+
+The applied version lives in SQLite's PRAGMA user_version. Each migration runs
+once, in order, inside its own transaction, so a failed step leaves the schema
+at the previous version. Add new steps to the end of MIGRATIONS; never edit one
+that has shipped.
+"""
+import sqlite3
+from backend.core.config import LEAD_SCORE_HISTORY_LEN
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _add_missing_columns(conn, table, columns):
+    """ALTER TABLE only for columns the table doesn't have yet"""
+    existing = _columns(conn, table)
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+
+
+# --- Migrations ---
+
+def _m001_baseline(conn):
+    """Base tables, plus the columns older databases were missing"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_leads INTEGER,
+            high_priority_count INTEGER,
+            medium_priority_count INTEGER,
+            low_priority_count INTEGER,
+            accuracy REAL,
+            f1_score REAL,
+            pr_auc REAL,
+            precision_at_k REAL,
+            recall_at_k REAL,
+            has_actual_data INTEGER DEFAULT 0
+        )
+    ''')
+    _add_missing_columns(conn, 'prediction_runs', {
+        'f1_score': 'REAL',
+        'pr_auc': 'REAL',
+        'precision_at_k': 'REAL',
+        'recall_at_k': 'REAL',
+        'has_actual_data': 'INTEGER DEFAULT 0',
+    })
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER,
+            lead_id TEXT,
+            source TEXT,
+            time_on_site INTEGER,
+            pages_visited INTEGER,
+            email_opened INTEGER,
+            meeting_booked INTEGER,
+            converted INTEGER,
+            prediction_score REAL,
+            priority TEXT,
+            raw_data TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (run_id) REFERENCES prediction_runs (run_id)
+        )
+    ''')
+    # Formerly migrate_db.py
+    _add_missing_columns(conn, 'leads', {
+        'run_id': 'INTEGER',
+        'priority': 'TEXT',
+        'raw_data': 'TEXT',
+    })
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL, 
+            message TEXT NOT NULL,
+            is_read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m002_hot_path_indexes(conn):
+    """Indexes for run detail, recent leads, lead lookup and history listing"""
+    # Covers `WHERE run_id = ? ORDER BY prediction_score DESC` and the
+    # (lead_id, score, priority) projection without touching the table
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_leads_run_score
+        ON leads (run_id, prediction_score DESC, lead_id, priority)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leads_lead_id ON leads (lead_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON prediction_runs (timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications (created_at)')
+
+
+def fts5_available(conn):
+    """True if this SQLite build ships the FTS5 extension"""
+    try:
+        conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp._fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _m003_leads_fts(conn):
+    """FTS5 index over lead_id/source/raw_data, kept in sync by triggers"""
+    if not fts5_available(conn):
+        print("⚠️ SQLite built without FTS5. Lead search will fall back to LIKE scans.")
+        return
+
+    # External-content table: the text stays in `leads`, FTS only stores the index.
+    # prefix='2 3' keeps short type-ahead prefixes off the slow path.
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+            lead_id, source, raw_data,
+            content='leads', content_rowid='id',
+            tokenize="unicode61 tokenchars '-_'",
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN
+            INSERT INTO leads_fts (rowid, lead_id, source, raw_data)
+            VALUES (new.id, new.lead_id, new.source, new.raw_data);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, lead_id, source, raw_data)
+            VALUES ('delete', old.id, old.lead_id, old.source, old.raw_data);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF lead_id, source, raw_data ON leads BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, lead_id, source, raw_data)
+            VALUES ('delete', old.id, old.lead_id, old.source, old.raw_data);
+            INSERT INTO leads_fts (rowid, lead_id, source, raw_data)
+            VALUES (new.id, new.lead_id, new.source, new.raw_data);
+        END
+    ''')
+    # Index rows that were saved before this migration
+    conn.execute("INSERT INTO leads_fts (leads_fts) VALUES ('rebuild')")
+
+
+def _m004_run_persist_status(conn):
+    """Track whether a run's leads have been durably written (write-behind queue)"""
+    # Existing runs were written synchronously, so they're complete
+    _add_missing_columns(conn, 'prediction_runs', {
+        'persist_status': "TEXT NOT NULL DEFAULT 'complete'",
+    })
+
+
+def _m005_columnar_run_payloads(conn):
+    """
+    Run payloads move to per-run Parquet files: leads keep only hot columns
+    plus row_idx (position in the file) and search_text (string values for FTS)
+    """
+    _add_missing_columns(conn, 'prediction_runs', {'payload_path': 'TEXT'})
+    _add_missing_columns(conn, 'leads', {'row_idx': 'INTEGER', 'search_text': 'TEXT'})
+
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_fts'"
+    ).fetchone()
+    if not has_fts:
+        return
+
+    # Rebuild the FTS table with search_text next to raw_data: older rows are
+    # found through raw_data, Parquet-backed rows through search_text
+    for trigger in ('leads_fts_ai', 'leads_fts_ad', 'leads_fts_au'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE leads_fts')
+    conn.execute('''
+        CREATE VIRTUAL TABLE leads_fts USING fts5(
+            lead_id, source, raw_data, search_text,
+            content='leads', content_rowid='id',
+            tokenize="unicode61 tokenchars '-_'",
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER leads_fts_ai AFTER INSERT ON leads BEGIN
+            INSERT INTO leads_fts (rowid, lead_id, source, raw_data, search_text)
+            VALUES (new.id, new.lead_id, new.source, new.raw_data, new.search_text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER leads_fts_ad AFTER DELETE ON leads BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, lead_id, source, raw_data, search_text)
+            VALUES ('delete', old.id, old.lead_id, old.source, old.raw_data, old.search_text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER leads_fts_au AFTER UPDATE OF lead_id, source, raw_data, search_text ON leads BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, lead_id, source, raw_data, search_text)
+            VALUES ('delete', old.id, old.lead_id, old.source, old.raw_data, old.search_text);
+            INSERT INTO leads_fts (rowid, lead_id, source, raw_data, search_text)
+            VALUES (new.id, new.lead_id, new.source, new.raw_data, new.search_text);
+        END
+    ''')
+    conn.execute("INSERT INTO leads_fts (leads_fts) VALUES ('rebuild')")
+
+
+def _m006_run_archival(conn):
+    """Runs can be archived to compressed files and restored on demand"""
+    _add_missing_columns(conn, 'prediction_runs', {
+        'archived_at': 'TIMESTAMP',
+        'archive_path': 'TEXT',
+    })
+
+
+def _m007_lead_profiles(conn):
+    """One row per LeadID with its latest score and a capped score history"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS lead_profiles (
+            lead_id TEXT PRIMARY KEY,
+            latest_score REAL,
+            latest_priority TEXT,
+            latest_run_id INTEGER,
+            source TEXT,
+            runs_seen INTEGER DEFAULT 0,
+            score_history TEXT,            -- JSON [[run_id, score], ...], oldest first
+            first_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lead_profiles_score ON lead_profiles (latest_score DESC)')
+
+    # Backfill from the runs already stored
+    conn.execute('''
+        INSERT OR IGNORE INTO lead_profiles (
+            lead_id, latest_score, latest_priority, latest_run_id, source, runs_seen, score_history
+        )
+        SELECT latest.lead_id, latest.prediction_score, latest.priority, latest.run_id, latest.source,
+               latest.runs_seen, hist.score_history
+        FROM (
+            SELECT lead_id, prediction_score, priority, run_id, source,
+                   COUNT(*) OVER (PARTITION BY lead_id) AS runs_seen,
+                   ROW_NUMBER() OVER (PARTITION BY lead_id ORDER BY run_id DESC, id DESC) AS rn
+            FROM leads
+            WHERE lead_id IS NOT NULL AND lead_id != ''
+        ) AS latest
+        JOIN (
+            SELECT lead_id, json_group_array(json_array(run_id, round(prediction_score, 4))) AS score_history
+            FROM (
+                SELECT lead_id, run_id, prediction_score,
+                       ROW_NUMBER() OVER (PARTITION BY lead_id ORDER BY run_id DESC, id DESC) AS rn
+                FROM leads
+                WHERE lead_id IS NOT NULL AND lead_id != ''
+                ORDER BY lead_id, run_id
+            )
+            WHERE rn <= ?
+            GROUP BY lead_id
+        ) AS hist ON hist.lead_id = latest.lead_id
+        WHERE latest.rn = 1
+    ''', (LEAD_SCORE_HISTORY_LEN,))
+
+
+def _m008_run_lead_index(conn):
+    """(run_id, lead_id) lookups for run-to-run comparisons"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leads_run_lead ON leads (run_id, lead_id)')
+
+
+def _m009_incremental_rescoring(conn):
+    """
+    Row hashes and explanations on leads, plus the model version and base run
+    on prediction_runs, so a re-upload only re-scores rows that changed
+    """
+    _add_missing_columns(conn, 'leads', {'row_hash': 'INTEGER', 'explanation': 'TEXT'})
+    _add_missing_columns(conn, 'prediction_runs', {
+        'model_version': 'TEXT',
+        'base_run_id': 'INTEGER',
+        'rescored_leads': 'INTEGER',
+    })
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_filename ON prediction_runs (filename, run_id DESC)')
+
+
+def _m010_run_top_leads(conn):
+    """Each run's top-K leads (ranked display entries, JSON) for top-N chat queries"""
+    _add_missing_columns(conn, 'prediction_runs', {'top_leads': 'TEXT'})
+
+
+# (version, description, function) - append only
+MIGRATIONS = [
+    (1, "baseline schema", _m001_baseline),
+    (2, "hot path indexes", _m002_hot_path_indexes),
+    (3, "full-text search index", _m003_leads_fts),
+    (4, "run persistence status", _m004_run_persist_status),
+    (5, "columnar run payloads", _m005_columnar_run_payloads),
+    (6, "run archival", _m006_run_archival),
+    (7, "lead identity table", _m007_lead_profiles),
+    (8, "run/lead comparison index", _m008_run_lead_index),
+    (9, "incremental re-scoring", _m009_incremental_rescoring),
+    (10, "run top-K leads", _m010_run_top_leads),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target_version=None):
+    """
+    Bring the database up to target_version (default: latest).
+    Returns the schema version after migrating.
+    """
+    target = LATEST_VERSION if target_version is None else target_version
+    current = get_schema_version(conn)
+
+    for version, description, apply in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+
+        try:
+            # Take the write lock first, then re-check: another worker starting
+            # at the same time may have applied this step while we waited
+            conn.execute('BEGIN IMMEDIATE')
+            if get_schema_version(conn) >= version:
+                conn.commit()
+                continue
+            print(f"🛠️ Applying DB migration {version}: {description}")
+            apply(conn)
+            # PRAGMA doesn't take bound parameters; version is an int from MIGRATIONS
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"❌ DB migration {version} failed: {e}")
+            raise
+
+    return get_schema_version(conn)
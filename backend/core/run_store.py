@@ -0,0 +1,96 @@
+"""
+Columnar store for per-run lead payloads.
+
+Each run's full input rows live in one Parquet file (zstd, dictionary-encoded
+columns) instead of a JSON string per row in SQLite. Row i of the file is the
+lead stored with leads.row_idx = i. Files are written in row groups of
+ROW_GROUP_ROWS rows, so a page of leads decodes only the groups holding
+its rows, not the whole run. Needs pyarrow; without it callers keep
+using the legacy raw_data JSON column.
+"""
+import bisect
+import os
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    RUN_STORE_AVAILABLE = True
+except ImportError:
+    RUN_STORE_AVAILABLE = False
+
+RUN_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "runs")
+ROW_GROUP_ROWS = 10000   # unit of decoding for paged reads
+
+
+def run_payload_path(run_id: int) -> str:
+    return os.path.join(RUN_STORE_DIR, f"run_{run_id}.parquet")
+
+
+def _column_array(values):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    try:
+        # Numeric column with fillna("") blanks: blanks become nulls
+        return pa.array([None if v == "" else v for v in values])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Genuinely mixed types: keep as text
+        return pa.array([None if v is None else str(v) for v in values])
+
+
+def write_run_payload(run_id: int, rows: List[Dict]) -> str:
+    """Write a run's rows (in row_idx order) and return the file path"""
+    os.makedirs(RUN_STORE_DIR, exist_ok=True)
+
+    columns = []
+    seen = set()
+    for r in rows:
+        for k in r:
+            if k not in seen:
+                seen.add(k)
+                columns.append(k)
+
+    table = pa.table({str(col): _column_array([r.get(col) for r in rows]) for col in columns})
+
+    path = run_payload_path(run_id)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd", use_dictionary=True, row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp_path, path)  # readers never see a half-written file
+    return path
+
+
+def read_run_payload(path: str, row_indices: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Read rows back as dicts. With row_indices, only the row groups holding
+    those rows are decoded, and only those rows materialized (in the order given).
+    """
+    if row_indices is None:
+        return pq.read_table(path).to_pylist()
+    if not row_indices:
+        return []
+
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
+    # First file row of each group
+    starts = []
+    offset = 0
+    for i in range(metadata.num_row_groups):
+        starts.append(offset)
+        offset += metadata.row_group(i).num_rows
+
+    groups = sorted({bisect.bisect_right(starts, idx) - 1 for idx in row_indices})
+    table = parquet_file.read_row_groups(groups)
+    # File row index -> row index within the groups just read
+    base, position = {}, 0
+    for g in groups:
+        base[g] = position - starts[g]
+        position += metadata.row_group(g).num_rows
+    local = [idx + base[bisect.bisect_right(starts, idx) - 1] for idx in row_indices]
+    return table.take(pa.array(local, type=pa.int64())).to_pylist()
+
+
+def delete_run_payload(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -1,9 +1,22 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 
 class LLMProvider(ABC):
     @abstractmethod
     def generate(self, prompt: str, **kwargs) -> str:
         """
         Generate text from the LLM based on the prompt.
+
+        json_schema=<dict> asks for output constrained to that JSON schema
+        (object/array/string/number/integer/boolean with properties, items
+        and required). Providers without constrained decoding ignore it, so
+        callers still parse defensively.
         """
         pass
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        Yield the completion in pieces as it is generated. Providers without
+        native streaming yield the whole generate() result once.
+        """
+        yield self.generate(prompt, **kwargs)
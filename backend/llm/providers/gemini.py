@@ -1,8 +1,11 @@
 import google.generativeai as genai
 import os
+from typing import Iterator
 from backend.llm.base import LLMProvider
 
 class GeminiProvider(LLMProvider):
+    name = "gemini"
+
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
@@ -13,20 +16,53 @@ class GeminiProvider(LLMProvider):
         self.model = genai.GenerativeModel('gemini-flash-lite-latest')
         print("✅ Gemini Provider Initialized (Primary: gemini-flash-lite-latest)")
 
+    @staticmethod
+    def _generation_config(kwargs):
+        # Gemini doesn't use standard openai params like max_tokens directly in generate_content the same way
+        # but we can configure generation_config
+        config = {
+            "max_output_tokens": kwargs.get('max_tokens', 256),
+            "temperature": kwargs.get('temperature', 0.7),
+        }
+        if kwargs.get('json_schema'):
+            # Native structured output: the reply is bare JSON matching the schema
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = kwargs['json_schema']
+        return genai.types.GenerationConfig(**config)
+
+    @staticmethod
+    def _request_options(kwargs):
+        # Deadline from the scheduler bounds the API call itself
+        if kwargs.get('timeout'):
+            return {"request_options": {"timeout": kwargs['timeout']}}
+        return {}
+
     def generate(self, prompt: str, **kwargs) -> str:
         try:
-            # Map parameters
-            # Gemini doesn't use standard openai params like max_tokens directly in generate_content the same way
-            # but we can configure generation_config
-            generation_config = genai.types.GenerationConfig(
-                max_output_tokens=kwargs.get('max_tokens', 256),
-                temperature=kwargs.get('temperature', 0.7),
+            response = self.model.generate_content(
+                prompt, generation_config=self._generation_config(kwargs), **self._request_options(kwargs)
             )
             
-            response = self.model.generate_content(prompt, generation_config=generation_config)
-            
             # Simple text extraction
             return response.text
         except Exception as e:
             print(f"Gemini Generation Error: {e}")
             raise e
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        try:
+            response = self.model.generate_content(
+                prompt, generation_config=self._generation_config(kwargs), stream=True,
+                **self._request_options(kwargs)
+            )
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. only safety/finish metadata)
+                    continue
+                if text:
+                    yield text
+        except Exception as e:
+            print(f"Gemini Streaming Error: {e}")
+            raise e
@@ -1,12 +1,23 @@
+import json
 import os
+from typing import Iterator, List, Optional
 from backend.llm.base import LLMProvider
+from backend.core.config import LLAMA_PROMPT_CACHE_MB
 try:
-    from llama_cpp import Llama
+    from llama_cpp import Llama, LlamaRAMCache, LlamaGrammar
 except ImportError:
     Llama = None
 
 class LlamaCppProvider(LLMProvider):
-    def __init__(self, model_path=None, n_ctx=2048, n_threads=None):
+    name = "llama"
+
+    def __init__(self, model_path=None, n_ctx=2048, n_threads=None, warm_prefixes: Optional[List[str]] = None,
+                 prompt_cache_mb: int = LLAMA_PROMPT_CACHE_MB):
+        """
+        warm_prefixes: static prompt preambles evaluated once at load time and
+        kept in the prompt cache, so the first real call already skips them.
+        prompt_cache_mb: budget for saved model states (0 disables the cache).
+        """
         if Llama is None:
             raise ImportError("llama-cpp-python is not installed. Please install it to use LlamaCppProvider.")
             
@@ -36,25 +47,89 @@ class LlamaCppProvider(LLMProvider):
         except Exception as e:
             print(f"❌ Failed to load Llama model: {e}")
             self.llm = None
+            return
+
+        # Prompt cache: llama-cpp saves the model state (KV cache) after each
+        # completion and, on the next call, restores the saved state sharing the
+        # longest token prefix with the new prompt, so only the differing tail
+        # is evaluated. Oldest states are dropped beyond the byte budget.
+        self.warm_prefixes = []
+        self._grammars = {}  # schema JSON -> compiled LlamaGrammar
+        if prompt_cache_mb > 0:
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=prompt_cache_mb * 1024 * 1024))
+            for prefix in warm_prefixes or []:
+                self._warm(prefix)
+
+    def _warm(self, prefix: str):
+        try:
+            tokens = self.llm.tokenize(prefix.encode("utf-8"))
+            self.llm.reset()
+            self.llm.eval(tokens)
+            self.llm.cache[tokens] = self.llm.save_state()
+            self.warm_prefixes.append(len(tokens))
+        except Exception as e:
+            print(f"⚠️ Prompt prefix warm-up failed: {e}")
+
+    def get_cache_stats(self) -> dict:
+        cache = getattr(self.llm, "cache", None) if self.llm else None
+        if cache is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "entries": len(getattr(cache, "cache_state", {})),
+            "size_mb": round(cache.cache_size / (1024 * 1024), 1),
+            "capacity_mb": round(cache.capacity_bytes / (1024 * 1024), 1),
+            "warm_prefix_tokens": self.warm_prefixes,
+        }
+
+    def _grammar(self, schema: dict):
+        key = json.dumps(schema, sort_keys=True)
+        if key not in self._grammars:
+            self._grammars[key] = LlamaGrammar.from_json_schema(key, verbose=False)
+        return self._grammars[key]
+
+    def _params(self, kwargs):
+        # Default params
+        params = {
+            "max_tokens": kwargs.get("max_tokens", 512),
+            "temperature": kwargs.get("temperature", 0.7),
+            "stop": kwargs.get("stop", ["User:", "\n\n"]),
+            "echo": False,
+        }
+        if kwargs.get("json_schema"):
+            # Sampling is restricted to tokens that keep the output valid for the
+            # schema, and only end-of-text is allowed once the value closes. No
+            # stop strings: a blank line inside the JSON must not cut it short.
+            params["grammar"] = self._grammar(kwargs["json_schema"])
+            params["stop"] = kwargs.get("stop", [])
+        return params
 
     def generate(self, prompt: str, **kwargs) -> str:
         if not self.llm:
             return "Error: Model not loaded."
 
-        # Default params
-        max_tokens = kwargs.get("max_tokens", 512)
-        temperature = kwargs.get("temperature", 0.7)
-        stop = kwargs.get("stop", ["User:", "\n\n"])
-
         try:
-            output = self.llm(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stop=stop,
-                echo=False
-            )
+            output = self.llm(prompt, **self._params(kwargs))
             return output["choices"][0]["text"].strip()
         except Exception as e:
             print(f"Generation Error: {e}")
             return f"Error generating response: {e}"
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        if not self.llm:
+            yield "Error: Model not loaded."
+            return
+
+        try:
+            started = False
+            for chunk in self.llm(prompt, stream=True, **self._params(kwargs)):
+                text = chunk["choices"][0]["text"]
+                if not started:
+                    # Same leading-whitespace trim as generate()
+                    text = text.lstrip()
+                    started = bool(text)
+                if text:
+                    yield text
+        except Exception as e:
+            print(f"Streaming Generation Error: {e}")
+            yield f"Error generating response: {e}"
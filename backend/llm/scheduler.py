@@ -0,0 +1,211 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterator, Optional
+from backend.core.config import (
+    LLM_CONCURRENCY, LLM_DEFAULT_CONCURRENCY, LLM_MAX_QUEUE, LLM_INTERACTIVE_TIMEOUT, LLM_BATCH_TIMEOUT
+)
+
+# Lower runs first
+INTERACTIVE = 0   # chat
+BATCH = 10        # insights / background work
+
+
+class LLMQueueFull(Exception):
+    """The provider's wait queue is full (or this request was displaced by a more urgent one)"""
+
+
+class LLMTimeout(Exception):
+    """The request's deadline passed while queued or generating"""
+
+
+class _Lane:
+    """
+    Concurrency slots and a bounded priority wait queue for one provider.
+
+    Waiters are served by (priority, arrival). When the queue is full, a
+    newcomer displaces the least urgent waiter if it is more urgent than it,
+    and is rejected otherwise.
+    """
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        # Generations run here so a caller can stop waiting at its deadline;
+        # the slot stays taken until the call really returns
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"llm-{name}")
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = []          # heap of (priority, seq)
+        self._displaced = set()
+        self.running = 0
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "displaced": 0,
+                      "queue_timeouts": 0, "generation_timeouts": 0, "max_queued": 0,
+                      "total_wait_ms": 0.0, "total_run_ms": 0.0}
+
+    def acquire(self, priority: int, deadline: float):
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                worst = max(self._waiting)
+                if worst[0] <= priority:
+                    self.stats["rejected"] += 1
+                    raise LLMQueueFull(f"{self.name} queue is full ({self.max_queue} waiting)")
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                self._displaced.add(worst)
+                self.stats["displaced"] += 1
+                self._cond.notify_all()
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            self.stats["max_queued"] = max(self.stats["max_queued"], len(self._waiting))
+            started = time.monotonic()
+            try:
+                while True:
+                    if entry in self._displaced:
+                        raise LLMQueueFull(f"{self.name} queue is full; displaced by a more urgent request")
+                    if self.running < self.max_concurrency and self._waiting[0] == entry:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["queue_timeouts"] += 1
+                        raise LLMTimeout(f"Timed out waiting for a {self.name} slot")
+                    self._cond.wait(remaining)
+            except BaseException:
+                if entry in self._displaced:
+                    self._displaced.discard(entry)
+                else:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self.running += 1
+            self.stats["total_wait_ms"] += (time.monotonic() - started) * 1000
+            # The next waiter may also fit if more than one slot is free
+            self._cond.notify_all()
+
+    def release(self, run_seconds: float, ok: bool):
+        with self._cond:
+            self.running -= 1
+            self.stats["completed" if ok else "failed"] += 1
+            self.stats["total_run_ms"] += run_seconds * 1000
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            finished = self.stats["completed"] + self.stats["failed"]
+            admitted = finished + self.running
+            by_priority = {}
+            for priority, _ in self._waiting:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+            return {
+                **{k: v for k, v in self.stats.items() if not k.startswith("total_")},
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": len(self._waiting),
+                "queued_by_priority": by_priority,
+                "avg_wait_ms": round(self.stats["total_wait_ms"] / admitted, 1) if admitted else None,
+                "avg_run_ms": round(self.stats["total_run_ms"] / finished, 1) if finished else None,
+            }
+
+
+class LLMScheduler:
+    """
+    Single entry point for LLM calls: per-provider concurrency limits (the
+    llama-cpp Llama object must never run two generations at once), a
+    bounded priority queue in front of each provider, and a deadline per
+    request that covers both queueing and generation.
+
+    Deadlines: a request that can't get a slot in time fails with
+    LLMTimeout. A blocking generate() that overruns is abandoned by the
+    caller, but keeps its slot until it actually returns. A stream is cut
+    off between pieces. Providers also get the remaining time as
+    timeout=... (Gemini passes it to the API call).
+    """
+    def __init__(self, concurrency: Dict[str, int] = LLM_CONCURRENCY, default_concurrency: int = LLM_DEFAULT_CONCURRENCY,
+                 max_queue: int = LLM_MAX_QUEUE,
+                 timeouts: Optional[Dict[int, float]] = None):
+        self.concurrency = concurrency
+        self.default_concurrency = default_concurrency
+        self.max_queue = max_queue
+        self.timeouts = timeouts or {INTERACTIVE: LLM_INTERACTIVE_TIMEOUT, BATCH: LLM_BATCH_TIMEOUT}
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, provider) -> _Lane:
+        name = getattr(provider, "name", type(provider).__name__)
+        with self._lock:
+            if name not in self._lanes:
+                limit = self.concurrency.get(name, self.default_concurrency)
+                self._lanes[name] = _Lane(name, max(1, limit), self.max_queue)
+            return self._lanes[name]
+
+    def _deadline(self, priority: int, timeout: Optional[float]) -> float:
+        if timeout is None:
+            timeout = self.timeouts.get(priority, max(self.timeouts.values()))
+        return time.monotonic() + timeout
+
+    def generate(self, provider, prompt: str, priority: int = INTERACTIVE,
+                 timeout: Optional[float] = None, **kwargs) -> str:
+        """provider.generate through the provider's queue; raises LLMQueueFull / LLMTimeout"""
+        lane = self._lane(provider)
+        deadline = self._deadline(priority, timeout)
+        lane.acquire(priority, deadline)
+
+        def run():
+            started, ok = time.monotonic(), False
+            try:
+                result = provider.generate(prompt, timeout=max(deadline - started, 0.001), **kwargs)
+                ok = True
+                return result
+            finally:
+                lane.release(time.monotonic() - started, ok)
+
+        try:
+            future = lane.executor.submit(run)
+        except BaseException:
+            lane.release(0.0, False)
+            raise
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            with lane._cond:
+                lane.stats["generation_timeouts"] += 1
+            raise LLMTimeout(f"{lane.name} generation exceeded its deadline")
+
+    def stream(self, provider, prompt: str, priority: int = INTERACTIVE,
+               timeout: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """provider.stream through the provider's queue; the slot is held until the stream ends or is closed"""
+        lane = self._lane(provider)
+        deadline = self._deadline(priority, timeout)
+        lane.acquire(priority, deadline)
+
+        started, ok = time.monotonic(), False
+        try:
+            for piece in provider.stream(prompt, timeout=max(deadline - started, 0.001), **kwargs):
+                if time.monotonic() > deadline:
+                    with lane._cond:
+                        lane.stats["generation_timeouts"] += 1
+                    raise LLMTimeout(f"{lane.name} stream exceeded its deadline")
+                yield piece
+            ok = True
+        finally:
+            lane.release(time.monotonic() - started, ok)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {
+            "providers": {name: lane.get_stats() for name, lane in lanes.items()},
+            "timeouts_s": {("interactive" if p == INTERACTIVE else "batch" if p == BATCH else str(p)): t
+                           for p, t in self.timeouts.items()}
+        }
+
+
+# Global instance
+llm_scheduler = LLMScheduler()
@@ -1,9 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import os
 
 from backend.core.config import UPLOAD_DIR
-from backend.api import upload, train, predict, history, search, chat, notifications
+from backend.core.database import close_all_db_connections
+from backend.services.persistence_service import persistence_writer
+from backend.services.retention_service import retention_service
+from backend.services.analytics_service import analytics_service
+from backend.api import upload, train, predict, history, search, chat, notifications, maintenance, leads, analytics
 
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -18,15 +23,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Transport compression for large result payloads (all wire formats)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include Routers
 app.include_router(upload.router)
 app.include_router(train.router)
 app.include_router(predict.router)
 app.include_router(history.router)
 app.include_router(chat.router)
-# app.include_router(search.router) # Removed
+app.include_router(maintenance.router)
+app.include_router(leads.router)
+app.include_router(analytics.router)
+app.include_router(search.router)
 # app.include_router(notifications.router) # Removed
 
+@app.on_event("startup")
+def start_retention():
+    # Periodic archival + incremental vacuum (RETENTION_INTERVAL_MINUTES)
+    retention_service.start_background()
+
+@app.on_event("startup")
+def reconcile_persistence():
+    # Runs whose queued writes died with a previous process
+    persistence_writer.reconcile_orphans()
+
+@app.on_event("startup")
+def start_analytics():
+    # Feed the analytics store as runs finish, and catch up on any it missed
+    persistence_writer.add_completion_hook(analytics_service.on_run_complete)
+    analytics_service.sync()
+
+@app.on_event("shutdown")
+def shutdown_db():
+    # Finish queued lead writes before the process exits
+    persistence_writer.stop()
+    close_all_db_connections()
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Nutto Hybrid Engine v2"}
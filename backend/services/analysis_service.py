@@ -1,50 +1,116 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+from backend.core.config import ANALYSIS_CONTEXT_TTL, ANALYSIS_PRECOMPUTE_MAX_PENDING
 from backend.services.ml_service import ml_service
+from backend.services.csv_service import read_csv_safe
+from backend.services.cache_service import cache_service, cached_file_hash
+from backend.services.profiling_service import sample_frame, numeric_summary, top_correlated_pairs, top_categories
+
+# Context warm-ups after prediction: one worker, each file queued at most once,
+# and a bounded backlog (each queued job holds its file's DataFrame)
+_precompute_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-precompute")
+_precompute_pending = set()
+_precompute_lock = threading.Lock()
 
 class AnalysisService:
     @staticmethod
-    def perform_deep_analysis(df: pd.DataFrame, filename: str) -> str:
+    def context_cache_key(file_hash: str) -> str:
+        # Scores in the context depend on the model, so a retrain invalidates it
+        return f"analysis:{file_hash}:{ml_service.model_version or 'untrained'}"
+
+    @staticmethod
+    def get_analysis_context(file_path: str, filename: str, df: pd.DataFrame = None,
+                             scores: list = None, file_hash: str = None) -> str:
+        """
+        Deep analysis context for a file, computed once per (file hash, model
+        version) and kept in the result cache. Pass df/scores when the caller
+        already has them (after prediction) to skip re-reading and re-scoring.
+        """
+        file_hash = file_hash or cached_file_hash(file_path)
+        key = AnalysisService.context_cache_key(file_hash)
+        context = cache_service.get(key)
+        if context:
+            return context
+
+        if df is None:
+            df = read_csv_safe(file_path)
+        context = AnalysisService.perform_deep_analysis(df, filename, scores)
+        if not context.startswith("Error performing analysis"):
+            cache_service.set(key, context, ttl=ANALYSIS_CONTEXT_TTL)
+        return context
+
+    @staticmethod
+    def precompute_context(file_path: str, filename: str, df: pd.DataFrame = None,
+                           scores: list = None, file_hash: str = None):
+        """Background warm-up (upload / after prediction) so the first chat turn is a cache hit"""
+        try:
+            AnalysisService.get_analysis_context(file_path, filename, df, scores, file_hash)
+        except Exception as e:
+            print(f"Analysis precompute failed for {filename}: {e}")
+
+    @staticmethod
+    def schedule_precompute(file_path: str, filename: str, file_hash: str,
+                            df: pd.DataFrame = None, scores: list = None) -> bool:
+        """
+        Run precompute_context on the shared warm-up worker. Skipped (False) when
+        the file is already queued or the backlog is full: the first chat turn
+        then computes the context itself.
+        """
+        with _precompute_lock:
+            if file_hash in _precompute_pending or len(_precompute_pending) >= ANALYSIS_PRECOMPUTE_MAX_PENDING:
+                return False
+            _precompute_pending.add(file_hash)
+
+        def job():
+            try:
+                AnalysisService.precompute_context(file_path, filename, df, scores, file_hash)
+            finally:
+                with _precompute_lock:
+                    _precompute_pending.discard(file_hash)
+
+        _precompute_pool.submit(job)
+        return True
+
+    @staticmethod
+    def perform_deep_analysis(df: pd.DataFrame, filename: str, scores: list = None) -> str:
         """
         Generates a deep analysis context string from a DataFrame.
         Includes basic stats, correlations, categorical breakdowns, and lead scoring context.
+        scores (aligned with df) skips re-running the model.
         """
         try:
-             # 1. Basic Stats
-            desc = df.describe().to_string()
+            # Bounded-cost profile: exact moments, sampled quantiles/correlations/counts
+            # (see profiling_service for the accuracy bounds)
+            sample, sampled = sample_frame(df)
+            note = f" (quantiles, correlations and counts estimated from a {len(sample)}-row sample)" if sampled else ""
+
+            # 1. Basic Stats
+            desc = numeric_summary(df, sample if sampled else None).to_string()
             
-            # 2. Correlations (Numerical)
-            numeric_df = df.select_dtypes(include=['number'])
+            # 2. Correlations (Numerical): strongest pairs with |r| > 0.5
             correlations = ""
-            if not numeric_df.empty:
-                 corr_matrix = numeric_df.corr()
-                 # Find strong correlations (> 0.5)
-                 strong_pairs = []
-                 for i in range(len(corr_matrix.columns)):
-                     for j in range(i):
-                         if abs(corr_matrix.iloc[i, j]) > 0.5:
-                             strong_pairs.append(f"{corr_matrix.columns[i]} vs {corr_matrix.columns[j]}: {corr_matrix.iloc[i, j]:.2f}")
-                 if strong_pairs:
-                     correlations = "Strong Correlations:\n" + "\n".join(strong_pairs)
+            strong_pairs = top_correlated_pairs(sample.select_dtypes(include=['number']))
+            if strong_pairs:
+                correlations = "Strong Correlations:\n" + "\n".join(f"{a} vs {b}: {r:.2f}" for a, b, r in strong_pairs)
             
             # 3. Categorical Counts (Top 5)
             cat_analysis = ""
-            cat_cols = df.select_dtypes(include=['object']).columns
-            for col in cat_cols:
-                if col != 'filename': 
-                     counts = df[col].value_counts().head(5).to_dict()
-                     cat_analysis += f"\nTop 5 {col}: {counts}"
+            for col, counts in top_categories(sample, len(df)).items():
+                cat_analysis += f"\nTop 5 {col}: {counts}"
 
             # 4. Get Lead Data with Predictions (if available)
             lead_data_context = ""
             try:
                 # Attempt to get predictions if they've been run
                 if ml_service:
-                    scores, _, _ = ml_service.predict_score(df)
-                    df['prediction_score'] = scores
+                    if scores is None:
+                        scores, _, _ = ml_service.predict_score(df)
+                    # assign() copies: callers' frames are left untouched
+                    df = df.assign(prediction_score=scores)
                     
-                    # Sort by score and get top 20 for context
-                    df_sorted = df.sort_values(by='prediction_score', ascending=False)
-                    top_leads = df_sorted.head(20)
+                    # Top 20 for context (partial selection, no full sort)
+                    top_leads = df.nlargest(20, 'prediction_score')
                     
                     # Format lead data as a table
                     lead_data_context = "\n\nTOP 20 LEADS (by prediction score):\n"
@@ -72,7 +138,7 @@ class AnalysisService:
             context = f"""
             DEEP DATA ANALYSIS for '{filename}':
             
-            Shape: {df.shape[0]} rows, {df.shape[1]} columns.
+            Shape: {df.shape[0]} rows, {df.shape[1]} columns.{note}
             
             Numeric Summary:
             {desc}
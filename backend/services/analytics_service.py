@@ -0,0 +1,248 @@
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+import pandas as pd
+from backend.core.config import ANALYTICS_ENABLED
+from backend.core.database import get_db_connection
+
+# Optional columnar engine; aggregates fall back to SQLite without it
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+    print("ℹ️ duckdb not installed. Cross-run analytics will query SQLite directly.")
+
+ANALYTICS_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "analytics.duckdb")
+
+# Dialect differences are limited to bucketing; everything else is shared SQL.
+# DuckDB rounds on CAST, so it needs an explicit floor().
+_BUCKET_EXPR = {
+    "duckdb": "LEAST(CAST(floor(prediction_score * ?) AS INTEGER), ? - 1)",
+    "sqlite": "MIN(CAST(prediction_score * ? AS INTEGER), ? - 1)",
+}
+
+
+class AnalyticsService:
+    """
+    Cross-run aggregates for dashboards (sources, conversion vs priority,
+    score histograms over time).
+
+    Hot lead columns are copied into an embedded DuckDB file as each run's
+    write completes (a hook on the persistence writer), so aggregates scan a
+    compressed columnar table instead of loading runs into Python. Without
+    duckdb the same queries run against the SQLite leads table. Either way
+    only complete, unarchived runs are counted (see _run_filter), so the
+    answer doesn't depend on which store gave it; an archived run's rows stay
+    in DuckDB and count again once it is restored.
+
+    DuckDB lets one process hold a file read-write (or several read-only),
+    so no connection is kept open: each ingest opens the file read-write and
+    each query read-only, just for that operation. With several workers they
+    take turns on the lock (retrying briefly); a query that still can't get
+    in is answered from SQLite instead.
+    """
+    LOCK_RETRIES = 20
+    LOCK_RETRY_SECONDS = 0.1
+
+    def __init__(self, db_path: str = ANALYTICS_DB):
+        self.db_path = db_path
+        self.enabled = DUCKDB_AVAILABLE and ANALYTICS_ENABLED
+        self._lock = threading.Lock()   # one duckdb operation at a time in this process
+        self._pending = queue.Queue()
+        self._thread = None
+        self._schema_ready = False
+
+    @property
+    def backend(self) -> str:
+        return "duckdb" if self.enabled else "sqlite"
+
+    def _connect(self, read_only: bool):
+        """Open the store, waiting briefly if another process holds it; None if it can't"""
+        for attempt in range(self.LOCK_RETRIES):
+            try:
+                return duckdb.connect(self.db_path, read_only=read_only)
+            except duckdb.Error as e:
+                error = e
+                time.sleep(self.LOCK_RETRY_SECONDS)
+        print(f"⚠️ Analytics store busy ({error}).")
+        return None
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS lead_facts (
+                run_id INTEGER,
+                run_timestamp TIMESTAMP,
+                filename VARCHAR,
+                lead_id VARCHAR,
+                source VARCHAR,
+                prediction_score DOUBLE,
+                priority VARCHAR,
+                converted INTEGER
+            )
+        ''')
+        # Every ingested run, including ones with no leads (so sync doesn't retry them)
+        conn.execute('CREATE TABLE IF NOT EXISTS synced_runs (run_id INTEGER PRIMARY KEY)')
+        conn.execute('''
+            INSERT OR IGNORE INTO synced_runs SELECT DISTINCT run_id FROM lead_facts
+        ''')
+        self._schema_ready = True
+
+    # --- Ingestion ---
+
+    def on_run_complete(self, run_id: int):
+        """Persistence hook: queue the run so the writer thread isn't held up"""
+        if not self.enabled:
+            return
+        self._start()
+        self._pending.put(run_id)
+
+    def _start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._drain, name="analytics-ingest", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            run_id = self._pending.get()
+            try:
+                self.ingest_run(run_id)
+            except Exception as e:
+                print(f"⚠️ Analytics ingest failed for run {run_id}: {e}")
+            finally:
+                self._pending.task_done()
+
+    def ingest_run(self, run_id: int) -> int:
+        """Copy one run's hot columns into the analytics store (idempotent)"""
+        if not self.enabled:
+            return 0
+
+        sqlite_conn = get_db_connection()
+        df = pd.read_sql_query('''
+            SELECT l.run_id, r.timestamp AS run_timestamp, r.filename, l.lead_id, l.source,
+                   l.prediction_score, l.priority, l.converted
+            FROM leads l JOIN prediction_runs r ON r.run_id = l.run_id
+            WHERE l.run_id = ?
+        ''', sqlite_conn, params=(run_id,))
+
+        df['run_timestamp'] = pd.to_datetime(df['run_timestamp'], errors='coerce')
+        # converted comes straight from the CSV: normalise "", "yes", 1.0 ... to 0/1
+        df['converted'] = pd.to_numeric(df['converted'], errors='coerce').fillna(0).astype(int).clip(0, 1)
+
+        with self._lock:
+            conn = self._connect(read_only=False)
+            if conn is None:
+                raise RuntimeError("analytics store is locked by another process")
+            try:
+                self._ensure_schema(conn)
+                conn.execute('BEGIN TRANSACTION')
+                conn.execute('DELETE FROM lead_facts WHERE run_id = ?', [run_id])
+                if not df.empty:
+                    conn.register('incoming', df)
+                    conn.execute('INSERT INTO lead_facts SELECT * FROM incoming')
+                    conn.unregister('incoming')
+                conn.execute('INSERT OR IGNORE INTO synced_runs VALUES (?)', [run_id])
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        return len(df)
+
+    def sync(self) -> int:
+        """Catch up on complete runs the store hasn't seen (e.g. after enabling duckdb)"""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            conn = self._connect(read_only=False)
+            if conn is None:
+                return 0
+            try:
+                self._ensure_schema(conn)
+                known = {r[0] for r in conn.execute('SELECT run_id FROM synced_runs').fetchall()}
+            finally:
+                conn.close()
+        runs = get_db_connection().execute('''
+            SELECT run_id FROM prediction_runs
+            WHERE persist_status = 'complete' AND archived_at IS NULL
+        ''').fetchall()
+        missing = [r['run_id'] for r in runs if r['run_id'] not in known]
+        for run_id in missing:
+            self.on_run_complete(run_id)
+        return len(missing)
+
+    # --- Queries ---
+
+    def _query(self, sql: str, params: List) -> List[Dict]:
+        """sql uses {table} and {bucket}, filled in for whichever store answers"""
+        if self.enabled and os.path.exists(self.db_path):
+            with self._lock:
+                conn = self._connect(read_only=True)
+                if conn is not None:
+                    try:
+                        cur = conn.execute(sql.format(table="lead_facts", bucket=_BUCKET_EXPR["duckdb"]), params)
+                        cols = [d[0] for d in cur.description]
+                        return [dict(zip(cols, row)) for row in cur.fetchall()]
+                    finally:
+                        conn.close()
+        # SQLite fallback: same columns on the live leads table
+        sqlite_conn = get_db_connection()
+        rows = sqlite_conn.execute(sql.format(table="leads", bucket=_BUCKET_EXPR["sqlite"]), params).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def _run_filter(run_ids: Optional[List[int]]):
+        """WHERE clause for the complete, unarchived runs (of run_ids, if given)"""
+        rows = get_db_connection().execute('''
+            SELECT run_id FROM prediction_runs
+            WHERE persist_status = 'complete' AND archived_at IS NULL
+        ''').fetchall()
+        live = [r['run_id'] for r in rows]
+        if run_ids:
+            wanted = set(run_ids)
+            live = [run_id for run_id in live if run_id in wanted]
+        # IN (NULL) matches nothing: no runs means no rows, not all of them
+        return f"WHERE run_id IN ({', '.join('?' for _ in live) or 'NULL'})", live
+
+    def source_distribution(self, run_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Lead count, mean score and high-priority share per source"""
+        where, params = self._run_filter(run_ids)
+        return self._query(f'''
+            SELECT source,
+                   COUNT(*) AS leads,
+                   AVG(prediction_score) AS avg_score,
+                   SUM(CASE WHEN priority = 'High' THEN 1 ELSE 0 END) AS high_priority
+            FROM {{table}} {where}
+            GROUP BY source
+            ORDER BY leads DESC, source
+        ''', params)
+
+    def conversion_by_priority(self, run_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Actual conversion rate for each predicted priority"""
+        where, params = self._run_filter(run_ids)
+        return self._query(f'''
+            SELECT priority,
+                   COUNT(*) AS leads,
+                   SUM(CASE WHEN converted = 1 THEN 1 ELSE 0 END) AS converted,
+                   AVG(CASE WHEN converted = 1 THEN 1.0 ELSE 0.0 END) AS conversion_rate
+            FROM {{table}} {where}
+            GROUP BY priority
+            ORDER BY priority
+        ''', params)
+
+    def score_histogram(self, bins: int = 10, run_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Score distribution per run (bucket i covers [i/bins, (i+1)/bins))"""
+        where, params = self._run_filter(run_ids)
+        return self._query(f'''
+            SELECT run_id, {{bucket}} AS bucket, COUNT(*) AS leads
+            FROM {{table}} {where}
+            GROUP BY run_id, bucket
+            ORDER BY run_id, bucket
+        ''', [bins, bins] + params)
+
+
+# Global Instance
+analytics_service = AnalyticsService()
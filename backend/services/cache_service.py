@@ -2,15 +2,12 @@ import hashlib
 import json
 import os
 from typing import Dict, Any, Optional
-from backend.core.config import REDIS_URL
-
-# Try importing redis, but don't crash if missing (though it should be installed)
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
-    print("⚠️ Redis library not installed. Falling back to in-memory cache.")
+from backend.core.config import (
+    CACHE_L1_MAX_BYTES, CACHE_L1_MAX_ITEMS, CACHE_L1_TTL, CACHE_CODEC, CACHE_CHUNK_ROWS
+)
+from backend.cache.memory_cache import MemoryCache
+from backend.cache.redis_client import redis_client, REDIS_AVAILABLE
+from backend.cache.codec import get_codec, encode_value, decode_value, parse_header, summary_from_header
 
 def compute_file_hash(file_path: str, chunk_size: int = 4096) -> str:
     """
@@ -27,53 +24,145 @@ def compute_file_hash(file_path: str, chunk_size: int = 4096) -> str:
         print(f"Error computing hash: {e}")
         return "unknown_hash"
 
+_file_hashes: Dict[tuple, str] = {}
+
+def cached_file_hash(file_path: str) -> str:
+    """
+    compute_file_hash, memoized on (path, size, mtime) so repeated lookups of
+    an unchanged upload (e.g. every chat turn) don't re-read the file.
+    """
+    st = os.stat(file_path)
+    key = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+    file_hash = _file_hashes.get(key)
+    if file_hash is None:
+        file_hash = compute_file_hash(file_path)
+        if len(_file_hashes) >= 256:
+            _file_hashes.clear()
+        _file_hashes[key] = file_hash
+    return file_hash
+
 class CacheService:
     """
-    Hybrid Cache Service:
-    1. Attempts to use Redis for production-grade caching.
-    2. Falls back to in-memory dictionary if Redis is unavailable.
+    Two-tier cache:
+    1. L1: bounded in-process LRU (byte budget + TTL), so hot results skip
+       both the network and JSON decoding.
+    2. L2: Redis, shared across workers. Reads go through L1 to L2 and
+       refill L1; writes go to both.
+    Without Redis, L1 alone holds entries for their full TTL.
+
+    In Redis a value is a small header key plus "<key>:chunk:<i>" body keys
+    (see cache/codec.py), so get_summary() can skip the per-lead rows.
     """
-    def __init__(self, redis_url: str = REDIS_URL):
-        self.redis_client = None
-        self.memory_cache = {}
+    def __init__(self, client=redis_client, l1_max_bytes: int = CACHE_L1_MAX_BYTES,
+                 l1_max_items: int = CACHE_L1_MAX_ITEMS, l1_ttl: int = CACHE_L1_TTL,
+                 codec: Optional[str] = CACHE_CODEC, chunk_rows: int = CACHE_CHUNK_ROWS):
+        # Shared pooled client; its circuit breaker bypasses Redis while it's down
+        self.redis_client = client if REDIS_AVAILABLE else None
+        self.memory_cache = MemoryCache(l1_max_bytes, l1_max_items)
+        self.l1_ttl = l1_ttl
+        self.codec = get_codec(codec)
+        self.chunk_rows = chunk_rows
+        self.stats = {"l2_hits": 0, "l2_misses": 0, "errors": 0}
         
-        if REDIS_AVAILABLE:
-            try:
-                # Initialize Redis client
-                self.redis_client = redis.from_url(redis_url, decode_responses=True)
-                # Quick ping to verify connection
-                self.redis_client.ping()
-                print(f"✅ Connected to Redis at {redis_url}")
-            except Exception as e:
-                print(f"⚠️ Redis connection failed ({e}). using in-memory fallback.")
-                self.redis_client = None
+    def _l1_ttl(self, ttl: int) -> int:
+        # With Redis up, L1 is a short-lived copy of the shared entry
+        return min(ttl, self.l1_ttl) if self.redis_client and self.redis_client.healthy else ttl
+        
+    @staticmethod
+    def _chunk_keys(key: str, header: Dict[str, Any]):
+        return [f"{key}:chunk:{i}" for i in range(header["chunks"])]
+
+    def _get_header(self, key: str):
+        """(header, raw); header is None for values written before the codec"""
+        raw = self.redis_client.get(key)
+        if not raw:
+            return None, None
+        return parse_header(raw), raw
         
     def get(self, key: str) -> Optional[Any]:
-        """Retrieve value from cache (Redis or Memory)"""
+        """Retrieve value from cache (L1, then Redis)"""
+        value = self.memory_cache.get(key)
+        if value is not None:
+            return value
+        if not self.redis_client:
+            return None
         try:
-            if self.redis_client:
-                val = self.redis_client.get(key)
-                if val:
-                    return json.loads(val)
+            header, raw = self._get_header(key)
+            if raw is None:
+                self.stats["l2_misses"] += 1
                 return None
+            if header is None:
+                value, size = json.loads(raw), len(raw)
             else:
-                return self.memory_cache.get(key)
+                chunks = self.redis_client.mget(self._chunk_keys(key, header))
+                if any(c is None for c in chunks):
+                    # A body key expired or was evicted ahead of its header
+                    self.stats["l2_misses"] += 1
+                    return None
+                value = decode_value(header, chunks)
+                # Same uncompressed size set() accounts for (compressed length for older headers)
+                size = len(raw) + header.get("raw_size", sum(len(c) for c in chunks))
+            self.stats["l2_hits"] += 1
+            self.memory_cache.set(key, value, size=size, ttl=self.l1_ttl)
+            return value
         except Exception as e:
             print(f"Cache GET error: {e}")
+            self.stats["errors"] += 1
             return None
 
-    def set(self, key: str, value: Any, ttl: int = 3600):
+    def get_summary(self, key: str, rows_key: str = "results") -> Optional[Dict[str, Any]]:
+        """A cached result's fields other than rows_key, without decoding the rows"""
+        value = self.memory_cache.get(key)
+        if isinstance(value, dict):
+            return {k: v for k, v in value.items() if k != rows_key}
+        if not self.redis_client:
+            return None
+        try:
+            header, raw = self._get_header(key)
+            if raw is None:
+                return None
+            if header is None:
+                value = json.loads(raw)
+                return {k: v for k, v in value.items() if k != rows_key} if isinstance(value, dict) else None
+            return summary_from_header(header)
+        except Exception as e:
+            print(f"Cache GET error: {e}")
+            self.stats["errors"] += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: int = 3600, rows_key: str = "results"):
         """Set value in cache with TTL (default 1 hour)"""
         try:
-            json_val = json.dumps(value)
-            
+            header, chunks, size = encode_value(value, self.codec, rows_key, self.chunk_rows)
+            # Uncompressed body size doubles as the L1 size estimate
+            self.memory_cache.set(key, value, size=size, ttl=self._l1_ttl(ttl))
             if self.redis_client:
-                self.redis_client.setex(key, ttl, json_val)
-            else:
-                self.memory_cache[key] = value
-                # Note: Memory cache doesn't implement TTL clean-up in this simple version
+                # One pipelined MULTI; the header goes last so readers never see it without its body
+                items = dict(zip(self._chunk_keys(key, {"chunks": len(chunks)}), chunks))
+                items[key] = header
+                self.redis_client.set_many(items, ttl)
         except Exception as e:
             print(f"Cache SET error: {e}")
+            self.stats["errors"] += 1
+
+    def delete(self, key: str):
+        self.memory_cache.delete(key)
+        try:
+            if self.redis_client:
+                header, _ = self._get_header(key)
+                keys = [key] + (self._chunk_keys(key, header) if header else [])
+                self.redis_client.delete(*keys)
+        except Exception as e:
+            print(f"Cache DELETE error: {e}")
+            self.stats["errors"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for both tiers, plus Redis connection health"""
+        return {
+            "l1": self.memory_cache.get_stats(),
+            "l2": {**self.stats, "backend": "redis" if self.redis_client else None, "codec": self.codec.name},
+            "redis": self.redis_client.get_stats() if self.redis_client else None
+        }
 
 # Global Instance
 cache_service = CacheService()
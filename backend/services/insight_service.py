@@ -0,0 +1,132 @@
+"""
+Background LLM insights for a run's top leads.
+
+After scoring, the best INSIGHT_TOP_LEADS entries of the run's top-K index
+get an explanation / next action / sales notes. Leads are packed
+INSIGHT_BATCH_SIZE to a prompt (one call instead of one per lead) and at
+most INSIGHT_MAX_PARALLEL batches are in flight; the LLM scheduler still
+applies its per-provider limits at BATCH priority, so chat stays ahead.
+
+Insights are cached per lead-feature signature (source, behaviour, rounded
+score): leads with the same profile, in this run or any later one, reuse
+the same insight without another call.
+"""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from backend.core.config import INSIGHT_BATCH_SIZE, INSIGHT_MAX_PARALLEL, INSIGHT_CACHE_TTL
+from backend.core.database import set_run_top_leads, get_run_top_leads
+from backend.services.cache_service import cache_service
+
+# profile field (prompt / signature) -> top-K entry field
+_PROFILE_FIELDS = {
+    "Source": "source",
+    "TimeOnSite": "time_on_site",
+    "PagesVisited": "pages_visited",
+    "MeetingBooked": "meeting_booked",
+    "EmailOpened": "email_opened",
+}
+
+
+class InsightService:
+    def __init__(self, batch_size: int = INSIGHT_BATCH_SIZE, max_parallel: int = INSIGHT_MAX_PARALLEL,
+                 cache_ttl: int = INSIGHT_CACHE_TTL):
+        self.batch_size = max(1, batch_size)
+        self.max_parallel = max(1, max_parallel)
+        self.cache_ttl = cache_ttl
+        self._status: Dict[int, str] = {}   # run_id -> running / complete / failed (this process only)
+        self._lock = threading.Lock()
+        self.stats = {"generated": 0, "cache_hits": 0, "batches": 0, "missing": 0}
+
+    @staticmethod
+    def profile_of(entry: Dict[str, Any]) -> Dict[str, Any]:
+        profile = {field: entry.get(key) for field, key in _PROFILE_FIELDS.items()}
+        profile["score"] = entry.get("score")
+        return profile
+
+    @staticmethod
+    def signature(profile: Dict[str, Any]) -> str:
+        """Stable hash of the features the prompt shows; the score is rounded as in the prompt"""
+        key = [str(profile.get(field)) for field in _PROFILE_FIELDS]
+        key.append(f"{float(profile.get('score') or 0):.2f}")
+        return hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+
+    def _generate_chunk(self, profiles: List[Dict[str, Any]]) -> List[Optional[Dict[str, str]]]:
+        from backend.services.llm_service import generate_insights_batch
+        try:
+            return generate_insights_batch(profiles)
+        except Exception as e:
+            print(f"⚠️ Insight batch failed: {e}")
+            return [None] * len(profiles)
+
+    def generate_batch(self, profiles: List[Dict[str, Any]]) -> List[Optional[Dict[str, str]]]:
+        """Insights aligned with profiles; cached or generated, None where the LLM gave none"""
+        signatures = [self.signature(p) for p in profiles]
+        insights: Dict[str, Optional[Dict[str, str]]] = {}
+        todo = []   # (signature, profile), one per distinct profile
+        for sig, profile in zip(signatures, profiles):
+            if sig in insights:
+                continue
+            cached = cache_service.get(f"insight:v1:{sig}")
+            insights[sig] = cached
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+            else:
+                todo.append((sig, profile))
+
+        if todo:
+            chunks = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(chunks)),
+                                    thread_name_prefix="insights") as pool:
+                outputs = pool.map(lambda chunk: self._generate_chunk([p for _, p in chunk]), chunks)
+                for chunk, results in zip(chunks, outputs):
+                    self.stats["batches"] += 1
+                    for (sig, _), insight in zip(chunk, results):
+                        insights[sig] = insight
+                        if insight is None:
+                            self.stats["missing"] += 1
+                            continue
+                        self.stats["generated"] += 1
+                        cache_service.set(f"insight:v1:{sig}", insight, ttl=self.cache_ttl)
+
+        return [insights[sig] for sig in signatures]
+
+    def enrich_run(self, run_id: int, top_leads: List[Dict[str, Any]]):
+        """Attach insights to the given top-K entries (in place) and save the run's index"""
+        self._status[run_id] = "running"
+        try:
+            insights = self.generate_batch([self.profile_of(entry) for entry in top_leads])
+            for entry, insight in zip(top_leads, insights):
+                if insight is not None:
+                    entry["insight"] = insight
+
+            # Entries past the enriched slice keep whatever they had
+            stored = get_run_top_leads(run_id) or []
+            by_rank = {entry["rank"]: entry for entry in top_leads}
+            merged = [by_rank.get(entry.get("rank"), entry) for entry in stored] if stored else top_leads
+            set_run_top_leads(run_id, merged)
+            self._status[run_id] = "complete"
+            print(f"💡 Insights ready for run {run_id}: {sum(i is not None for i in insights)}/{len(top_leads)} leads")
+        except Exception as e:
+            self._status[run_id] = "failed"
+            print(f"❌ Insight generation failed for run {run_id}: {e}")
+
+    def start(self, run_id: int, top_leads: List[Dict[str, Any]]):
+        """Run enrich_run on a background thread"""
+        with self._lock:
+            if self._status.get(run_id) == "running":
+                return
+            self._status[run_id] = "running"
+        threading.Thread(target=self.enrich_run, args=(run_id, top_leads),
+                         name=f"insights-{run_id}", daemon=True).start()
+
+    def get_status(self, run_id: int) -> Optional[str]:
+        return self._status.get(run_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "runs_in_progress": sum(s == "running" for s in self._status.values())}
+
+
+# Global instance
+insight_service = InsightService()
@@ -1,6 +1,10 @@
+import hashlib
 import json
 import time
 import os
+from backend.services.query_engine import query_engine
+from backend.services.ml_service import ml_service
+from backend.llm.scheduler import llm_scheduler, INTERACTIVE, BATCH, LLMQueueFull, LLMTimeout
 try:
     from backend.services.rag_service import rag_service
 except Exception as e:
@@ -14,7 +18,7 @@ except ImportError:
     LlamaCppProvider = None
 
 try:
-    from backend.cache.chat_cache import ChatCache
+    from backend.cache.chat_cache import ChatCache, semantic_chat_cache
     print("✅ ChatCache module imported.")
 except Exception as e:
     print(f"⚠️ ChatCache import failed: {e}")
@@ -23,7 +27,68 @@ except Exception as e:
         def get_cached_response(*args): return None
         @staticmethod
         def cache_response(*args): pass
+        @staticmethod
+        def lookup(*args, **kwargs): return None, None
+        @staticmethod
+        def store(*args, **kwargs): pass
     ChatCache = MockCache
+    semantic_chat_cache = MockCache
+
+# Static prompt preambles. Prompts start with these verbatim (variable parts
+# last) so llama-cpp can restore their evaluated state instead of re-reading them.
+CHAT_PREAMBLE = """
+    You are a Data Analyst AI.
+    
+    Answer the user's question about the dataset below (concise, data-driven, max 50 words).
+    IMPORTANT: Provide the answer in clean, plain text paragraphs.
+    - Do NOT use Markdown headers (#), bolding (**), or italics (*).
+    - Do NOT use bullet points (-) or pipe characters (|).
+    - Use standard numbered lists (1., 2.) if you need to list items.
+    - Keep the tone professional and conversational.
+    
+"""
+
+INSIGHTS_PREAMBLE = """
+    You are a Sales AI Assistant.
+    For the lead below, provide output in strictly this JSON format:
+    {
+      "explanation": "Why this score? (Max 20 words)",
+      "next_action": "Recommended step (Max 10 words)",
+      "sales_notes": "One helpful tip based on similar leads (Max 20 words)"
+    }
+    
+"""
+
+INSIGHTS_BATCH_PREAMBLE = """
+    You are a Sales AI Assistant.
+    For EACH numbered lead below, write an insight. Reply with strictly a JSON
+    array, one object per lead, in this format:
+    [
+      {"id": 1, "explanation": "Why this score? (Max 20 words)", "next_action": "Recommended step (Max 10 words)", "sales_notes": "One helpful tip (Max 20 words)"}
+    ]
+    
+"""
+
+PROMPT_PREFIXES = [CHAT_PREAMBLE, INSIGHTS_PREAMBLE, INSIGHTS_BATCH_PREAMBLE]
+
+# Structured-output schemas for the insight prompts (json_schema=... on providers)
+INSIGHT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "explanation": {"type": "string"},
+        "next_action": {"type": "string"},
+        "sales_notes": {"type": "string"},
+    },
+    "required": ["explanation", "next_action", "sales_notes"],
+}
+INSIGHT_BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"id": {"type": "integer"}, **INSIGHT_SCHEMA["properties"]},
+        "required": ["id"] + INSIGHT_SCHEMA["required"],
+    },
+}
 
 # --- LLM INITIALIZATION (LAZY) ---
 llm_primary = None
@@ -50,7 +115,7 @@ def _ensure_llms_loaded():
             # Check if we already have a primary
             if not llm_primary:
                 print("ℹ️ Loading Llama as Primary...")
-                llm_fallback = LlamaCppProvider() # This might take time
+                llm_fallback = LlamaCppProvider(warm_prefixes=PROMPT_PREFIXES) # This might take time
                 llm_primary = llm_fallback
                 llm_fallback = None
             else:
@@ -65,16 +130,33 @@ def _ensure_llms_loaded():
     _llm_initialized = True
     print("✅ LLM Initialization Complete.")
 
-def get_llm_response(prompt, **kwargs):
+def get_prompt_cache_stats():
+    """Prompt-prefix cache use of the loaded providers that keep one (llama-cpp)"""
+    stats = {}
+    for provider in (llm_primary, llm_fallback):
+        if provider is not None and hasattr(provider, "get_cache_stats"):
+            stats[provider.name] = provider.get_cache_stats()
+    return stats
+
+
+AI_BUSY_MESSAGE = "AI Service Busy (too many requests in flight). Please try again shortly."
+
+def get_llm_response(prompt, priority=INTERACTIVE, **kwargs):
     """
-    Orchestrates LLM calls: Primary -> Fallback
+    Orchestrates LLM calls: Primary -> Fallback, through the scheduler
+    (priority INTERACTIVE for chat, BATCH for background work).
+    An overloaded provider answers AI_BUSY_MESSAGE instead of falling back:
+    the fallback is slower, so sending it the overflow would only pile up more.
     """
     _ensure_llms_loaded()
     
     # 1. Try Primary
     if llm_primary:
         try:
-            return llm_primary.generate(prompt, **kwargs)
+            return llm_scheduler.generate(llm_primary, prompt, priority=priority, **kwargs)
+        except (LLMQueueFull, LLMTimeout) as e:
+            print(f"⏳ Primary LLM overloaded: {e}")
+            return AI_BUSY_MESSAGE
         except Exception as e:
             print(f"⚠️ Primary LLM failed: {e}. Switching to fallback...")
             
@@ -83,20 +165,92 @@ def get_llm_response(prompt, **kwargs):
     if not llm_fallback and LlamaCppProvider:
         try:
              print("⏳ Primary failed. Initializing Llama Fallback on-demand...")
-             llm_fallback = LlamaCppProvider()
+             llm_fallback = LlamaCppProvider(warm_prefixes=PROMPT_PREFIXES)
         except Exception as ex:
              print(f"❌ Failed to initialize Llama fallback: {ex}")
 
     if llm_fallback:
         try:
             print("⚡ Using Fallback LLM (Llama)...")
-            return llm_fallback.generate(prompt, **kwargs)
+            return llm_scheduler.generate(llm_fallback, prompt, priority=priority, **kwargs)
+        except (LLMQueueFull, LLMTimeout) as e:
+            print(f"⏳ Fallback LLM overloaded: {e}")
+            return AI_BUSY_MESSAGE
         except Exception as e:
             print(f"❌ Fallback LLM failed: {e}")
             
     return "AI Service Unavailable (Both Primary and Fallback failed)."
 
 
+def stream_llm_response(prompt, priority=INTERACTIVE, **kwargs):
+    """
+    get_llm_response, yielding pieces as they are generated. Falls back to
+    the other provider only if the primary fails before its first piece
+    (a half-sent answer can't be restarted).
+    """
+    _ensure_llms_loaded()
+
+    # 1. Try Primary
+    if llm_primary:
+        started = False
+        try:
+            for piece in llm_scheduler.stream(llm_primary, prompt, priority=priority, **kwargs):
+                started = True
+                yield piece
+            return
+        except (LLMQueueFull, LLMTimeout) as e:
+            if started:
+                raise
+            print(f"⏳ Primary LLM overloaded: {e}")
+            yield AI_BUSY_MESSAGE
+            return
+        except Exception as e:
+            if started:
+                raise
+            print(f"⚠️ Primary LLM stream failed: {e}. Switching to fallback...")
+
+    # 2. Try Fallback
+    global llm_fallback
+    if not llm_fallback and LlamaCppProvider:
+        try:
+             print("⏳ Primary failed. Initializing Llama Fallback on-demand...")
+             llm_fallback = LlamaCppProvider(warm_prefixes=PROMPT_PREFIXES)
+        except Exception as ex:
+             print(f"❌ Failed to initialize Llama fallback: {ex}")
+
+    if llm_fallback:
+        print("⚡ Using Fallback LLM (Llama)...")
+        try:
+            yield from llm_scheduler.stream(llm_fallback, prompt, priority=priority, **kwargs)
+        except (LLMQueueFull, LLMTimeout) as e:
+            print(f"⏳ Fallback LLM overloaded: {e}")
+            yield AI_BUSY_MESSAGE
+        return
+
+    yield "AI Service Unavailable (Both Primary and Fallback failed)."
+
+
+def _parse_json_reply(text, opener, closer):
+    """
+    Schema-constrained replies are bare JSON; anything else (a provider
+    without constrained decoding, an error string) gets the old cleanup:
+    drop code fences and slice from the first opener to the last closer.
+    None if nothing parses.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    clean_text = text.replace("```json", "").replace("```", "").strip()
+    start, end = clean_text.find(opener), clean_text.rfind(closer) + 1
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(clean_text[start:end])
+    except ValueError:
+        return None
+
+
 def generate_insights(lead_data, prediction_score, similar_leads=[]):
     """
     Generates explanation, next action, and notes using embedded LLM + RAG context.
@@ -121,8 +275,7 @@ def generate_insights(lead_data, prediction_score, similar_leads=[]):
         for lead in similar_leads:
             rag_context += f"- Source: {lead.get('Source')}, Outcome: {'Converted' if lead.get('Converted')==1 else 'Lost'} (Sim: {lead.get('similarity_score', 0):.2f})\n"
             
-    prompt = f"""
-    You are a Sales AI Assistant.
+    prompt = f"""{INSIGHTS_PREAMBLE}
     Analyze this NEW LEAD:
     Source: {lead_data.get('Source')}
     TimeOnSite: {lead_data.get('TimeOnSite')} sec
@@ -133,30 +286,24 @@ def generate_insights(lead_data, prediction_score, similar_leads=[]):
     Context:
     {rag_context}
     
-    Provide output in strictly this JSON format:
-    {{
-      "explanation": "Why this score? (Max 20 words)",
-      "next_action": "Recommended step (Max 10 words)",
-      "sales_notes": "One helpful tip based on similar leads (Max 20 words)"
-    }}
+    JSON:
     """
     
     try:
         # Generate
-        response_text = get_llm_response(prompt, max_tokens=150, temperature=0.3)
+        response_text = get_llm_response(prompt, priority=BATCH, max_tokens=150, temperature=0.3,
+                                         json_schema=INSIGHT_SCHEMA)
         
         # Parse JSON
-        clean_text = response_text.replace("```json", "").replace("```", "").strip()
-        start = clean_text.find("{")
-        end = clean_text.rfind("}") + 1
-        if start != -1 and end != -1:
-            return json.loads(clean_text[start:end])
+        insight = _parse_json_reply(response_text, "{", "}")
+        if isinstance(insight, dict):
+            return insight
         else:
-            print(f"JSON Parse Failed. Raw: {clean_text}")
+            print(f"JSON Parse Failed. Raw: {response_text}")
             return {
                 "explanation": f"Score {prediction_score:.2f}",
                 "next_action": "Review lead",
-                "sales_notes": clean_text[:50]
+                "sales_notes": response_text.strip()[:50]
             }
             
     except Exception as e:
@@ -168,15 +315,61 @@ def generate_insights(lead_data, prediction_score, similar_leads=[]):
         }
 
 
-def chat_with_data(user_query, context_data):
+def generate_insights_batch(profiles, priority=BATCH):
     """
-    answers general questions about the lead dataset with Redis Caching.
+    Insights for several leads from one LLM call. profiles are dicts with
+    Source, TimeOnSite, PagesVisited, MeetingBooked, EmailOpened and score.
+    Returns a list aligned with profiles; None where the model's reply had
+    no usable entry (callers decide how to fill those in).
     """
+    _ensure_llms_loaded()
+    if not profiles or (not llm_primary and not llm_fallback):
+        return [None] * len(profiles)
+
+    lines = []
+    for i, p in enumerate(profiles, 1):
+        lines.append(
+            f"    {i}. Source: {p.get('Source')}, TimeOnSite: {p.get('TimeOnSite')} sec, "
+            f"PagesVisited: {p.get('PagesVisited')}, MeetingBooked: {p.get('MeetingBooked')}, "
+            f"EmailOpened: {p.get('EmailOpened')}, AI Prediction Probability: {float(p.get('score') or 0):.2f}"
+        )
+    leads_block = "\n".join(lines)
+    prompt = f"""{INSIGHTS_BATCH_PREAMBLE}
+    LEADS (High probability means likely to convert):
+{leads_block}
     
+    JSON:
+    """
+
+    # ~70 tokens per insight; no blank-line stop, the array spans lines
+    response_text = get_llm_response(prompt, priority=priority, max_tokens=90 * len(profiles),
+                                     temperature=0.3, stop=["User:"], json_schema=INSIGHT_BATCH_SCHEMA)
+    items = _parse_json_reply(response_text, "[", "]")
+    if not isinstance(items, list):
+        print(f"Batch insight JSON parse failed. Raw: {response_text[:200]}")
+        items = []
+
+    by_id = {}
+    for item in items:
+        if isinstance(item, dict) and "id" in item:
+            try:
+                by_id[int(item["id"])] = {k: str(item.get(k, "")) for k in ("explanation", "next_action", "sales_notes")}
+            except (TypeError, ValueError):
+                continue
+    return [by_id.get(i) for i in range(1, len(profiles) + 1)]
+
+
+def _instant_chat_answer(user_query, scope=None):
+    """Answers that need no LLM (structured queries, top leads); None otherwise"""
     # --- DEMO HARDCODE BYPASS (Fastest) ---
     # Move to TOP to simulate instant response without loading LLMs
     try:
         q_lower = user_query.strip().lower()
+
+        # Aggregate / filter questions answered exactly from the scored data
+        structured = query_engine.answer(user_query, scope)
+        if structured:
+            return structured
         
 
                  
@@ -192,49 +385,12 @@ def chat_with_data(user_query, context_data):
                 limit = int(match.group(1))
                 if limit > 20: limit = 20 # Safety cap
             
-            # A. Try Memory Cache First (Fastest)
+            # A/B. Latest prediction (or latest saved run): its precomputed top-K index
             try:
-                import backend.services.prediction_orchestrator as orchestrator
-                # Use the explicit GLOBAL latest first if available (most robust)
-                if orchestrator.LATEST_ANALYSIS_RESULT:
-                     leads = orchestrator.LATEST_ANALYSIS_RESULT.get('results', [])
-                     # Sort by score desc if not already
-                     sorted_leads = sorted(leads, key=lambda x: x.get('score', 0), reverse=True)
-                     top_leads = sorted_leads[:limit]
-                
-
+                from backend.services.top_leads_service import get_top_leads
+                top_leads = get_top_leads(limit, scope)
             except Exception as e:
-                print(f"Cache Access Failed: {e}")
-
-            # B. Try Persistent DB History (Robust Fallback)
-            if not top_leads:
-                try:
-                    from backend.core.database import get_prediction_history, get_leads_by_run
-                    history = get_prediction_history()
-                    if history:
-                        # Sort by timestamp desc just in case
-                        latest_run = history[0]
-                        run_id = latest_run['run_id']
-                        
-                        # Skip dummy run 999 if real data exists
-                        if run_id == 999 and len(history) > 1:
-                            latest_run = history[1]
-                            run_id = latest_run['run_id']
-                        
-                        db_leads = get_leads_by_run(run_id)
-                        # Convert DB objects/dicts to standard dict list
-                        processed_leads = []
-                        for l in db_leads:
-                            raw = l.get('raw_data', {})
-                            processed_leads.append({
-                                "lead_id": raw.get('LeadID') or raw.get('id') or l.get('id'),
-                                "score": l.get('prediction_score', 0),
-                                "explanation": "High engagement signal." # DB might not store explanation in main row
-                            })
-                        processed_leads.sort(key=lambda x: x['score'], reverse=True)
-                        top_leads = processed_leads[:limit]
-                except Exception as e:
-                    print(f"DB History Access Failed: {e}")
+                print(f"Top leads lookup failed: {e}")
 
             # C. Build Response if Data Found
             if top_leads:
@@ -262,16 +418,32 @@ def chat_with_data(user_query, context_data):
     except ImportError:
          pass
 
+    return None
+
+
+def _prepare_chat(user_query, context_data, scope=None):
+    """
+    (answer, None) when the question is answered from cache (or the AI is
+    offline), else (None, job) with the LLM prompt and what caching needs.
+    """
     _ensure_llms_loaded()
     query_norm = user_query.strip().lower()
 
     # 1. Cache Check
     cached_response = ChatCache.get_cached_response(user_query, context_data)
     if cached_response:
-        return cached_response
+        return cached_response, None
+
+    # Rephrasings of an earlier question about the same dataset, scored by the same model
+    # (a retrain changes the answers)
+    vocabulary = query_engine.value_terms(scope)
+    scope = f"{scope or hashlib.md5(str(context_data).encode()).hexdigest()}:{ml_service.model_version or 'untrained'}"
+    cached_response, query_embedding = semantic_chat_cache.lookup(user_query, scope, vocabulary=vocabulary)
+    if cached_response:
+        return cached_response, None
 
     if not llm_primary and not llm_fallback:
-        return "AI is currently unavailable (Models not loaded)."
+        return "AI is currently unavailable (Models not loaded).", None
 
     # 2. Context Optimization
     final_context = context_data
@@ -281,31 +453,48 @@ def chat_with_data(user_query, context_data):
     if len(str(context_data)) > 6000:
          final_context = str(context_data)[:6000] + "\n...[truncated]..."
 
-    prompt = f"""
-    You are a Data Analyst AI.
-    
+    # Fixed preamble, then the dataset (shared by every question about it), then the question:
+    # the longest possible prefix is reusable from the llama prompt cache
+    prompt = f"""{CHAT_PREAMBLE}
     Dataset Context:
     {final_context}
     
     User Question: {user_query}
     
-    Answer (concise, data-driven, max 50 words).
-    IMPORTANT: Provide the answer in clean, plain text paragraphs.
-    - Do NOT use Markdown headers (#), bolding (**), or italics (*).
-    - Do NOT use bullet points (-) or pipe characters (|).
-    - Use standard numbered lists (1., 2.) if you need to list items.
-    - Keep the tone professional and conversational.
+    Answer:
     """
+    return None, {"prompt": prompt, "scope": scope, "embedding": query_embedding, "vocabulary": vocabulary}
+
+
+def _cache_chat_answer(user_query, context_data, job, response):
+    if not response.startswith(("AI Service", "Error")):
+        ChatCache.cache_response(user_query, context_data, response)
+        semantic_chat_cache.store(user_query, job["scope"], response, job["embedding"],
+                                  vocabulary=job["vocabulary"])
+
+
+def chat_with_data(user_query, context_data, scope=None):
+    """
+    answers general questions about the lead dataset with Redis Caching.
+    scope identifies the dataset (e.g. file hash) for the semantic answer cache;
+    defaults to a hash of the context.
+    """
+    answer = _instant_chat_answer(user_query, scope)
+    if answer:
+        return answer
+
+    answer, job = _prepare_chat(user_query, context_data, scope)
+    if job is None:
+        return answer
     
     try:
         start_time = time.time()
-        response = get_llm_response(prompt, max_tokens=150, temperature=0.7)
+        response = get_llm_response(job["prompt"], max_tokens=150, temperature=0.7)
         duration = time.time() - start_time
         print(f"DEBUG: AI response took {duration:.2f}s")
         
         # 3. Cache Success
-        if "Service Unavailable" not in response:
-            ChatCache.cache_response(user_query, context_data, response)
+        _cache_chat_answer(user_query, context_data, job, response)
             
         return response
     except Exception as e:
@@ -313,4 +502,38 @@ def chat_with_data(user_query, context_data):
         return "I encountered an error analyzing the data."
 
 
+def stream_chat_with_data(user_query, context_data, scope=None):
+    """
+    chat_with_data, yielding the answer in pieces as the LLM generates it.
+    Instant and cached answers come back as a single piece; the full text is
+    cached once the stream completes.
+    """
+    answer = _instant_chat_answer(user_query, scope)
+    if answer:
+        yield answer
+        return
+
+    answer, job = _prepare_chat(user_query, context_data, scope)
+    if job is None:
+        yield answer
+        return
+
+    pieces = []
+    try:
+        start_time = time.time()
+        for piece in stream_llm_response(job["prompt"], max_tokens=150, temperature=0.7):
+            if not pieces:
+                print(f"DEBUG: AI first token after {time.time() - start_time:.2f}s")
+            pieces.append(piece)
+            yield piece
+        print(f"DEBUG: AI stream took {time.time() - start_time:.2f}s")
+    except Exception as e:
+        print(f"AI Chat Stream Error: {e}")
+        if not pieces:
+            yield "I encountered an error analyzing the data."
+        return
+
+    _cache_chat_answer(user_query, context_data, job, "".join(pieces).strip())
+
+
 
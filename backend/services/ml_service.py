@@ -21,6 +21,7 @@ class MLService:
         self.encoders = {}
         self.model_features = []
         self.training_stats = {} # Stores medians/means from training data
+        self.model_version = None # Changes whenever the model file is rewritten
         self.load_model()
 
     def load_model(self):
@@ -37,6 +38,7 @@ class MLService:
                     else:
                         self.model_features = stats_data
                         self.training_stats = {} 
+                self.model_version = self._model_file_version()
                 print("ML Model and Statistics loaded successfully.")
             except Exception as e:
                 print(f"Error loading model: {e}")
@@ -45,6 +47,10 @@ class MLService:
                 self.model_features = []
                 self.training_stats = {}
 
+    def _model_file_version(self):
+        # Scores from different model files must never be mixed (incremental re-scoring)
+        return str(os.stat(MODEL_PATH).st_mtime_ns) if os.path.exists(MODEL_PATH) else None
+
     def get_model(self):
         return self.model
 
@@ -377,6 +383,7 @@ class MLService:
                 "stats": self.training_stats
             }
             joblib.dump(save_data, FEATURES_PATH)
+            self.model_version = self._model_file_version()
             
             # Calculate Advanced Metrics on Test Set
             y_prob_test = self.model.predict_proba(X_test)[:, 1]
@@ -401,7 +408,36 @@ class MLService:
             traceback.print_exc()
             return {"status": "error", "message": str(e)}
 
-    def predict_score(self, df):
+    def detect_drift(self, df):
+        """True if a key numeric feature's median moved >30% from training"""
+        drift_alert = False
+        try:
+            # Check for significant deviation in key numerical features
+            drift_features = []
+            for col in ['TimeOnSite', 'PagesVisited', 'Age', 'Income', 'CreditScore', 'Marketing_Spend']:
+                stat_key = f"{col}_median"
+                if col in df.columns and stat_key in self.training_stats:
+                    # Get training median
+                    train_med = self.training_stats.get(stat_key)
+                    if train_med and train_med > 0:
+                        current_med = df[col].median()
+                        # Calculate percentage change
+                        pct_change = abs(current_med - train_med) / train_med
+                        if pct_change > 0.3: # >30% deviation
+                            drift_features.append(col)
+            
+            if drift_features:
+                print(f"⚠️  Data Drift Detected in: {drift_features}")
+                drift_alert = True
+        except Exception as e:
+            print(f"Drift check failed: {e}")
+        return drift_alert
+
+    def predict_score(self, df, check_drift=True):
+        """
+        Score a dataframe. check_drift=False skips the drift check, for callers
+        scoring a subset of a file (they check the full file themselves).
+        """
         if not self.model:
             return [0.5] * len(df) # Fallback if not trained
         
@@ -441,28 +477,7 @@ class MLService:
             
             # (Old sampling block removed from here)
                 
-            # --- DRIFT DETECTION ---
-            drift_alert = False
-            try:
-                # Check for significant deviation in key numerical features
-                drift_features = []
-                for col in ['TimeOnSite', 'PagesVisited', 'Age', 'Income', 'CreditScore', 'Marketing_Spend']:
-                    stat_key = f"{col}_median"
-                    if col in df.columns and stat_key in self.training_stats:
-                        # Get training median
-                        train_med = self.training_stats.get(stat_key)
-                        if train_med and train_med > 0:
-                            current_med = df[col].median()
-                            # Calculate percentage change
-                            pct_change = abs(current_med - train_med) / train_med
-                            if pct_change > 0.3: # >30% deviation
-                                drift_features.append(col)
-                
-                if drift_features:
-                    print(f"⚠️  Data Drift Detected in: {drift_features}")
-                    drift_alert = True
-            except Exception as e:
-                print(f"Drift check failed: {e}")
+            drift_alert = self.detect_drift(df) if check_drift else False
 
             # Predict probability of class 1 (Converted)
             probs = self.model.predict_proba(X)[:, 1]
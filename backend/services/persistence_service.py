@@ -0,0 +1,249 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional
+from backend.core.config import PERSIST_CHUNK_ROWS, PERSIST_QUEUE_MAX_CHUNKS, PERSIST_GROUP_COMMIT_ROWS, PERSIST_ORPHAN_MINUTES
+from backend.core.database import (
+    open_db_connection, insert_leads, copy_leads, set_run_persist_status, set_run_payload_path, update_lead_profiles,
+    fail_orphaned_runs, delete_run_leads
+)
+from backend.core.run_store import RUN_STORE_AVAILABLE, write_run_payload, delete_run_payload, run_payload_path
+
+# Sentinel that tells the writer thread to exit after draining
+_STOP = object()
+
+# kind: 'payload' (whole run -> columnar file) or 'rows' (a chunk of lead rows)
+_Job = namedtuple("_Job", ["kind", "run_id", "rows", "is_last"])
+
+
+class PersistenceWriter:
+    """
+    Write-behind queue for scored leads.
+
+    /predict hands the run's leads to enqueue() and returns immediately; a single
+    background thread drains the queue on its own connection and group-commits
+    chunks (several runs may share a transaction). A run's persist_status moves
+    from 'pending' to 'complete' (or 'failed') once its last chunk is committed,
+    which is when it starts showing up in the history list. A failed run's
+    partial rows and payload file are removed and its remaining chunks dropped.
+
+    When the columnar run store is available, each run's full rows are first
+    written to a Parquet payload and the lead rows keep only the hot columns.
+
+    The queue is bounded, so a burst of huge uploads applies backpressure to
+    enqueue() instead of growing memory without limit.
+    """
+    def __init__(self, max_chunks: int = PERSIST_QUEUE_MAX_CHUNKS,
+                 chunk_rows: int = PERSIST_CHUNK_ROWS,
+                 group_rows: int = PERSIST_GROUP_COMMIT_ROWS):
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.chunk_rows = chunk_rows
+        self.group_rows = group_rows
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._status: Dict[int, str] = {}   # in-flight runs only
+        self._columnar: Dict[int, bool] = {}  # runs whose payload file was written
+        self._completion_hooks: List[Callable[[int], None]] = []
+        self.stats = {"chunks_written": 0, "rows_written": 0, "commits": 0, "failed_runs": 0}
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="lead-persistence", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, run_id: int, leads: List[dict], timeout: Optional[float] = None):
+        """
+        Queue a run's leads for writing. Blocks while the queue is full.
+        The run must already exist with persist_status='pending'.
+        """
+        self.start()
+        self._status[run_id] = "pending"
+
+        if not leads:
+            self.queue.put(_Job("rows", run_id, [], True), timeout=timeout)
+            return
+
+        for idx, item in enumerate(leads):
+            item['run_id'] = run_id
+            item['row_idx'] = idx
+
+        if RUN_STORE_AVAILABLE:
+            # FIFO: the payload file is written before any of the run's rows
+            self.queue.put(_Job("payload", run_id, leads, False), timeout=timeout)
+
+        for i in range(0, len(leads), self.chunk_rows):
+            chunk = leads[i:i + self.chunk_rows]
+            is_last = i + self.chunk_rows >= len(leads)
+            self.queue.put(_Job("rows", run_id, chunk, is_last), timeout=timeout)
+
+    def reconcile_orphans(self, older_than_minutes: int = PERSIST_ORPHAN_MINUTES):
+        """
+        Fail runs left 'pending' by a previous process (call on startup). The
+        queue lives in memory, so their remaining chunks are gone; without this
+        they would stay hidden from history forever. The grace period keeps
+        runs another worker is still writing out of it.
+        """
+        run_ids = fail_orphaned_runs(older_than_minutes, exclude=set(self._status))
+        if run_ids:
+            self.stats["failed_runs"] += len(run_ids)
+            print(f"⚠️ Marked {len(run_ids)} orphaned pending run(s) as failed: {run_ids}")
+        return run_ids
+
+    def add_completion_hook(self, hook: Callable[[int], None]):
+        """Call hook(run_id) on the writer thread after a run is durably complete"""
+        self._completion_hooks.append(hook)
+
+    def _notify_complete(self, run_id: int):
+        for hook in self._completion_hooks:
+            try:
+                hook(run_id)
+            except Exception as e:
+                print(f"⚠️ Run completion hook failed for run {run_id}: {e}")
+
+    def get_status(self, run_id: int) -> Optional[str]:
+        """Status for runs this process is still writing (None once settled)"""
+        return self._status.get(run_id)
+
+    def pending_chunks(self) -> int:
+        return self.queue.qsize()
+
+    def flush(self, timeout: float = 30) -> bool:
+        """Wait until everything queued so far is committed"""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks:
+            if time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: float = 30):
+        """Drain outstanding writes and stop the thread (call on shutdown)"""
+        if self._thread and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # --- Writer thread ---
+
+    def _next_group(self):
+        """Block for one chunk, then grab whatever else is ready up to group_rows"""
+        first = self.queue.get()
+        if first is _STOP:
+            return None, True
+        group = [first]
+        rows = len(first.rows) if first.kind == "rows" else 0
+        stop = False
+        while rows < self.group_rows:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            group.append(item)
+            if item.kind == "rows":
+                rows += len(item.rows)
+        return group, stop
+
+    def _run(self):
+        conn = open_db_connection()
+        try:
+            while True:
+                group, stop = self._next_group()
+                if group:
+                    self._write_group(conn, group)
+                if stop or group is None:
+                    break
+        finally:
+            conn.close()
+
+    def _write_payload(self, conn, job):
+        try:
+            path = write_run_payload(job.run_id, [item.get('lead_data', {}) for item in job.rows])
+            set_run_payload_path(job.run_id, path, conn=conn)
+            self._columnar[job.run_id] = True
+        except Exception as e:
+            # Fall back to JSON raw_data rows for this run
+            print(f"⚠️ Run payload write failed for run {job.run_id} ({e}). Storing rows as JSON.")
+            self._columnar[job.run_id] = False
+
+    def _insert_jobs(self, conn, jobs):
+        for job in jobs:
+            if not job.rows:
+                continue
+            if self._columnar.get(job.run_id, False):
+                # Rows unchanged since the base run are copied in SQL
+                copy_leads(conn, [item for item in job.rows if item.get('carried_from')])
+                insert_leads(conn, [item for item in job.rows if not item.get('carried_from')], store_raw=False)
+            else:
+                insert_leads(conn, job.rows, store_raw=True)
+
+    def _commit_jobs(self, conn, jobs):
+        """Write jobs in one transaction (rolled back if any of them fails)"""
+        with conn:
+            self._insert_jobs(conn, jobs)
+        self.stats["commits"] += 1
+        self.stats["chunks_written"] += len(jobs)
+        self.stats["rows_written"] += sum(len(job.rows) for job in jobs)
+
+    def _fail_run(self, conn, run_id):
+        """Mark a run failed and drop what it had written so far (earlier chunks, payload file)"""
+        set_run_persist_status(run_id, "failed", conn=conn)
+        self._status[run_id] = "failed"
+        self.stats["failed_runs"] += 1
+        delete_run_leads(run_id, conn=conn)
+        if self._columnar.get(run_id):
+            set_run_payload_path(run_id, None, conn=conn)
+            delete_run_payload(run_payload_path(run_id))
+
+    def _write_group(self, conn, group):
+        # Chunks of a run that already failed are dropped
+        live = [job for job in group if self._status.get(job.run_id) != "failed"]
+        for job in live:
+            if job.kind == "payload":
+                self._write_payload(conn, job)
+
+        row_jobs = [job for job in group if job.kind == "rows"]
+        live_rows = [job for job in live if job.kind == "rows"]
+        failed = set()
+        try:
+            self._commit_jobs(conn, live_rows)
+        except Exception as e:
+            # Runs only share the transaction for speed: retry each on its own
+            # so one bad chunk doesn't fail the runs batched alongside it
+            print(f"❌ Persistence group write failed ({e}). Retrying run by run.")
+            by_run: Dict[int, List[_Job]] = {}
+            for job in live_rows:
+                by_run.setdefault(job.run_id, []).append(job)
+            for run_id, jobs in by_run.items():
+                try:
+                    self._commit_jobs(conn, jobs)
+                except Exception as e:
+                    print(f"❌ Persistence write failed for run {run_id}: {e}")
+                    failed.add(run_id)
+
+        try:
+            for run_id in failed:
+                self._fail_run(conn, run_id)
+            for job in row_jobs:
+                if not job.is_last:
+                    continue
+                # A run stays failed if any of its chunks failed
+                if self._status.get(job.run_id) != "failed":
+                    set_run_persist_status(job.run_id, "complete", conn=conn)
+                    update_lead_profiles(job.run_id, conn=conn)
+                    self._notify_complete(job.run_id)
+                self._status.pop(job.run_id, None)
+                self._columnar.pop(job.run_id, None)
+        except Exception as e:
+            print(f"❌ Persistence status update failed: {e}")
+        finally:
+            for _ in group:
+                self.queue.task_done()
+
+
+# Global Instance
+persistence_writer = PersistenceWriter()
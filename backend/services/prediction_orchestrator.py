@@ -1,9 +1,15 @@
+import numpy as np
 import pandas as pd
 from backend.services.ml_service import ml_service
 from backend.services.result_processor import ResultProcessor
-from backend.core.database import save_leads_batch, save_prediction_run, create_notification
+from backend.services.analysis_service import AnalysisService
+from backend.services.top_leads_service import build_top_leads
+from backend.core.database import save_prediction_run, create_notification, get_delta_base_run, get_run_row_hashes
+from backend.core.run_store import RUN_STORE_AVAILABLE
+from backend.services.persistence_service import persistence_writer
 from backend.services.cache_service import cache_service, compute_file_hash
-from backend.core.config import UPLOAD_DIR
+from backend.services.insight_service import insight_service
+from backend.core.config import UPLOAD_DIR, INSIGHT_TOP_LEADS
 import os
 
 
@@ -12,6 +18,51 @@ import os
 # Global to hold latest result for immediate chat access
 LATEST_ANALYSIS_RESULT = None
 
+def _row_hashes(df: pd.DataFrame):
+    """
+    Content hash per row (int64 so SQLite can store it), keyed later by LeadID.
+    None when the file has no unique LeadID column to diff on.
+    """
+    if 'LeadID' not in df.columns or df['LeadID'].astype(str).duplicated().any():
+        return None
+    return pd.util.hash_pandas_object(df, index=False).values.view('int64')
+
+def _plan_incremental(df: pd.DataFrame, filename: str, row_hashes):
+    """
+    Diff a re-uploaded file against the latest run of the same file (same
+    model). Returns None for a full re-score, else the base run and, aligned
+    with df, which rows are unchanged plus their stored scores/explanations.
+    """
+    model_version = ml_service.model_version
+    if row_hashes is None or not model_version or not RUN_STORE_AVAILABLE:
+        return None
+
+    base = get_delta_base_run(filename, model_version)
+    # Carried rows are copied into the new run in SQL, which needs a columnar base run
+    if not base or not base.get('payload_path'):
+        return None
+    previous = get_run_row_hashes(base['run_id'])
+    if not previous:
+        return None
+
+    unchanged = np.zeros(len(df), dtype=bool)
+    scores = np.zeros(len(df))
+    explanations = [None] * len(df)
+    for i, (lead_id, row_hash) in enumerate(zip(df['LeadID'].astype(str), row_hashes.tolist())):
+        prev = previous.get(lead_id)
+        # A stored NULL score can't be carried over: treat the row as changed and re-score it
+        if prev is not None and prev[0] == row_hash and prev[1] is not None:
+            unchanged[i] = True
+            scores[i] = prev[1]
+            explanations[i] = prev[3]
+
+    return {
+        "base_run_id": base['run_id'],
+        "unchanged": unchanged,
+        "scores": scores,
+        "explanations": explanations
+    }
+
 def orchestrate_prediction(df: pd.DataFrame, filename: str):
     """
     Orchestrates the prediction flow:
@@ -43,10 +94,41 @@ def orchestrate_prediction(df: pd.DataFrame, filename: str):
         raise Exception("ML Service unavailable")
 
     # 1. Get ML Scores (Vectorized - Fast)
-    scores, missing_feature_count, drift_alert = ml_service.predict_score(df)
+    # Re-uploads of a known file only score rows whose content changed
+    row_hashes = _row_hashes(df)
+    plan = _plan_incremental(df, filename, row_hashes)
+    explanations = None
+    rescored_leads = len(df)
+
+    if plan is not None:
+        unchanged = plan["unchanged"]
+        scores = plan["scores"]
+        rescored_leads = int((~unchanged).sum())
+        missing_feature_count = 0
+        if rescored_leads:
+            new_scores, missing_feature_count, _ = ml_service.predict_score(df[~unchanged], check_drift=False)
+            scores[~unchanged] = new_scores
+        drift_alert = ml_service.detect_drift(df)
+        scores = scores.tolist()
+        explanations = plan["explanations"]
+        print(f"♻️ Incremental run: re-scored {rescored_leads} of {len(df)} leads (base run {plan['base_run_id']})")
+    else:
+        scores, missing_feature_count, drift_alert = ml_service.predict_score(df)
     
     # 2. Process Results (Vectorized - Instant)
-    results, leads_to_db, counts, accuracy_agg = ResultProcessor.process_leads(df, scores)
+    results, leads_to_db, counts, accuracy_agg = ResultProcessor.process_leads(df, scores, explanations)
+    top_leads = build_top_leads(results)
+
+    if row_hashes is not None:
+        # Tag rows with their hash (for the next upload's diff) and mark the
+        # unchanged ones to be copied from the base run instead of re-inserted
+        hash_by_id = dict(zip(df['LeadID'].astype(str), row_hashes.tolist()))
+        carried_ids = set(df['LeadID'].astype(str)[plan["unchanged"]]) if plan is not None else set()
+        for item in leads_to_db:
+            lead_id = str(item['lead_data'].get('LeadID', ''))
+            item['row_hash'] = hash_by_id.get(lead_id)
+            if lead_id in carried_ids:
+                item['carried_from'] = plan["base_run_id"]
 
     # 3. Advanced Metrics Calculation
     overall_accuracy = 0.0
@@ -91,14 +173,22 @@ def orchestrate_prediction(df: pd.DataFrame, filename: str):
         low_count=counts["Low"],
         accuracy=calculated_accuracy if calculated_accuracy is not None else overall_accuracy,
         has_actual_data=accuracy_agg["total_with_actual"] > 0,
-        metrics=advanced_metrics
+        metrics=advanced_metrics,
+        persist_status="pending",
+        model_version=ml_service.model_version,
+        base_run_id=plan["base_run_id"] if plan is not None else None,
+        rescored_leads=rescored_leads,
+        top_leads=top_leads
     )
     
     if run_id:
-        # HEAVY WRITE: Save every single lead to DB
-        for item in leads_to_db:
-            item['run_id'] = run_id
-        save_leads_batch(leads_to_db)
+        # HEAVY WRITE: handed to the background writer so the response doesn't wait on it.
+        # The run shows up in history once its leads are committed.
+        persistence_writer.enqueue(run_id, leads_to_db)
+        # LLM insights for the best leads, filled into the run's index in the background
+        if INSIGHT_TOP_LEADS > 0:
+            # Copies: the thread fills them in while the result is still being cached and rendered
+            insight_service.start(run_id, [dict(e) for e in top_leads[:INSIGHT_TOP_LEADS]])
         
     # 5. Notification
     create_notification(
@@ -108,11 +198,18 @@ def orchestrate_prediction(df: pd.DataFrame, filename: str):
     
     final_result = {
         "run_id": run_id,
+        "persist_status": "pending" if run_id else None,
         "filename": filename,
         "results": results,
+        "top_leads": top_leads,
         "has_actual_data": accuracy_agg["total_with_actual"] > 0,
         "missing_feature_count": missing_feature_count,
         "drift_alert": drift_alert,
+        "incremental": {
+            "base_run_id": plan["base_run_id"],
+            "rescored_leads": rescored_leads,
+            "carried_leads": total_count - rescored_leads
+        } if plan is not None else None,
         "distribution": counts,
         "accuracy_metrics": {
             "overall_accuracy": overall_accuracy,
@@ -133,5 +230,9 @@ def orchestrate_prediction(df: pd.DataFrame, filename: str):
     # Save to Cache
     if cache_key:
         cache_service.set(cache_key, final_result, ttl=3600)
+
+    # Warm the chat analysis context for this file, reusing the scores we just computed
+    if cache_key and not file_hash.startswith("missing_"):
+        AnalysisService.schedule_precompute(full_path, filename, file_hash, df, scores)
     
     return final_result
@@ -0,0 +1,104 @@
+"""
+Column profiling for wide / tall uploads (used by AnalysisService).
+
+Costs are bounded by sampling:
+- Exact on the full frame (vectorized, one pass over the numeric block):
+  count, mean, std, min, max per numeric column.
+- From a uniform random sample of up to `sample_rows` rows: quartiles,
+  correlations and categorical top-k counts.
+
+Accuracy with a uniform sample of m rows (m = 100k by default; anything at
+or under m rows is exact):
+- Proportions / top-k category shares: standard error <= 0.5/sqrt(m), i.e.
+  within +-0.31 percentage points at 95% for m = 100k. Counts are scaled up
+  from the sample and flagged as estimates.
+- Quantiles: the reported q-quantile is the true quantile at level
+  q +- 1.96*sqrt(q(1-q)/m) (<= +-0.31 percentile points at m = 100k).
+- Pearson r: standard error ~ (1 - r^2)/sqrt(m), so +-0.0062 at 95% for
+  m = 100k, tighter for strongly correlated pairs. Pairs close to the
+  threshold can flip either way within that band. NaNs are mean-imputed
+  (pandas uses pairwise-complete rows), which can only shrink |r|.
+"""
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from backend.core.config import PROFILE_SAMPLE_ROWS, PROFILE_TOP_PAIRS
+
+
+def sample_frame(df: pd.DataFrame, max_rows: int = PROFILE_SAMPLE_ROWS, seed: int = 42) -> Tuple[pd.DataFrame, bool]:
+    """
+    Uniform sample without replacement (what a reservoir sample yields, but
+    the frame is already in memory). Returns (sample, was_sampled).
+    """
+    if len(df) <= max_rows:
+        return df, False
+    return df.sample(n=max_rows, random_state=seed), True
+
+
+def numeric_summary(df: pd.DataFrame, sample: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    describe()-shaped table for numeric columns: moments exact over df,
+    quartiles from sample (df itself when not given).
+    """
+    numeric = df.select_dtypes(include=['number'])
+    if numeric.empty:
+        return pd.DataFrame()
+    values = numeric.to_numpy(dtype='float64')
+
+    with np.errstate(all='ignore'):
+        stats = {
+            "count": np.sum(~np.isnan(values), axis=0),
+            "mean": np.nanmean(values, axis=0),
+            "std": np.nanstd(values, axis=0, ddof=1),
+            "min": np.nanmin(values, axis=0),
+        }
+        sample_values = values if sample is None else sample[numeric.columns].to_numpy(dtype='float64')
+        quartiles = np.nanpercentile(sample_values, [25, 50, 75], axis=0)
+        stats.update({"25%": quartiles[0], "50%": quartiles[1], "75%": quartiles[2]})
+        stats["max"] = np.nanmax(values, axis=0)
+
+    return pd.DataFrame(stats, index=numeric.columns).T
+
+
+def top_correlated_pairs(numeric_df: pd.DataFrame, k: int = PROFILE_TOP_PAIRS,
+                         threshold: float = 0.5) -> List[Tuple[str, str, float]]:
+    """
+    The k most strongly correlated column pairs with |r| > threshold, strongest
+    first. One matrix product plus an upper-triangle argpartition, no Python
+    loop over pairs.
+    """
+    if numeric_df.shape[1] < 2:
+        return []
+    values = numeric_df.to_numpy(dtype='float64')
+    with np.errstate(all='ignore'):
+        # Mean-impute NaNs, standardize, then r = Z'Z / (n - 1)
+        col_means = np.nanmean(values, axis=0)
+        values = np.where(np.isnan(values), col_means, values)
+        std = values.std(axis=0, ddof=1)
+        valid = np.isfinite(std) & (std > 0)  # constant columns have no correlation
+        if valid.sum() < 2:
+            return []
+        columns = numeric_df.columns[valid]
+        z = (values[:, valid] - values[:, valid].mean(axis=0)) / std[valid]
+        corr = (z.T @ z) / (len(z) - 1)
+
+    rows, cols = np.triu_indices(len(columns), k=1)
+    r = corr[rows, cols]
+    strong = np.flatnonzero(np.abs(r) > threshold)
+    if len(strong) > k:
+        strong = strong[np.argpartition(-np.abs(r[strong]), k - 1)[:k]]
+    strong = strong[np.argsort(-np.abs(r[strong]))]
+    return [(columns[rows[i]], columns[cols[i]], float(np.clip(r[i], -1, 1))) for i in strong]
+
+
+def top_categories(sample: pd.DataFrame, total_rows: int, k: int = 5,
+                   exclude: Tuple[str, ...] = ('filename',)) -> Dict[str, Dict]:
+    """Top-k values per text column; counts scaled to total_rows when sampled"""
+    scale = total_rows / len(sample) if len(sample) else 1
+    result = {}
+    for col in sample.select_dtypes(include=['object', 'string']).columns:
+        if col in exclude:
+            continue
+        counts = sample[col].value_counts().head(k)
+        result[col] = {key: int(round(v * scale)) for key, v in counts.items()}
+    return result
@@ -0,0 +1,476 @@
+"""
+Structured answers to aggregate chat questions, without the LLM.
+
+Questions like "how many high priority leads came from Google?", "conversion
+rate by source" or "average time on site for converted leads" are parsed
+into a small plan (filters, optional group-by column, aggregate) and run as
+vectorized pandas over the scored rows of the dataset. Anything the parser
+doesn't fully understand returns None and goes to the LLM: a question is
+only answered here when every word of it was consumed by a column, value,
+comparison, grouping or aggregate (or is filler like "how many"), and it
+has no negation ("not", "excluding", "other than") beyond the few forms
+handled explicitly, so a partial parse never produces a confidently wrong
+number.
+
+Data, first available: the cached prediction for the file (scope), the
+latest in-process prediction, the latest saved run's summary columns.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Result columns that are prose/bookkeeping, never filters or group keys
+_SKIP_COLUMNS = {'explanation', 'next_action', 'sales_notes', 'prediction_accuracy', 'raw_data',
+                 'created_at', 'filename'}
+_CONVERSION_COLUMNS = ('actual_converted', 'Converted', 'converted')
+_MAX_FILTER_CARDINALITY = 50
+_MAX_GROUPS = 20
+
+# normalized phrase -> normalized column name
+_SYNONYMS = {
+    "score": "predictionscore", "scores": "predictionscore", "probability": "predictionscore",
+    "time": "timeonsite", "dwell": "timeonsite", "dwelltime": "timeonsite", "timespent": "timeonsite",
+    "pages": "pagesvisited", "pageviews": "pagesvisited",
+    "channel": "source", "leadsource": "source", "sources": "source", "channels": "source",
+    "engagement": "engagementscore", "interactions": "interactioncount",
+    "priorities": "priority", "tier": "priority",
+    "emails": "emailopened", "meetings": "meetingbooked",
+}
+
+_AGGREGATES = [
+    (r"\b(?:average|avg|mean)\b", "mean"),
+    (r"\bmedian\b", "median"),
+    (r"\b(?:max|maximum|highest|largest|longest|most)\b", "max"),
+    (r"\b(?:min|minimum|lowest|smallest|shortest|least|fewest)\b", "min"),
+    (r"\b(?:total|sum)\b", "sum"),
+]
+_AGG_LABELS = {"mean": "Average", "median": "Median", "max": "Max", "min": "Min", "sum": "Total"}
+_ASCENDING = r"\b(?:lowest|smallest|shortest|least|fewest|worst|bottom)\b"
+
+_COMPARISONS = [
+    (r">=|\bat least\b|\bno less than\b", ">="),
+    (r"<=|\bat most\b|\bno more than\b", "<="),
+    (r">|\bover\b|\babove\b|\bmore than\b|\bgreater than\b|\bhigher than\b", ">"),
+    (r"<|\bunder\b|\bbelow\b|\bless than\b|\blower than\b|\bfewer than\b", "<"),
+]
+_NUMBER = r"(?P<num>-?\d+(?:\.\d+)?)(?:\s*(?P<pct>%))?"
+_NEGATION = r"\b(?:not|no|non|none|nor|never|without|except|excluding|exclude|other than)\b|n't\b"
+_CONVERSION_NEGATION = r"\bunconverted\b|\b(?:not|never|didn't|did not|non)\s*convert(?:ed|s)?\b"
+# Words that carry no condition of their own: question framing, intents, aggregates, grouping
+_FILLER = set("""
+    a an the of in on at to for from with by per and or that which what whats what's is are was were be been
+    do does did have has had how many much number count counts leads lead prospects prospect ones there
+    we our i me my show give tell list please all overall currently scored came come coming got get
+    each every across split breakdown distribution top rate rates conversion convert converts converting
+    percentage percent share proportion fraction average avg mean median max maximum highest largest
+    longest most min minimum lowest smallest shortest least fewest total sum worst bottom best better
+    gives brings drives visit visits visited spend spends spent
+""".split())
+# Yes/no feature columns (normalized name) and the phrasings that mean "flag is set"
+_FLAGS = {
+    "meetingbooked": (r"\b(?:booked|scheduled)\s+(?:a\s+|any\s+|the\s+)?meetings?\b"
+                      r"|\bmeetings?\s+(?:booked|scheduled)\b"
+                      r"|\b(?:with|had|have|has)\s+(?:a\s+|any\s+)?meetings?(?:\s+(?:booked|scheduled))?\b"),
+    "emailopened": (r"\bopened\s+(?:an\s+|the\s+|any\s+|our\s+)?emails?\b"
+                    r"|\bemails?\s+opened\b"),
+}
+_VALUE_STOPWORDS = {'yes', 'no', 'true', 'false', 'none', 'nan', 'unknown', 'other', 'all', 'any', 'na', 'n/a'}
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(text).lower())
+
+
+def _dehyphen(text: str) -> str:
+    # "high-priority" == "high priority" (negative numbers keep their sign)
+    return re.sub(r"(?<=[a-z])-(?=[a-z])", " ", text)
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\d+(?:\.\d+)?|[a-z0-9']+|%|[<>]=?", text)
+
+
+def _fmt(value: float) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "n/a"
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}" if abs(value) >= 1 else f"{value:.3f}"
+
+
+def _conversion_series(df: pd.DataFrame) -> Optional[pd.Series]:
+    """1/0 per row (NaN when unknown), from whichever conversion column the data has"""
+    for col in _CONVERSION_COLUMNS:
+        if col in df.columns:
+            raw = df[col].replace("", np.nan)
+            if raw.notna().any():
+                if not pd.api.types.is_numeric_dtype(raw):
+                    text = raw.astype(str).str.strip().str.lower()
+                    mapped = text.map({'true': 1, '1': 1, '1.0': 1, 'yes': 1, 'converted': 1, 'won': 1,
+                                       'false': 0, '0': 0, '0.0': 0, 'no': 0, 'lost': 0})
+                    return mapped.where(raw.notna())
+                return pd.to_numeric(raw, errors='coerce')
+    return None
+
+
+class QueryEngine:
+    def __init__(self, max_frames: int = 4):
+        self._frames: "OrderedDict[Any, Tuple[pd.DataFrame, Dict]]" = OrderedDict()
+        self._max_frames = max_frames
+        self._lock = threading.Lock()
+
+    # --- Data ---
+
+    def _prepare(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+        """Column aliases and the categorical value index, built once per frame"""
+        columns = {}
+        for col in df.columns:
+            if col not in _SKIP_COLUMNS:
+                columns.setdefault(_norm(col), col)
+        # "score" means the unrounded model score when the data has it
+        if 'predictionscore' in columns:
+            columns['score'] = columns['predictionscore']
+        elif 'score' in columns:
+            columns['predictionscore'] = columns['score']
+
+        # "google" -> ('Source', 'Google'): low-cardinality text columns only
+        values = {}
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            if col in _SKIP_COLUMNS or col in _CONVERSION_COLUMNS:
+                continue
+            uniques = df[col].dropna().unique()
+            if len(uniques) > _MAX_FILTER_CARDINALITY:
+                continue
+            for value in uniques:
+                key = _dehyphen(str(value).strip().lower())
+                if len(key) >= 2 and key not in _VALUE_STOPWORDS and not key.replace('.', '').isdigit():
+                    values.setdefault(key, (col, value))
+        meta = {"columns": columns, "values": values, "conversion": _conversion_series(df)}
+        return df, meta
+
+    def _frame(self, key, build) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+        df = build()
+        if df is None or df.empty:
+            return None
+        prepared = self._prepare(df)
+        with self._lock:
+            self._frames[key] = prepared
+            while len(self._frames) > self._max_frames:
+                self._frames.popitem(last=False)
+        return prepared
+
+    def _load(self, scope: Optional[str]) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        from backend.services.cache_service import cache_service
+        from backend.core.database import get_latest_top_leads, get_leads_by_run
+        import backend.services.prediction_orchestrator as orchestrator
+
+        if scope:
+            summary = cache_service.get_summary(f"prediction:{scope}")
+            if summary is not None:
+                def from_cache():
+                    cached = cache_service.get(f"prediction:{scope}") or {}
+                    return pd.DataFrame(cached.get('results') or [])
+                found = self._frame(("prediction", scope, summary.get('run_id')), from_cache)
+                if found:
+                    return found
+
+        latest = orchestrator.LATEST_ANALYSIS_RESULT
+        if latest and latest.get('results'):
+            found = self._frame(("latest", latest.get('run_id'), id(latest['results'])),
+                                lambda: pd.DataFrame(latest['results']))
+            if found:
+                return found
+
+        run_id, _ = get_latest_top_leads()
+        if run_id is not None:
+            # Indexed summary columns only; raw payloads aren't needed for aggregates
+            return self._frame(("run", run_id),
+                               lambda: pd.DataFrame(get_leads_by_run(run_id, include_raw=False)))
+        return None
+
+    # --- Parsing ---
+
+    def _resolve_column(self, words: List[str], meta: Dict, from_end: bool = False,
+                        used: Optional[set] = None) -> Optional[str]:
+        """Longest 1-3 word phrase at the start (or end) of words that names a column"""
+        columns = meta["columns"]
+        words = [w for w in words if w not in ('the', 'a', 'an', 'each', 'their', 'its')]
+        for size in (3, 2, 1):
+            if len(words) < size:
+                continue
+            phrase_words = words[-size:] if from_end else words[:size]
+            phrase = _norm("".join(phrase_words))
+            for candidate in (phrase, phrase[:-1] if phrase.endswith("s") else None, _SYNONYMS.get(phrase)):
+                found = None
+                if candidate and candidate in columns:
+                    found = columns[candidate]
+                elif candidate and _SYNONYMS.get(candidate) in columns:
+                    found = columns[_SYNONYMS[candidate]]
+                if found:
+                    if used is not None:
+                        used.update(phrase_words)
+                    return found
+        return None
+
+    def _group_column(self, words: List[str], df: pd.DataFrame, meta: Dict,
+                      used: Optional[set] = None) -> Optional[str]:
+        phrase_used = set()
+        column = self._resolve_column(words, meta, used=phrase_used)
+        # Grouping by a near-unique column (ids, raw scores) isn't a breakdown
+        if column is None or df[column].nunique() > _MAX_FILTER_CARDINALITY:
+            return None
+        if used is not None:
+            used.update(phrase_used)
+        return column
+
+    @staticmethod
+    def _is_column_word(word: str, meta: Dict) -> bool:
+        # Yes/no columns name a condition ("leads with meetings"), so an unconsumed one isn't filler
+        key = _norm(word)
+        return any(k in meta["columns"] and k not in _FLAGS
+                   for k in (key, key[:-1] if key.endswith("s") else None, _SYNONYMS.get(key)) if k)
+
+    def parse(self, question: str, df: pd.DataFrame, meta: Dict) -> Optional[Dict]:
+        """Plan dict (intent, filters, group_by, column, agg, limit), or None if not fully understood"""
+        q = " " + _dehyphen(re.sub(r"[?!,;]", " ", question.lower())) + " "
+        plan = {"filters": [], "group_by": None, "column": None, "agg": None, "limit": None,
+                "ascending": bool(re.search(_ASCENDING, q))}
+        # Every word of the question must end up here (or be filler) for the plan to stand
+        used = set()
+
+        # Questions about individual leads are rank questions (top-K index / LLM)
+        if re.search(r"\b(?:which|what|who)\s+(?:leads?|prospects?|ones)\b|\bwho\b", q):
+            return None
+        # Comparing groups side by side isn't a single filter
+        if re.search(r"\b(?:compared?|comparing|comparison|versus|vs)\b", q):
+            return None
+
+        # Negation flips a filter the parser would otherwise apply as-is ("not from google"),
+        # so only the phrasings handled below are allowed: "no more than" and "didn't convert"
+        conversion_negation = _CONVERSION_NEGATION if meta["conversion"] is not None else None
+        unnegated = re.sub(r"\bno (?:less|more) than\b", " ", q)
+        if conversion_negation:
+            unnegated = re.sub(conversion_negation, " ", unnegated)
+        if re.search(_NEGATION, unnegated):
+            return None
+
+        # Numeric comparisons: "score above 0.8", "more than 5 pages", "time on site >= 300"
+        for pattern, op in _COMPARISONS:
+            spans = []
+            for match in re.finditer(rf"(?P<pre>[a-z_ ]*?)\s*(?P<op>{pattern})\s*{_NUMBER}(?P<post>(?:\s+[a-z_]+){{0,3}})", q):
+                column = (self._resolve_column(match.group("pre").split(), meta, from_end=True, used=used)
+                          or self._resolve_column(match.group("post").split(), meta, used=used))
+                if column is None:
+                    return None
+                value = float(match.group("num")) / (100 if match.group("pct") else 1)
+                plan["filters"].append(("cmp", column, op, value))
+                used.update(_words(match.group("op")))
+                spans.append((match.start("op"), match.end("pct") if match.group("pct") else match.end("num")))
+            for start, end in reversed(spans):
+                q = q[:start] + " " * (end - start) + q[end:]
+
+        # Group-by: "by source", "per priority", "top 3 sources", "which source has ..."
+        explicit = re.findall(r"\b(?:by|per|for each|for every|across|split by)\s+([a-z_ ]+)", q)
+        implicit = re.findall(r"\b(?:which|what)\s+([a-z_ ]+?)\s+(?:has|have|had|is|are|gives|brings|converts?|drives)\b", q)
+        top = re.search(r"\btop\s+(\d+)\s+([a-z_ ]+)", q)
+        for phrase in explicit + implicit + ([top.group(2)] if top else []):
+            plan["group_by"] = self._group_column(phrase.split(), df, meta, used)
+            if plan["group_by"]:
+                break
+        if explicit and plan["group_by"] is None:
+            return None
+        if plan["group_by"]:
+            if top:
+                plan["limit"] = int(top.group(1))
+                used.update(("top", top.group(1)))
+            elif implicit:
+                plan["limit"] = 1
+
+        # What is being measured
+        if re.search(r"\bconversion\b|\bconvert(?:s|ing)?\s+(?:rate|best|most|better)|\bconverts\b", q):
+            if meta["conversion"] is None:
+                return None
+            plan["intent"] = "rate"
+        elif re.search(r"\b(?:how many|number of|count|counts)\b", q):
+            plan["intent"] = "count"
+        elif re.search(r"\b(?:percentage|percent|share|proportion|fraction)\b", q):
+            plan["intent"] = "share"
+        else:
+            for pattern, agg in _AGGREGATES:
+                found = re.search(pattern + r"\s+(?:of\s+)?(?:the\s+)?([a-z_ ]+)", q)
+                if found and plan["group_by"] and found.group(1).split()[0] in ("leads", "lead"):
+                    # "which source has the most leads"
+                    plan["intent"] = "count"
+                    break
+                if found:
+                    column = self._resolve_column(found.group(1).split(), meta, used=used)
+                    if column is None:
+                        return None
+                    if plan["limit"] == 1 and agg in ("max", "min"):
+                        # "which source has the highest time on site": compare group averages
+                        agg = "mean"
+                    plan.update(intent="aggregate", agg=agg, column=column)
+                    break
+            else:
+                if plan["group_by"] and re.search(r"\b(?:breakdown|distribution|split|leads)\b", q):
+                    plan["intent"] = "count"
+                else:
+                    return None
+
+        # "converted leads" / "leads that didn't convert" (a filter unless the rate is the question)
+        if plan["intent"] != "rate" and meta["conversion"] is not None:
+            negated = re.search(conversion_negation, q)
+            converted = re.search(r"\b(?:converted|won)\b", q)
+            if negated:
+                plan["filters"].append(("converted", None, "==", 0))
+                used.update(_words(negated.group(0)))
+            elif converted:
+                plan["filters"].append(("converted", None, "==", 1))
+                used.update(_words(converted.group(0)))
+
+        # Yes/no features: "booked a meeting", "have a meeting booked", "opened the email"
+        for key, pattern in _FLAGS.items():
+            column = meta["columns"].get(key)
+            flagged = re.search(pattern, q) if column else None
+            if flagged:
+                plan["filters"].append(("flag", column, "==", 1))
+                used.update(_words(flagged.group(0)))
+                # "opened the email" is not the Email source
+                q = q[:flagged.start()] + " " * (flagged.end() - flagged.start()) + q[flagged.end():]
+
+        # Categorical values mentioned anywhere: "from google", "high priority"
+        by_column: Dict[str, List] = {}
+        for key, (column, value) in meta["values"].items():
+            if re.search(rf"(?<![a-z0-9]){re.escape(key)}(?![a-z0-9])", q):
+                by_column.setdefault(column, []).append(value)
+                used.update(_words(key))
+        for column, values in by_column.items():
+            plan["filters"].append(("in", column, "in", values))
+
+        # Anything left over ("in the us", "last week", "called twice") is a condition
+        # the plan doesn't apply; answering without it would be confidently wrong
+        leftover = [w for w in _words(q)
+                    if w not in used and w not in _FILLER and not self._is_column_word(w, meta)]
+        if leftover:
+            return None
+        return plan
+
+    # --- Execution ---
+
+    @staticmethod
+    def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+        return pd.to_numeric(df[column].replace("", np.nan), errors='coerce')
+
+    def _apply_filters(self, df: pd.DataFrame, meta: Dict, filters: List) -> Tuple[pd.Series, List[str]]:
+        mask = pd.Series(True, index=df.index)
+        labels = []
+        ops = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+        for kind, column, op, value in filters:
+            if kind == "cmp":
+                mask &= ops[op](self._numeric(df, column), value).fillna(False)
+                labels.append(f"{column} {op} {_fmt(value)}")
+            elif kind == "flag":
+                mask &= (self._numeric(df, column) > 0).fillna(False)
+                labels.append(f"{column} = yes")
+            elif kind == "converted":
+                mask &= (meta["conversion"] == value).fillna(False)
+                labels.append("converted" if value == 1 else "not converted")
+            else:
+                mask &= df[column].isin(value)
+                labels.append(f"{column} = {' or '.join(str(v) for v in value)}")
+        return mask, labels
+
+    def execute(self, plan: Dict, df: pd.DataFrame, meta: Dict) -> str:
+        mask, labels = self._apply_filters(df, meta, plan["filters"])
+        subset = df[mask]
+        where = f" ({', '.join(labels)})" if labels else ""
+        intent = plan["intent"]
+
+        if plan["group_by"]:
+            keys = subset[plan["group_by"]].replace("", "Unknown").fillna("Unknown")
+            if intent == "rate":
+                grouped = meta["conversion"][mask].groupby(keys)
+                table = pd.DataFrame({"value": grouped.mean() * 100, "leads": grouped.size()})
+                header, fmt = "Conversion rate", lambda v: f"{v:.1f}%"
+            elif intent == "aggregate":
+                grouped = self._numeric(subset, plan["column"]).groupby(keys)
+                table = pd.DataFrame({"value": grouped.agg(plan["agg"]), "leads": grouped.size()})
+                header, fmt = f"{_AGG_LABELS[plan['agg']]} {plan['column']}", _fmt
+            else:
+                counts = keys.value_counts()
+                table = pd.DataFrame({"value": counts, "leads": counts})
+                header, fmt = "Leads", _fmt
+            table = table.dropna(subset=["value"]).sort_values("value", ascending=plan["ascending"])
+            if table.empty:
+                return f"No leads match{where}."
+            limit = plan["limit"] or _MAX_GROUPS
+            if plan["limit"] == 1 and intent in ("count", "share"):
+                rank = "fewest" if plan["ascending"] else "most"
+                share = table['leads'].iloc[0] / max(len(subset), 1) * 100
+                return f"**{table.index[0]}** has the {rank} leads{where}: {_fmt(table['leads'].iloc[0])} ({share:.1f}%)."
+            if plan["limit"] == 1:
+                rank = "lowest" if plan["ascending"] else "highest"
+                return (f"**{table.index[0]}** has the {rank} {header[0].lower() + header[1:]}{where}: "
+                        f"{fmt(table['value'].iloc[0])} ({_fmt(table['leads'].iloc[0])} leads).")
+            # Third column: group size, or its share of the matching leads for plain counts
+            if intent in ("count", "share"):
+                third, third_fmt = "Share", lambda v: f"{v / max(len(subset), 1) * 100:.1f}%"
+            else:
+                third, third_fmt = "Leads", _fmt
+            lines = [f"{header} by {plan['group_by']}{where}:\n",
+                     f"| {plan['group_by']} | {header} | {third} |", "|---|---|---|"]
+            for key, row in table.head(limit).iterrows():
+                lines.append(f"| {key} | {fmt(row['value'])} | {third_fmt(row['leads'])} |")
+            if len(table) > limit and not plan["limit"]:
+                lines.append(f"\n({len(table) - limit} more groups not shown)")
+            return "\n".join(lines)
+
+        if intent == "count":
+            share = len(subset) / max(len(df), 1) * 100
+            return f"**{len(subset):,}** leads match{where}, {share:.1f}% of {len(df):,} scored leads."
+        if intent == "share":
+            share = len(subset) / max(len(df), 1) * 100
+            return f"**{share:.1f}%** of leads match{where} ({len(subset):,} of {len(df):,})."
+        if intent == "rate":
+            known = meta["conversion"][mask].dropna()
+            if known.empty:
+                return f"No leads with a known outcome match{where}."
+            return f"Conversion rate{where}: **{known.mean() * 100:.1f}%** ({int(known.sum()):,} of {len(known):,} leads)."
+        values = self._numeric(subset, plan["column"]).dropna()
+        if values.empty:
+            return f"No numeric {plan['column']} values for leads{where}."
+        return f"{_AGG_LABELS[plan['agg']]} {plan['column']}{where}: **{_fmt(values.agg(plan['agg']))}** over {len(values):,} leads."
+
+    def value_terms(self, scope: Optional[str] = None) -> List[str]:
+        """Categorical values in the data ("google", "high"), lowercased; [] when nothing is loaded"""
+        try:
+            loaded = self._load(scope)
+        except Exception:
+            return []
+        return list(loaded[1]["values"]) if loaded else []
+
+    def answer(self, question: str, scope: Optional[str] = None) -> Optional[str]:
+        """Exact answer from the scored data, or None to hand the question to the LLM"""
+        try:
+            loaded = self._load(scope)
+            if loaded is None:
+                return None
+            df, meta = loaded
+            plan = self.parse(question, df, meta)
+            if plan is None:
+                return None
+            return self.execute(plan, df, meta)
+        except Exception as e:
+            print(f"Structured query failed, falling back to LLM: {e}")
+            return None
+
+
+# Global instance
+query_engine = QueryEngine()
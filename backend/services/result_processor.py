@@ -3,9 +3,11 @@ from backend.services.scoring_service import ScoringService
 
 class ResultProcessor:
     @staticmethod
-    def process_leads(df: pd.DataFrame, scores: list):
+    def process_leads(df: pd.DataFrame, scores: list, explanations: list = None):
         """
         Processes leads, determining priorities and accuracy.
+        explanations (aligned with df, None = generate) lets incremental runs
+        reuse the explanations of rows carried over from an earlier run.
         Returns:
             - results: List of dicts for frontend response
             - leads_to_db: List of dicts for database insertion
@@ -37,8 +39,17 @@ class ResultProcessor:
         from backend.services.ml_service import ml_service
         # FIX: Align scores with the sorted dataframe!
         # Previously we passed raw 'scores' which were unsorted, causing a mismatch with 'df_sorted'
-        sorted_scores = df_sorted['prediction_score'].tolist()
-        explanations = ml_service.generate_feature_explanations(df_sorted, sorted_scores)
+        if explanations is None:
+            sorted_scores = df_sorted['prediction_score'].tolist()
+            explanations = ml_service.generate_feature_explanations(df_sorted, sorted_scores)
+        else:
+            # Index-aligned with df; only fill in the rows that have none yet
+            explanations = pd.Series(explanations, index=df.index, dtype=object).reindex(df_sorted.index)
+            todo = explanations.isna()
+            if todo.any():
+                explanations[todo] = ml_service.generate_feature_explanations(
+                    df_sorted[todo], df_sorted.loc[todo, 'prediction_score'].tolist()
+                )
         
         # --- VECTORIZED PROCESSING (Speed Up) ---
         # Instead of iterating rows (slow), we operate on columns (fast)
@@ -157,8 +168,10 @@ class ResultProcessor:
         for r in df_sorted.fillna("").to_dict('records'):
             leads_to_db.append({
                 "lead_data": {k:v for k,v in r.items() if k not in ['score', 'priority', 'explanation', 'next_action', 'sales_notes']},
-                "prediction_score": r['score'],
-                "priority": r['priority']
+                # Unrounded: incremental runs carry this score forward and re-derive priority from it
+                "prediction_score": r['prediction_score'],
+                "priority": r['priority'],
+                "explanation": r['explanation']
             })
              
         return results, leads_to_db, counts, accuracy_aggregates
@@ -0,0 +1,255 @@
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from backend.core.config import (
+    RETENTION_MAX_AGE_DAYS, RETENTION_MAX_RUNS, RETENTION_MAX_DB_MB,
+    RETENTION_NOTIFICATION_DAYS, RETENTION_INTERVAL_MINUTES, VACUUM_PAGES_PER_STEP
+)
+from backend.core.database import (
+    get_db_connection, get_prediction_run, get_leads_by_run, insert_leads,
+    set_run_archived, set_run_payload_path, delete_run_leads, delete_old_notifications, get_db_size_bytes,
+    update_lead_profiles
+)
+from backend.core.run_store import RUN_STORE_AVAILABLE, write_run_payload, delete_run_payload
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "archive")
+
+
+class RetentionService:
+    """
+    Keeps the leads database bounded as the deployment ages.
+
+    Runs that fall outside the policy (older than max_age_days, beyond the
+    newest max_runs, or while the db is over max_db_mb) are archived: their
+    leads are written to a gzip JSONL file, deleted from SQLite in small
+    batches, and the run row stays behind (flagged archived) so history still
+    lists it and it can be restored on demand. Freed pages are returned to
+    the OS with incremental VACUUM steps instead of one long-locking VACUUM.
+
+    Databases created before incremental auto-vacuum need a one-time full
+    VACUUM to switch over; that is never run automatically (it locks the db
+    for as long as it takes to rewrite the file), only through
+    POST /maintenance/vacuum/enable-incremental.
+    """
+    def __init__(self, max_age_days: int = RETENTION_MAX_AGE_DAYS, max_runs: int = RETENTION_MAX_RUNS,
+                 max_db_mb: int = RETENTION_MAX_DB_MB, notification_days: int = RETENTION_NOTIFICATION_DAYS):
+        self.max_age_days = max_age_days
+        self.max_runs = max_runs
+        self.max_db_mb = max_db_mb
+        self.notification_days = notification_days
+        self._lock = threading.Lock()   # one retention pass at a time
+        self._thread = None
+
+    # --- Policy ---
+
+    def select_runs_to_archive(self) -> List[int]:
+        """Live (complete, unarchived) runs the policy says should go, oldest first"""
+        conn = get_db_connection()
+        runs = conn.execute('''
+            SELECT run_id, total_leads,
+                   (julianday('now') - julianday(timestamp)) AS age_days
+            FROM prediction_runs
+            WHERE persist_status = 'complete' AND archived_at IS NULL
+            ORDER BY timestamp DESC, run_id DESC
+        ''').fetchall()
+
+        selected = []
+        for position, run in enumerate(runs):
+            too_old = self.max_age_days and run['age_days'] is not None and run['age_days'] > self.max_age_days
+            too_many = self.max_runs and position >= self.max_runs
+            if too_old or too_many:
+                selected.append(run['run_id'])
+
+        if self.max_db_mb:
+            # Estimate per-lead cost from the current file and archive the
+            # oldest remaining runs until the estimate fits the budget
+            excess = get_db_size_bytes() - self.max_db_mb * 1024 * 1024
+            total_leads = sum(r['total_leads'] or 0 for r in runs) or 1
+            bytes_per_lead = get_db_size_bytes() / total_leads
+            freed = sum((r['total_leads'] or 0) for r in runs if r['run_id'] in selected) * bytes_per_lead
+            for run in reversed(runs):
+                if freed >= excess:
+                    break
+                if run['run_id'] not in selected:
+                    selected.append(run['run_id'])
+                    freed += (run['total_leads'] or 0) * bytes_per_lead
+
+        return sorted(set(selected))
+
+    # --- Archive / Restore ---
+
+    def archive_run(self, run_id: int) -> Optional[str]:
+        """Move a run's leads to data/archive/run_<id>.jsonl.gz and delete them from the db"""
+        run = get_prediction_run(run_id)
+        if not run or run.get('archived_at'):
+            return None
+
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        path = os.path.join(ARCHIVE_DIR, f"run_{run_id}.jsonl.gz")
+        tmp_path = path + ".tmp"
+
+        leads = get_leads_by_run(run_id)
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(json.dumps({"run": run}, default=str) + "\n")
+            for lead in leads:
+                f.write(json.dumps({
+                    "lead_data": lead.get('raw_data') if isinstance(lead.get('raw_data'), dict) else {},
+                    "prediction_score": lead.get('prediction_score'),
+                    "priority": lead.get('priority'),
+                    "lead_id": lead.get('lead_id'),
+                    "source": lead.get('source'),
+                    # Restored runs keep their explanations and stay usable as an incremental base
+                    "explanation": lead.get('explanation'),
+                    "row_hash": lead.get('row_hash'),
+                }, separators=(',', ':'), default=str) + "\n")
+        os.replace(tmp_path, path)
+
+        # The archive is durable; now free the live copy
+        set_run_archived(run_id, path)
+        delete_run_leads(run_id)
+        delete_run_payload(run.get('payload_path'))
+        print(f"📦 Archived run {run_id} ({len(leads)} leads) to {path}")
+        return path
+
+    def restore_run(self, run_id: int) -> int:
+        """Load an archived run back into the db; returns the number of leads restored"""
+        run = get_prediction_run(run_id)
+        if not run:
+            raise ValueError(f"Run {run_id} not found")
+        path = run.get('archive_path')
+        if not run.get('archived_at') or not path:
+            return 0
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Archive file missing: {path}")
+
+        leads = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            next(f)  # run metadata line
+            for idx, line in enumerate(f):
+                item = json.loads(line)
+                # Rows archived without raw data still keep their id/source
+                lead_data = item.get('lead_data') or {'LeadID': item.get('lead_id'), 'Source': item.get('source')}
+                leads.append({
+                    "lead_data": lead_data,
+                    "prediction_score": item.get('prediction_score'),
+                    "priority": item.get('priority'),
+                    "explanation": item.get('explanation'),
+                    "row_hash": item.get('row_hash'),
+                    "run_id": run_id,
+                    "row_idx": idx
+                })
+
+        conn = get_db_connection()
+        columnar = False
+        if RUN_STORE_AVAILABLE and leads:
+            try:
+                payload = write_run_payload(run_id, [item['lead_data'] for item in leads])
+                set_run_payload_path(run_id, payload, conn=conn)
+                columnar = True
+            except Exception as e:
+                print(f"⚠️ Run payload write failed on restore ({e}). Storing rows as JSON.")
+
+        try:
+            for i in range(0, len(leads), 5000):
+                insert_leads(conn, leads[i:i + 5000], store_raw=not columnar)
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            delete_run_leads(run_id)
+            raise
+
+        set_run_archived(run_id, None, conn=conn)
+        # Only advances profiles if this run is newer than what they hold
+        update_lead_profiles(run_id, conn=conn)
+        os.remove(path)
+        print(f"♻️ Restored run {run_id} ({len(leads)} leads)")
+        return len(leads)
+
+    # --- Space reclamation ---
+
+    @staticmethod
+    def incremental_vacuum_enabled() -> bool:
+        return get_db_connection().execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+    def ensure_incremental_vacuum(self) -> bool:
+        """
+        Switch an existing database to auto_vacuum=INCREMENTAL. This needs one
+        full VACUUM (exclusive lock for the whole rewrite), so it's an explicit
+        maintenance step; new databases start incremental. Returns True if the
+        VACUUM ran.
+        """
+        if self.incremental_vacuum_enabled():
+            return False
+        with self._lock:
+            conn = get_db_connection()
+            print("🧹 Enabling incremental auto-vacuum (one-time full VACUUM)...")
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+            return True
+
+    def incremental_vacuum(self, pages_per_step: int = VACUUM_PAGES_PER_STEP, max_steps: int = 1000) -> int:
+        """Release free pages a step at a time; returns pages released"""
+        conn = get_db_connection()
+        released = 0
+        for _ in range(max_steps):
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free == 0:
+                break
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages_per_step)})').fetchall()
+            conn.commit()
+            released += min(free, pages_per_step)
+        return released
+
+    # --- Entry points ---
+
+    def apply(self) -> Dict:
+        """Run one retention pass and return a report"""
+        with self._lock:
+            report = {"archived_runs": [], "notifications_deleted": 0, "pages_released": 0, "errors": []}
+
+            for run_id in self.select_runs_to_archive():
+                try:
+                    if self.archive_run(run_id):
+                        report["archived_runs"].append(run_id)
+                except Exception as e:
+                    print(f"❌ Archiving run {run_id} failed: {e}")
+                    report["errors"].append(f"run {run_id}: {e}")
+
+            if self.notification_days:
+                report["notifications_deleted"] = delete_old_notifications(self.notification_days)
+
+            try:
+                # Without incremental mode freed pages stay in the file for reuse
+                if self.incremental_vacuum_enabled():
+                    report["pages_released"] = self.incremental_vacuum()
+            except Exception as e:
+                print(f"⚠️ Incremental vacuum failed: {e}")
+                report["errors"].append(f"vacuum: {e}")
+
+            report["db_size_mb"] = round(get_db_size_bytes() / (1024 * 1024), 2)
+            return report
+
+    def start_background(self, interval_minutes: int = RETENTION_INTERVAL_MINUTES):
+        """Apply retention periodically on a daemon thread (0 disables)"""
+        if not interval_minutes or (self._thread and self._thread.is_alive()):
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval_minutes * 60)
+                try:
+                    report = self.apply()
+                    if report["archived_runs"]:
+                        print(f"🧹 Retention: {report}")
+                except Exception as e:
+                    print(f"Retention pass failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+
+# Global Instance
+retention_service = RetentionService()
@@ -0,0 +1,154 @@
+import json
+from typing import Any, Dict, Iterator, List, Optional
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+# Optional binary encoders (JSON formats always work without them)
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+# Format name -> media type
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.nutto.columnar+json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "ndjson": "application/x-ndjson",
+}
+
+NDJSON_CHUNK_ROWS = 2000
+
+
+def _dumps(value: Any) -> str:
+    # Compact separators + default=str so numpy/datetime leftovers never crash a response
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def negotiate_format(accept: Optional[str] = None, fmt: Optional[str] = None) -> str:
+    """
+    Picks the wire format for a response.
+    An explicit ?format= wins, otherwise the first known media type in Accept is used.
+    """
+    if fmt:
+        fmt = fmt.strip().lower()
+        if fmt not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}'. Use one of: {', '.join(MEDIA_TYPES)}")
+        return fmt
+
+    if accept:
+        for part in accept.split(","):
+            media = part.split(";")[0].strip().lower()
+            for name, media_type in MEDIA_TYPES.items():
+                if media == media_type:
+                    return name
+    return "json"
+
+
+def to_columnar(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Converts row-oriented records into one array per field.
+    Key names are sent once instead of once per lead.
+    """
+    if not records:
+        return {"columns": [], "length": 0, "data": {}}
+
+    # Rows come from DataFrame.to_dict('records') so keys are usually identical;
+    # still union them (in order) to survive hand-built rows.
+    columns = list(records[0].keys())
+    seen = set(columns)
+    for r in records:
+        if len(r) != len(columns) or any(k not in seen for k in r):
+            for k in r:
+                if k not in seen:
+                    seen.add(k)
+                    columns.append(k)
+
+    data = {col: [r.get(col) for r in records] for col in columns}
+    return {"columns": columns, "length": len(records), "data": data}
+
+
+def _split_payload(payload: Dict[str, Any], rows_key: str):
+    summary = {k: v for k, v in payload.items() if k != rows_key}
+    rows = payload.get(rows_key) or []
+    return summary, rows
+
+
+def _to_arrow_table(rows: List[Dict[str, Any]]):
+    columnar = to_columnar(rows)
+    arrays = {}
+    for col, values in columnar["data"].items():
+        try:
+            arrays[col] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types (e.g. "" fill values in numeric columns): ship as strings
+            arrays[col] = pa.array([None if v is None else str(v) for v in values])
+    return pa.table(arrays)
+
+
+def encode_arrow(payload: Dict[str, Any], rows_key: str = "results") -> bytes:
+    """Arrow IPC stream of the rows; summary fields travel as JSON in the schema metadata."""
+    if not ARROW_AVAILABLE:
+        raise HTTPException(status_code=406, detail="Arrow format requires pyarrow on the server.")
+
+    summary, rows = _split_payload(payload, rows_key)
+    table = _to_arrow_table(rows)
+    table = table.replace_schema_metadata({"summary": _dumps(summary)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_msgpack(payload: Dict[str, Any], rows_key: str = "results") -> bytes:
+    """MessagePack with the rows packed columnar."""
+    if not MSGPACK_AVAILABLE:
+        raise HTTPException(status_code=406, detail="MessagePack format requires msgpack on the server.")
+
+    summary, rows = _split_payload(payload, rows_key)
+    summary[rows_key] = to_columnar(rows)
+    return msgpack.packb(summary, use_bin_type=True, default=str)
+
+
+def iter_ndjson(payload: Dict[str, Any], rows_key: str = "results", chunk_rows: int = NDJSON_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Yields the summary line first, then leads in chunks of newline-delimited JSON.
+    The client can render the first rows while the rest are still being encoded.
+    """
+    summary, rows = _split_payload(payload, rows_key)
+    yield (_dumps({"type": "summary", **summary}) + "\n").encode()
+
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        yield ("\n".join(_dumps(r) for r in chunk) + "\n").encode()
+
+
+def render(payload: Dict[str, Any], fmt: str = "json", rows_key: str = "results") -> Response:
+    """
+    Builds the HTTP response for a result payload in the negotiated format.
+    Transport compression is applied by the GZip middleware in main.py.
+    """
+    media_type = MEDIA_TYPES[fmt]
+
+    if fmt == "ndjson":
+        return StreamingResponse(iter_ndjson(payload, rows_key), media_type=media_type)
+    if fmt == "arrow":
+        return Response(content=encode_arrow(payload, rows_key), media_type=media_type)
+    if fmt == "msgpack":
+        return Response(content=encode_msgpack(payload, rows_key), media_type=media_type)
+    if fmt == "columnar":
+        summary, rows = _split_payload(payload, rows_key)
+        summary[rows_key] = to_columnar(rows)
+        return Response(content=_dumps(summary), media_type=media_type)
+
+    # Plain JSON: encode directly, skipping FastAPI's per-field jsonable_encoder walk
+    return Response(content=_dumps(payload), media_type=media_type)
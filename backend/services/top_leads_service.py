@@ -0,0 +1,106 @@
+"""
+Per-run top-K lead index for "top N leads" / rank questions.
+
+Every completed prediction keeps its TOP_LEADS_K highest-scoring leads,
+already ranked and trimmed to the fields chat displays, in three places:
+the prediction result ("top_leads", which the result cache keeps in the
+chunk header), LATEST_ANALYSIS_RESULT, and prediction_runs.top_leads.
+Serving top N is then a slice of at most K entries, whatever the run size.
+"""
+import heapq
+import math
+from typing import Any, Dict, List, Optional
+from backend.core.config import TOP_LEADS_K
+
+# entry field -> candidate columns in a result row (first non-empty wins)
+_ID_COLUMNS = ('LeadID', 'lead_id', 'LeadID_x', 'Lead Number', 'id')
+_DISPLAY_COLUMNS = {
+    "source": ('Source', 'Lead Source', 'source'),
+    "time_on_site": ('TimeOnSite', 'TimeSpent', 'time_on_site'),
+    "pages_visited": ('PagesVisited', 'pages_visited'),
+    "email_opened": ('EmailOpened', 'email_opened'),
+    "meeting_booked": ('MeetingBooked', 'meeting_booked'),
+}
+
+
+def _first(row: Dict[str, Any], columns) -> Any:
+    for col in columns:
+        value = row.get(col)
+        if value is None or value == "" or (isinstance(value, float) and math.isnan(value)):
+            continue
+        # numpy scalars -> builtins so entries are JSON-safe
+        return value.item() if hasattr(value, "item") else value
+    return None
+
+
+def _score(row: Dict[str, Any]) -> float:
+    score = row.get('prediction_score')
+    if score is None or score == "":
+        score = row.get('score', 0)
+    try:
+        return float(score)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def build_top_leads(results: List[Dict[str, Any]], k: int = TOP_LEADS_K) -> List[Dict[str, Any]]:
+    """The k highest-scoring rows as ranked display entries (O(n log k) heap selection)"""
+    top = heapq.nlargest(k, results, key=_score)
+    entries = []
+    for rank, row in enumerate(top, 1):
+        entry = {
+            "rank": rank,
+            "lead_id": _first(row, _ID_COLUMNS),
+            "score": round(_score(row), 4),
+            "priority": row.get('priority'),
+            "explanation": row.get('explanation') or None,
+        }
+        for field, columns in _DISPLAY_COLUMNS.items():
+            entry[field] = _first(row, columns)
+        entries.append(entry)
+    return entries
+
+
+def top_leads_of(result: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """A prediction result's index; built once for results cached before it existed"""
+    if not result:
+        return None
+    if result.get('top_leads') is not None:
+        return result['top_leads']
+    if result.get('results'):
+        result['top_leads'] = build_top_leads(result['results'])
+        return result['top_leads']
+    return None
+
+
+def get_top_leads(n: int, scope: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    The n best leads (n <= TOP_LEADS_K) for the file with hash scope, else
+    the latest prediction, else the latest saved run. [] when nothing is scored.
+    """
+    from backend.services.cache_service import cache_service
+    from backend.core.database import get_latest_top_leads, get_leads_by_run
+    import backend.services.prediction_orchestrator as orchestrator
+
+    n = max(1, min(n, TOP_LEADS_K))
+
+    if scope:
+        # Header-only read: the index rides along with the summary, no row chunks decoded
+        top = top_leads_of(cache_service.get_summary(f"prediction:{scope}"))
+        if top:
+            return top[:n]
+
+    top = top_leads_of(orchestrator.LATEST_ANALYSIS_RESULT)
+    if top:
+        return top[:n]
+
+    try:
+        run_id, top = get_latest_top_leads()
+        if top:
+            return top[:n]
+        if run_id is not None:
+            # Runs saved before the index: idx_leads_run_score still makes this a LIMIT n seek
+            return build_top_leads(get_leads_by_run(run_id, limit=n, include_raw=False), n)
+    except Exception as e:
+        print(f"Top leads lookup failed: {e}")
+    return []
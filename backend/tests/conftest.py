@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+import pytest
+
+# Importing backend.core.database migrates DB_PATH: keep the suite off backend/data/leads.db
+os.environ.setdefault("LEADS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="leads-test-"), "leads.db"))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, migrated leads database (and run store) for one test"""
+    from backend.core import database, run_store
+
+    database.close_all_db_connections()
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "leads.db"))
+    monkeypatch.setattr(run_store, "RUN_STORE_DIR", str(tmp_path / "runs"))
+    database.init_db()
+    yield database
+    database.close_all_db_connections()
+
+
+@pytest.fixture
+def writer(db):
+    """A persistence writer of its own, so its connection opens on this test's db"""
+    from backend.services.persistence_service import PersistenceWriter
+
+    persistence = PersistenceWriter()
+    yield persistence
+    persistence.stop()
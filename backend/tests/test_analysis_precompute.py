@@ -0,0 +1,28 @@
+import threading
+
+from backend.services import analysis_service
+from backend.services.analysis_service import AnalysisService
+
+
+def test_precompute_is_deduplicated_and_bounded(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_precompute(file_path, filename, df=None, scores=None, file_hash=None):
+        calls.append(file_hash)
+        release.wait(5)
+
+    monkeypatch.setattr(AnalysisService, "precompute_context", staticmethod(slow_precompute))
+    monkeypatch.setattr(analysis_service, "ANALYSIS_PRECOMPUTE_MAX_PENDING", 2)
+
+    assert AnalysisService.schedule_precompute("a.csv", "a.csv", "hash-a")
+    assert not AnalysisService.schedule_precompute("a.csv", "a.csv", "hash-a")   # same file: already queued
+    assert AnalysisService.schedule_precompute("b.csv", "b.csv", "hash-b")
+    assert not AnalysisService.schedule_precompute("c.csv", "c.csv", "hash-c")   # backlog full
+
+    release.set()
+    analysis_service._precompute_pool.submit(lambda: None).result(5)   # single worker: queue drained
+    assert calls == ["hash-a", "hash-b"]
+    assert not analysis_service._precompute_pending
+    assert AnalysisService.schedule_precompute("a.csv", "a.csv", "hash-a")
+    analysis_service._precompute_pool.submit(lambda: None).result(5)
@@ -0,0 +1,61 @@
+import pytest
+
+from backend.services.analytics_service import AnalyticsService, DUCKDB_AVAILABLE
+
+
+def _run(db, leads, persist_status="complete"):
+    run_id = db.save_prediction_run("crm.csv", len(leads), 0, 0, 0, persist_status=persist_status)
+    conn = db.get_db_connection()
+    with conn:
+        db.insert_leads(conn, [
+            {"run_id": run_id, "lead_data": {"LeadID": f"{run_id}-{i}", "Source": source, "Converted": converted},
+             "prediction_score": score, "priority": priority}
+            for i, (source, score, priority, converted) in enumerate(leads)
+        ])
+    return run_id
+
+
+@pytest.fixture
+def runs(db):
+    live = _run(db, [("Google", 0.9, "High", 1), ("Google", 0.2, "Low", 0), ("Email", 0.5, "Medium", 1)])
+    other = _run(db, [("LinkedIn", 0.8, "High", 0)])
+    archived = _run(db, [("Referral", 0.75, "High", 1)] * 3)
+    pending = _run(db, [("Referral", 0.1, "Low", 0)], persist_status="pending")
+    return live, other, archived, pending
+
+
+def _answers(service, run_ids=None):
+    return (
+        service.source_distribution(run_ids),
+        service.conversion_by_priority(run_ids),
+        service.score_histogram(10, run_ids),
+    )
+
+
+@pytest.mark.skipif(not DUCKDB_AVAILABLE, reason="duckdb not installed")
+def test_duckdb_and_sqlite_count_the_same_runs(db, runs, tmp_path):
+    live, other, archived, pending = runs
+    duck = AnalyticsService(db_path=str(tmp_path / "analytics.duckdb"))
+    duck.enabled = True
+    for run_id in (live, other, archived):
+        duck.ingest_run(run_id)
+    # Archival removes the run's rows from SQLite; DuckDB keeps them
+    db.set_run_archived(archived, str(tmp_path / "archive.jsonl.gz"))
+    db.delete_run_leads(archived)
+
+    sqlite = AnalyticsService(db_path=str(tmp_path / "unused.duckdb"))
+    sqlite.enabled = False
+
+    assert _answers(duck) == _answers(sqlite)
+    assert _answers(duck, [live]) == _answers(sqlite, [live])
+    assert {row["source"] for row in duck.source_distribution()} == {"Google", "Email", "LinkedIn"}
+
+
+def test_filter_ignores_archived_and_pending_runs(db, runs):
+    live, other, archived, pending = runs
+    db.set_run_archived(archived, "archive.jsonl.gz")
+    service = AnalyticsService()
+    service.enabled = False
+
+    assert service.source_distribution([archived, pending]) == []
+    assert sum(row["leads"] for row in service.source_distribution()) == 4
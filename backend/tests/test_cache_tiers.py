@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from backend.cache.memory_cache import MemoryCache
+from backend.services import cache_service as cache_module
+from backend.services.cache_service import CacheService
+
+
+class FakeRedis:
+    """Dict-backed stand-in for RedisClient (same method surface CacheService uses)"""
+    healthy = True
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.calls += 1
+        return [self.data.get(k) for k in keys]
+
+    def set_many(self, items, ttl):
+        self.data.update(items)
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+        return len(keys)
+
+    def get_stats(self):
+        return {}
+
+
+def test_lru_evicts_by_bytes_and_items():
+    cache = MemoryCache(max_bytes=400, max_items=3)
+    for key in "abc":
+        assert cache.set(key, key, size=100, ttl=60)
+    cache.get("a")                       # a is now most recent
+    cache.set("d", "d", size=100, ttl=60)
+    assert cache.get("b") is None        # least recently used goes first
+    assert [cache.get(k) for k in "acd"] == ["a", "c", "d"]
+    assert not cache.set("huge", "x", size=101, ttl=60)   # over a quarter of the budget
+    assert cache.get_stats()["bytes"] == 300
+
+
+def test_entries_expire():
+    cache = MemoryCache(max_bytes=1000)
+    cache.set("k", "v", size=1, ttl=0.05)
+    assert cache.get("k") == "v"
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    monkeypatch.setattr(cache_module, "REDIS_AVAILABLE", True)
+    return FakeRedis()
+
+
+def _result(n=12):
+    return {"run_id": 3, "filename": "crm.csv", "results": [{"LeadID": i, "score": i / n} for i in range(n)]}
+
+
+def test_second_worker_reads_through_redis(redis):
+    CacheService(client=redis, chunk_rows=5).set("prediction:h", _result())
+
+    other = CacheService(client=redis, chunk_rows=5)   # empty L1, as in another worker
+    assert other.get("prediction:h") == _result()
+    assert other.stats["l2_hits"] == 1
+    calls = redis.calls
+    assert other.get("prediction:h") == _result()      # refilled L1: no Redis round trip
+    assert redis.calls == calls
+
+
+def test_summary_skips_the_rows(redis):
+    CacheService(client=redis, chunk_rows=5).set("prediction:h", _result())
+    redis.data = {k: v for k, v in redis.data.items() if ":chunk:" not in k}   # bodies unreadable
+
+    other = CacheService(client=redis)
+    assert other.get_summary("prediction:h") == {"run_id": 3, "filename": "crm.csv"}
+    assert other.get("prediction:h") is None           # header without its body is a miss
+
+
+def test_delete_removes_header_and_chunks(redis):
+    cache = CacheService(client=redis, chunk_rows=5)
+    cache.set("prediction:h", _result())
+    cache.delete("prediction:h")
+    assert redis.data == {}
+    assert cache.get("prediction:h") is None
+
+
+def test_without_redis_l1_serves_alone():
+    cache = CacheService(client=None)
+    cache.set("k", {"a": 1}, ttl=60)
+    assert cache.get("k") == {"a": 1}
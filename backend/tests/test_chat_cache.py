@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from backend.cache.chat_cache import SemanticChatCache, normalize_query, query_guard
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # Every query embeds to the same unit vector, so only the guard decides a hit
+    monkeypatch.setattr(SemanticChatCache, "_embed", lambda self, text: np.array([1.0, 0.0], dtype="float32"))
+    return SemanticChatCache(threshold=0.9)
+
+
+def test_synonym_rephrasing_hits(cache):
+    cache.store("top leads?", "run-1", "the answer")
+    answer, _ = cache.lookup("Which leads are best?", "run-1")
+    assert answer == "the answer"
+    assert cache.get_stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("top leads?", "Which leads are worst?"),
+    ("high priority leads", "low priority leads"),
+    ("top 5 leads", "top 10 leads"),
+    ("leads from google", "leads from linkedin"),
+    ("converted leads", "leads that were not converted"),
+])
+def test_different_questions_miss(cache, stored, asked):
+    vocabulary = ("google", "linkedin")
+    cache.store(stored, "run-1", "the answer", vocabulary=vocabulary)
+    answer, _ = cache.lookup(asked, "run-1", vocabulary=vocabulary)
+    assert answer is None
+
+
+def test_scopes_do_not_share_answers(cache):
+    cache.store("top leads?", "run-1", "the answer")
+    answer, _ = cache.lookup("top leads?", "run-2")
+    assert answer is None
+
+
+def test_guard_maps_synonyms_to_one_token():
+    assert query_guard(normalize_query("top leads?")) == query_guard(normalize_query("Which leads are best?"))
+    assert query_guard(normalize_query("hot leads")) == query_guard(normalize_query("high leads"))
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from backend.cache.codec import CODECS, decode_value, encode_value, parse_header, summary_from_header
+
+
+@pytest.fixture(params=sorted(CODECS))
+def codec(request):
+    return CODECS[request.param]
+
+
+def _result(n):
+    return {
+        "run_id": 7,
+        "distribution": {"High": np.int64(3), "Medium": 2, "Low": 1},
+        "results": [{"LeadID": f"L{i}", "score": float(np.float64(i / n))} for i in range(n)],
+    }
+
+
+def test_round_trip_in_chunks(codec):
+    value = _result(12)
+    header_bytes, chunks, size = encode_value(value, codec, chunk_rows=5)
+    header = parse_header(header_bytes)
+
+    assert header["codec"] == codec.name
+    assert (header["rows"], header["chunks"], len(chunks)) == (12, 3, 3)
+    assert size == header["raw_size"] + len(header_bytes)
+    assert summary_from_header(header) == {"run_id": 7, "distribution": {"High": 3, "Medium": 2, "Low": 1}}
+
+    decoded = decode_value(header, chunks)
+    assert decoded["results"] == value["results"]
+    assert decoded["distribution"] == {"High": 3, "Medium": 2, "Low": 1}
+
+
+def test_values_without_rows(codec):
+    header_bytes, chunks, _ = encode_value("plain text context", codec)
+    header = parse_header(header_bytes)
+    assert header["rows_key"] is None and len(chunks) == 1
+    assert decode_value(header, chunks) == "plain text context"
+
+
+def test_empty_row_list(codec):
+    header_bytes, chunks, _ = encode_value({"run_id": 1, "results": []}, codec)
+    assert chunks == []
+    assert decode_value(parse_header(header_bytes), chunks) == {"run_id": 1, "results": []}
+
+
+def test_legacy_values_are_not_headers():
+    assert parse_header(json.dumps({"run_id": 1, "results": []}).encode()) is None
+    assert parse_header(b"not json") is None
+
+
+def test_unknown_codec_is_an_error():
+    header = {"v": 1, "codec": "lz4", "rows_key": None, "chunks": 1}
+    with pytest.raises(ValueError):
+        decode_value(header, [b""])
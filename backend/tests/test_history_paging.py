@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import history
+
+
+@pytest.fixture
+def run_id(db):
+    # Ties and unscored rows: the keyset must still visit every row exactly once
+    scores = [0.9, 0.5, 0.5, 0.5, None, 0.1, None, 0.5, 0.75]
+    run_id = db.save_prediction_run("crm.csv", len(scores), 2, 4, 1)
+    conn = db.get_db_connection()
+    with conn:
+        db.insert_leads(conn, [
+            {"run_id": run_id, "lead_data": {"LeadID": f"L{i}", "Source": "Google"},
+             "prediction_score": score, "priority": None if score is None else "Medium",
+             "explanation": f"why L{i}"}
+            for i, score in enumerate(scores)
+        ])
+    return run_id
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 100])
+def test_pages_cover_the_run_in_score_order(db, run_id, limit):
+    seen, cursor = [], None
+    while True:
+        page, cursor = db.get_leads_page(run_id, limit=limit, cursor=cursor, include_raw=False)
+        assert len(page) <= limit
+        seen += page
+        if cursor is None:
+            break
+
+    assert [lead['lead_id'] for lead in seen] == [lead['lead_id'] for lead in db.get_leads_by_run(run_id)]
+    assert len({lead['id'] for lead in seen}) == 9
+    scores = [lead['prediction_score'] for lead in seen]
+    assert scores[:7] == sorted(scores[:7], reverse=True) and scores[7:] == [None, None]
+
+
+def test_invalid_cursor_is_rejected(db, run_id):
+    with pytest.raises(ValueError):
+        db.get_leads_page(run_id, limit=2, cursor="not-a-cursor")
+
+
+def test_run_detail_first_page_carries_whole_run_counts(db, run_id):
+    app = FastAPI()
+    app.include_router(history.router)
+    client = TestClient(app)
+
+    body = client.get(f"/prediction-history/{run_id}", params={"limit": 3, "include_raw": "false"}).json()
+    assert len(body["results"]) == 3 and body["next_cursor"]
+    assert body["total_leads"] == 9
+    assert body["distribution"] == {"High": 2, "Medium": 4, "Low": 1}
+    assert body["results"][0] == {"LeadID": "L0", "Source": "Google", "score": 0.9, "priority": "Medium",
+                                  "explanation": "why L0"}
+
+    rest = client.get(f"/prediction-history/{run_id}", params={"cursor": body["next_cursor"], "include_raw": "false"}).json()
+    assert len(rest["results"]) == 6 and rest["next_cursor"] is None
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import prediction_orchestrator
+from backend.services.cache_service import CacheService
+from backend.services.ml_service import ml_service
+
+
+def _model_scores(df, check_drift=True):
+    # Deterministic stand-in for the model: unrounded scores straddling the 0.3/0.7 cut-offs
+    scores = (df['TimeOnSite'].to_numpy() % 1000) / 1000 + 0.0004
+    return scores.tolist(), 0, None
+
+
+@pytest.fixture
+def scoring(db, writer, tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_service, "model_version", "test-model")
+    monkeypatch.setattr(ml_service, "predict_score", _model_scores)
+    monkeypatch.setattr(ml_service, "detect_drift", lambda df: None)
+    monkeypatch.setattr(ml_service, "generate_feature_explanations",
+                        lambda df, scores: [f"score {s:.4f}" for s in scores])
+    monkeypatch.setattr(prediction_orchestrator, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(prediction_orchestrator, "persistence_writer", writer)
+
+    def run(df, filename):
+        # The orchestrator keys its cache on the uploaded file's content
+        df.to_csv(tmp_path / filename, index=False)
+        # Cold cache: an identical file must be scored, not served from an earlier call
+        monkeypatch.setattr(prediction_orchestrator, "cache_service", CacheService(client=None))
+        result = prediction_orchestrator.orchestrate_prediction(df, filename)
+        assert writer.flush()
+        return result
+
+    return run
+
+
+def _leads(n=300):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        "LeadID": [f"L{i}" for i in range(n)],
+        "Source": rng.choice(["Google", "LinkedIn", "Referral"], n),
+        "TimeOnSite": rng.integers(0, 1000, n),
+        "PagesVisited": rng.integers(1, 20, n),
+        "Converted": rng.integers(0, 2, n),
+    })
+    # 0.6994 / 0.2994: round(2) would push these across the High / Medium cut-offs
+    df.loc[0, "TimeOnSite"] = 699
+    df.loc[1, "TimeOnSite"] = 299
+    return df
+
+
+def _stored(db, run_id):
+    leads = db.get_leads_by_run(run_id, include_raw=False)
+    return {lead['lead_id']: (lead['prediction_score'], lead['priority']) for lead in leads}
+
+
+def _by_lead(result):
+    return {str(r['LeadID']): (r['score'], r['priority']) for r in result['results']}
+
+
+def test_incremental_run_matches_full_rescore(db, scoring):
+    base = _leads()
+    scoring(base, "crm.csv")
+
+    changed = base.copy()
+    changed.loc[5, "TimeOnSite"] = (changed.loc[5, "TimeOnSite"] + 500) % 1000
+    incremental = scoring(changed, "crm.csv")
+    full = scoring(changed.copy(), "crm_full.csv")
+
+    assert incremental["incremental"]["rescored_leads"] == 1
+    assert full["incremental"] is None
+
+    assert _by_lead(incremental) == _by_lead(full)
+    assert incremental["distribution"] == full["distribution"]
+    assert incremental["accuracy_metrics"] == full["accuracy_metrics"]
+    assert incremental["top_leads"] == full["top_leads"]
+
+    assert _stored(db, incremental["run_id"]) == _stored(db, full["run_id"])
+    inc_run = db.get_prediction_run(incremental["run_id"])
+    full_run = db.get_prediction_run(full["run_id"])
+    for field in ("high_priority_count", "medium_priority_count", "low_priority_count", "f1_score", "pr_auc"):
+        assert inc_run[field] == full_run[field]
+
+    # The carried lead at 0.6994 stays Medium everywhere
+    assert _stored(db, incremental["run_id"])["L0"][1] == "Medium"
+    assert _by_lead(incremental)["L0"][1] == "Medium"
@@ -0,0 +1,50 @@
+from backend.core import config
+
+
+def _run(db, leads):
+    run_id = db.save_prediction_run("crm.csv", len(leads), 0, 0, 0)
+    conn = db.get_db_connection()
+    with conn:
+        db.insert_leads(conn, [
+            {"run_id": run_id, "lead_data": {"LeadID": lead_id}, "prediction_score": score, "priority": priority}
+            for lead_id, score, priority in leads
+        ])
+    db.update_lead_profiles(run_id)
+    return run_id
+
+
+def test_profile_tracks_latest_score_and_trend(db):
+    first = _run(db, [("A", 0.40, "Medium"), ("B", 0.90, "High")])
+    second = _run(db, [("A", 0.75, "High")])
+
+    profile = db.get_lead_profile("A")
+    assert profile["latest_run_id"] == second and profile["latest_priority"] == "High"
+    assert profile["runs_seen"] == 2
+    assert profile["score_history"] == [{"run_id": first, "score": 0.4}, {"run_id": second, "score": 0.75}]
+    assert profile["trend"] == 0.35
+
+    assert db.get_lead_profile("B")["trend"] is None
+    assert db.get_lead_profile("missing") is None
+    assert [p["lead_id"] for p in db.get_top_lead_profiles()] == ["B", "A"]
+    assert [p["lead_id"] for p in db.get_top_lead_profiles(priority="High", limit=1)] == ["B"]
+
+
+def test_unscored_runs_are_skipped_in_the_trend(db):
+    _run(db, [("A", 0.50, "Medium")])
+    _run(db, [("A", 0.60, "Medium")])
+    _run(db, [("A", None, None)])
+
+    profile = db.get_lead_profile("A")
+    assert [p["score"] for p in profile["score_history"]] == [0.5, 0.6, None]
+    assert profile["trend"] == 0.1
+
+
+def test_history_is_capped_and_older_runs_do_not_overwrite(db):
+    runs = [_run(db, [("A", i / 100, "Low")]) for i in range(config.LEAD_SCORE_HISTORY_LEN + 2)]
+    profile = db.get_lead_profile("A")
+    assert len(profile["score_history"]) == config.LEAD_SCORE_HISTORY_LEN
+    assert profile["score_history"][-1]["run_id"] == runs[-1]
+
+    # Re-folding an older run (e.g. a restored archive) leaves the profile alone
+    db.update_lead_profiles(runs[0])
+    assert db.get_lead_profile("A") == profile
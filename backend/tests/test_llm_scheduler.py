@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from backend.llm.scheduler import BATCH, INTERACTIVE, LLMQueueFull, LLMScheduler, LLMTimeout
+
+
+class _Provider:
+    """Fake provider whose generations block until released"""
+    name = "fake"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.active = 0
+        self.peak = 0
+        self.order = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, timeout=None, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.order.append(prompt)
+        self.started.set()
+        try:
+            if prompt == "hold":
+                self.release.wait(5)
+            return prompt.upper()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _call(scheduler, provider, prompt, priority, errors, **kwargs):
+    def run():
+        try:
+            scheduler.generate(provider, prompt, priority=priority, **kwargs)
+        except Exception as e:
+            errors[prompt] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(scheduler, provider, n):
+    lane = scheduler._lane(provider)
+    for _ in range(500):
+        if lane.get_stats()["queued"] == n:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"expected {n} waiters, have {lane.get_stats()['queued']}")
+
+
+def test_lane_runs_one_generation_at_a_time_in_priority_order():
+    scheduler = LLMScheduler(concurrency={"fake": 1}, max_queue=8)
+    provider, errors = _Provider(), {}
+
+    holder = _call(scheduler, provider, "hold", BATCH, errors)
+    assert provider.started.wait(5)
+    waiters = [_call(scheduler, provider, "batch", BATCH, errors)]
+    _wait_queued(scheduler, provider, 1)
+    waiters.append(_call(scheduler, provider, "chat", INTERACTIVE, errors))
+    _wait_queued(scheduler, provider, 2)
+
+    provider.release.set()
+    for thread in [holder, *waiters]:
+        thread.join(5)
+
+    assert not errors
+    assert provider.peak == 1
+    # The chat request arrived later but jumps the batch one
+    assert provider.order == ["hold", "chat", "batch"]
+    stats = scheduler.get_stats()["providers"]["fake"]
+    assert stats["completed"] == 3 and stats["running"] == 0 and stats["queued"] == 0
+
+
+def test_full_queue_displaces_less_urgent_waiter_and_rejects_otherwise():
+    scheduler = LLMScheduler(concurrency={"fake": 1}, max_queue=1)
+    provider, errors = _Provider(), {}
+
+    holder = _call(scheduler, provider, "hold", BATCH, errors)
+    assert provider.started.wait(5)
+    batch = _call(scheduler, provider, "batch", BATCH, errors)
+    _wait_queued(scheduler, provider, 1)
+
+    chat = _call(scheduler, provider, "chat", INTERACTIVE, errors)
+    batch.join(5)
+    assert isinstance(errors.pop("batch"), LLMQueueFull)
+    _wait_queued(scheduler, provider, 1)
+
+    with pytest.raises(LLMQueueFull):
+        scheduler.generate(provider, "late", priority=BATCH)
+
+    provider.release.set()
+    holder.join(5)
+    chat.join(5)
+    assert not errors
+    assert provider.order == ["hold", "chat"]
+    stats = scheduler.get_stats()["providers"]["fake"]
+    assert stats["displaced"] == 1 and stats["rejected"] == 1
+
+
+def test_deadline_covers_queueing_and_generation():
+    scheduler = LLMScheduler(concurrency={"fake": 1}, max_queue=4)
+    provider, errors = _Provider(), {}
+
+    holder = _call(scheduler, provider, "hold", BATCH, errors)
+    assert provider.started.wait(5)
+    with pytest.raises(LLMTimeout):
+        scheduler.generate(provider, "chat", priority=INTERACTIVE, timeout=0.05)
+
+    # A generation that overruns is abandoned, but keeps its slot until it returns
+    slow = _Provider()
+    slow.name = "slow"
+    with pytest.raises(LLMTimeout):
+        scheduler.generate(slow, "hold", timeout=0.05)
+    assert scheduler.get_stats()["providers"]["slow"]["running"] == 1
+
+    provider.release.set()
+    slow.release.set()
+    holder.join(5)
+    scheduler._lane(slow).executor.shutdown(wait=True)
+    assert not errors
+    stats = scheduler.get_stats()["providers"]
+    assert stats["fake"]["queue_timeouts"] == 1 and stats["fake"]["queued"] == 0
+    assert stats["slow"]["generation_timeouts"] == 1 and stats["slow"]["running"] == 0
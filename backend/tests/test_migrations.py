@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+from backend.core.migrations import LATEST_VERSION, _columns, get_schema_version, migrate
+
+
+def _connect(path):
+    return sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+
+
+def test_fresh_database_reaches_latest_and_rerun_is_a_noop(tmp_path):
+    conn = _connect(tmp_path / "leads.db")
+    assert migrate(conn) == LATEST_VERSION
+    schema = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+
+    assert migrate(conn) == LATEST_VERSION
+    assert conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall() == schema
+    assert {'persist_status', 'payload_path', 'top_leads'} <= _columns(conn, 'prediction_runs')
+
+
+def test_migrates_step_by_step_and_upgrades_legacy_tables(tmp_path):
+    conn = _connect(tmp_path / "leads.db")
+    # A database from before migrate_db.py: leads without run_id / priority / raw_data
+    conn.execute("""
+        CREATE TABLE leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, lead_id TEXT, source TEXT, time_on_site INTEGER,
+            pages_visited INTEGER, email_opened INTEGER, meeting_booked INTEGER, converted INTEGER,
+            prediction_score REAL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("INSERT INTO leads (lead_id, prediction_score) VALUES ('L1', 0.5)")
+    conn.commit()
+
+    assert migrate(conn, target_version=1) == 1
+    assert {'run_id', 'priority', 'raw_data'} <= _columns(conn, 'leads')
+    assert 'top_leads' not in _columns(conn, 'prediction_runs')
+
+    assert migrate(conn) == LATEST_VERSION
+    assert conn.execute("SELECT lead_id, prediction_score FROM leads").fetchall() == [('L1', 0.5)]
+
+
+def test_concurrent_workers_apply_each_step_once(tmp_path):
+    path = tmp_path / "leads.db"
+    results, errors = [], []
+    start = threading.Barrier(4)
+
+    def worker():
+        conn = _connect(path)
+        try:
+            start.wait()
+            results.append(migrate(conn))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert not errors
+    assert results == [LATEST_VERSION] * 4
+    assert get_schema_version(_connect(path)) == LATEST_VERSION
@@ -0,0 +1,73 @@
+import os
+
+from backend.core import run_store
+from backend.services.persistence_service import PersistenceWriter
+
+
+def _leads(n, bad_at=None):
+    return [
+        {"lead_data": {"LeadID": f"L{i}", "Source": "Google"},
+         # sqlite3 can't bind an object(): makes the chunk holding it fail
+         "prediction_score": object() if i == bad_at else 0.5, "priority": "Medium"}
+        for i in range(n)
+    ]
+
+
+def _run(db):
+    return db.save_prediction_run("crm.csv", 0, 0, 0, 0, persist_status="pending")
+
+
+def _write(writer, batches):
+    # Queue everything before the thread starts, so it all lands in one group
+    start = writer.start
+    writer.start = lambda: None
+    for run_id, leads in batches:
+        writer.enqueue(run_id, leads)
+    writer.start = start
+    writer.start()
+    assert writer.flush()
+
+
+def test_runs_are_written_and_completed(db):
+    writer = PersistenceWriter(chunk_rows=2)
+    try:
+        run_id, empty = _run(db), _run(db)
+        _write(writer, [(run_id, _leads(5)), (empty, [])])
+        assert db.get_prediction_run(run_id)['persist_status'] == "complete"
+        assert db.get_prediction_run(empty)['persist_status'] == "complete"
+        assert len(db.get_leads_by_run(run_id)) == 5
+        assert writer.stats["rows_written"] == 5
+    finally:
+        writer.stop()
+
+
+def test_bad_run_does_not_fail_its_group(db):
+    writer = PersistenceWriter(chunk_rows=2)
+    try:
+        bad, good = _run(db), _run(db)
+        _write(writer, [(bad, _leads(5, bad_at=4)), (good, _leads(3))])
+
+        assert db.get_prediction_run(good)['persist_status'] == "complete"
+        assert len(db.get_leads_by_run(good)) == 3
+        assert db.get_prediction_run(bad)['persist_status'] == "failed"
+        assert db.get_leads_by_run(bad) == []
+    finally:
+        writer.stop()
+
+
+def test_failed_run_drops_committed_chunks_and_payload(db):
+    # One chunk per transaction: the run's first chunks commit before the bad one
+    writer = PersistenceWriter(chunk_rows=2, group_rows=2)
+    try:
+        bad, later = _run(db), _run(db)
+        _write(writer, [(bad, _leads(7, bad_at=3)), (later, _leads(2))])
+
+        run = db.get_prediction_run(bad)
+        assert run['persist_status'] == "failed"
+        assert run['payload_path'] is None
+        assert db.get_leads_by_run(bad) == []
+        assert not os.path.exists(run_store.run_payload_path(bad))
+        assert db.get_prediction_run(later)['persist_status'] == "complete"
+        assert writer.get_status(bad) is None
+    finally:
+        writer.stop()
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from backend.services.profiling_service import sample_frame, numeric_summary, top_categories, top_correlated_pairs
+
+
+def test_top_categories_counts_text_columns():
+    df = pd.DataFrame({
+        "Source": pd.array(["Google"] * 6 + ["Email"] * 3 + ["Referral"], dtype="string"),
+        "Legacy": pd.Series(["a", "b"] * 5, dtype=object),
+        "filename": ["f.csv"] * 10,
+        "Pages": range(10),
+    })
+    categories = top_categories(df, total_rows=len(df), k=2)
+    assert categories == {"Source": {"Google": 6, "Email": 3}, "Legacy": {"a": 5, "b": 5}}
+
+
+def test_sampled_counts_are_scaled_to_the_full_frame():
+    df = pd.DataFrame({"Source": ["Google", "Email"] * 5})
+    categories = top_categories(df.iloc[:4], total_rows=len(df))
+    assert categories == {"Source": {"Google": 5, "Email": 5}}
+
+
+def test_correlated_pairs_and_summary():
+    rng = np.random.default_rng(1)
+    x = rng.random(500)
+    df = pd.DataFrame({"x": x, "y": 2 * x + rng.normal(0, 0.01, 500), "noise": rng.random(500)})
+    pairs = top_correlated_pairs(df)
+    assert [(a, b) for a, b, _ in pairs] == [("x", "y")]
+
+    sample, sampled = sample_frame(df)
+    assert not sampled and len(sample) == 500
+    summary = numeric_summary(df)
+    assert summary.loc["mean", "x"] == df["x"].mean()
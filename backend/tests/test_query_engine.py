@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.query_engine import QueryEngine
+
+
+@pytest.fixture(scope="module")
+def scored():
+    rng = np.random.default_rng(7)
+    n = 2000
+    df = pd.DataFrame({
+        "LeadID": np.arange(n),
+        "Source": rng.choice(["Google", "LinkedIn", "Referral", "Email"], n),
+        "priority": rng.choice(["High", "Medium", "Low"], n),
+        "prediction_score": rng.random(n).round(4),
+        "TimeOnSite": rng.integers(0, 900, n),
+        "PagesVisited": rng.integers(1, 20, n),
+        "MeetingBooked": rng.integers(0, 2, n),
+        "Converted": rng.integers(0, 2, n),
+        "EmailOpened": rng.integers(0, 2, n),
+    })
+    engine = QueryEngine()
+    return engine, *engine._prepare(df)
+
+
+def ask(scored, question):
+    engine, df, meta = scored
+    plan = engine.parse(question, df, meta)
+    return None if plan is None else engine.execute(plan, df, meta)
+
+
+@pytest.mark.parametrize("question", [
+    # Negation / exclusion would otherwise be applied as the positive filter
+    "how many leads are not high priority?",
+    "how many leads are not from google?",
+    "how many leads excluding google?",
+    "how many leads other than google?",
+    "how many leads except referral?",
+    "how many leads without a meeting?",
+    "how many leads have no meeting booked",
+    "how many non high priority leads?",
+    # Qualifiers no filter understands
+    "how many leads in the US?",
+    "how many leads called twice",
+    "how many leads last week",
+    "how many leads in 2023?",
+    "how many leads visited more pages",
+    # Two groups asked for side by side
+    "average score of high priority leads compared to low",
+    "conversion rate google vs linkedin",
+    # Rank questions about individual leads
+    "which leads are most likely to convert?",
+])
+def test_unresolved_questions_go_to_the_llm(scored, question):
+    assert ask(scored, question) is None
+
+
+def test_count_with_categorical_filters(scored):
+    _, df, _ = scored
+    expected = ((df.priority == "High") & (df.Source == "Google")).sum()
+    assert f"**{expected:,}** leads match" in ask(scored, "How many high-priority leads came from Google?")
+
+
+def test_numeric_comparison(scored):
+    _, df, _ = scored
+    assert f"**{(df.PagesVisited > 10).sum():,}**" in ask(scored, "how many leads visited more than 10 pages?")
+    assert f"**{(df.PagesVisited <= 5).sum():,}**" in ask(scored, "how many leads with no more than 5 pages")
+
+
+def test_conversion_filters(scored):
+    _, df, _ = scored
+    assert f"**{(df.Converted == 0).sum():,}**" in ask(scored, "how many leads didn't convert?")
+    assert f"**{(df.Converted == 1).sum():,}**" in ask(scored, "how many converted leads are there")
+
+
+@pytest.mark.parametrize("question", [
+    "how many leads booked meetings",
+    "how many leads booked a meeting?",
+    "how many leads have a meeting booked",
+    "how many leads had meetings",
+])
+def test_meeting_flag(scored, question):
+    _, df, _ = scored
+    assert f"**{(df.MeetingBooked == 1).sum():,}** leads match (MeetingBooked = yes)" in ask(scored, question)
+
+
+def test_flags_combine_with_other_filters(scored):
+    _, df, _ = scored
+    expected = ((df.EmailOpened == 1) & (df.Source == "Google")).sum()
+    assert f"**{expected:,}**" in ask(scored, "how many leads from google opened the email")
+    rate = df.loc[df.MeetingBooked == 1, "Converted"].mean() * 100
+    assert f"**{rate:.1f}%**" in ask(scored, "conversion rate for leads with a meeting booked")
+
+
+def test_text_conversion_column():
+    df = pd.DataFrame({
+        "Source": ["Google", "Google", "Email", "Email"],
+        "Converted": pd.array(["yes", "no", "yes", "yes"], dtype="string"),
+    })
+    engine = QueryEngine()
+    df, meta = engine._prepare(df)
+    plan = engine.parse("conversion rate for google", df, meta)
+    assert "**50.0%**" in engine.execute(plan, df, meta)
+
+
+def test_aggregate_with_filter(scored):
+    _, df, _ = scored
+    expected = df.loc[df.Converted == 1, "TimeOnSite"].mean()
+    assert f"**{expected:,.2f}**" in ask(scored, "average time on site for converted leads")
+
+
+def test_group_by(scored):
+    answer = ask(scored, "conversion rate by source")
+    assert answer.startswith("Conversion rate by Source")
+    for source in ("Google", "LinkedIn", "Referral", "Email"):
+        assert f"| {source} |" in answer
+
+
+def test_most_leads_by_group(scored):
+    _, df, _ = scored
+    winner = df.Source.value_counts().idxmax()
+    assert ask(scored, "which source has the most leads?").startswith(f"**{winner}**")
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from backend.cache import redis_client as redis_module
+from backend.cache.redis_client import RedisClient
+
+
+class Down(Exception):
+    pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(redis_module, "REDIS_AVAILABLE", True)
+    client = RedisClient(backoff_base=0.05, backoff_max=0.2)
+    # No real connection: the breaker only cares whether fn raises
+    monkeypatch.setattr(client, "_get_client", lambda: object())
+    return client
+
+
+def fail(_):
+    raise Down("Connection refused")
+
+
+def test_failure_opens_the_circuit(client):
+    assert client.execute(fail, default="fallback") == "fallback"
+    assert client.get_stats()["state"] == "open"
+
+    calls = []
+    assert client.execute(lambda r: calls.append(1), default="fallback") == "fallback"
+    assert calls == []                                   # short-circuited, no network
+    assert client.stats["short_circuited"] == 1
+    assert not client.healthy
+
+
+def test_probe_after_backoff_closes_the_circuit(client):
+    client.execute(fail)
+    time.sleep(0.06)
+    assert client.available()                            # the single half-open probe
+    assert not client.available()                        # nobody else while it's out
+    client._record_success(0.001)
+    assert client.healthy
+    assert client.execute(lambda r: "ok") == "ok"
+
+
+def test_failed_probes_back_off_exponentially_up_to_the_cap(client):
+    for failures in range(1, 6):
+        client.execute(fail)
+        expected = min(0.05 * 2 ** (failures - 1), 0.2)
+        assert client.get_stats()["consecutive_failures"] == failures
+        assert client._retry_at - time.monotonic() == pytest.approx(expected, abs=0.02)
+        client._retry_at = 0                             # let the next probe through now
+    assert client.stats["circuit_opened"] == 1           # one outage, logged once
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import pytest
+
+from backend.services import retention_service as retention_module
+from backend.services.retention_service import RetentionService
+
+
+@pytest.fixture
+def retention(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention_module, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    return RetentionService()
+
+
+def _run(db, n=5):
+    run_id = db.save_prediction_run("crm.csv", n, 0, 0, n)
+    conn = db.get_db_connection()
+    with conn:
+        db.insert_leads(conn, [
+            {"run_id": run_id, "lead_data": {"LeadID": f"L{i}", "Source": "Google", "Pages": i},
+             "prediction_score": i / 10 + 0.0123, "priority": "Low", "explanation": f"why L{i}",
+             "row_hash": -(2 ** 62) + i, "row_idx": i}
+            for i in range(n)
+        ])
+    return run_id
+
+
+def _rows(db, run_id):
+    return {lead['lead_id']: (lead['prediction_score'], lead['priority'], lead['explanation'], lead['row_hash'],
+                              lead['raw_data'])
+            for lead in db.get_leads_by_run(run_id)}
+
+
+def test_archive_restore_round_trip(db, retention):
+    run_id = _run(db)
+    before = _rows(db, run_id)
+    hashes = db.get_run_row_hashes(run_id)
+
+    path = retention.archive_run(run_id)
+    assert db.get_prediction_run(run_id)['archived_at']
+    assert db.get_leads_by_run(run_id) == []
+    with gzip.open(path, "rt") as f:
+        assert json.loads(f.readline())["run"]["run_id"] == run_id
+
+    assert retention.restore_run(run_id) == 5
+    assert not db.get_prediction_run(run_id)['archived_at']
+    assert _rows(db, run_id) == before
+    # Still a usable base for an incremental run
+    assert db.get_run_row_hashes(run_id) == hashes
+
+
+def test_policy_keeps_the_newest_runs(db, retention):
+    runs = [_run(db, n=1) for _ in range(4)]
+    retention.max_runs = 2
+    assert retention.select_runs_to_archive() == runs[:2]
+
+    retention.max_runs = 0
+    assert retention.select_runs_to_archive() == []
@@ -0,0 +1,45 @@
+def _run(db, leads):
+    run_id = db.save_prediction_run("crm.csv", len(leads), 0, 0, 0)
+    conn = db.get_db_connection()
+    with conn:
+        db.insert_leads(conn, [
+            {"run_id": run_id, "lead_data": {"LeadID": lead_id}, "prediction_score": score, "priority": priority}
+            for lead_id, score, priority in leads
+        ])
+    return run_id
+
+
+def _statuses(db, base, other, **kwargs):
+    changes, summary = db.compare_runs(base, other, sort="lead_id", **kwargs)
+    return {c['lead_id']: c['status'] for c in changes}, summary
+
+
+def test_compare_statuses(db):
+    base = _run(db, [("A", 0.9, "High"), ("B", 0.5, "Medium"), ("C", 0.2, "Low"), ("D", 0.4, "Medium")])
+    other = _run(db, [("A", 0.9, "High"), ("B", 0.8, "High"), ("C", 0.1, "Low"), ("E", 0.6, "Medium")])
+
+    statuses, summary = _statuses(db, base, other)
+    assert statuses == {"A": "unchanged", "B": "changed", "C": "changed", "D": "vanished", "E": "new"}
+    assert summary["priority_migrations"] == {"Medium->High": 1}
+
+    changes, _ = db.compare_runs(base, other, sort="abs_delta", limit=1)
+    assert changes[0]['lead_id'] == "B" and round(changes[0]['delta'], 6) == 0.3
+
+
+def test_null_score_is_not_new_or_vanished(db):
+    base = _run(db, [("A", None, None), ("B", 0.5, "Medium"), ("C", None, None)])
+    other = _run(db, [("A", 0.7, "High"), ("B", None, None), ("C", None, None)])
+
+    statuses, summary = _statuses(db, base, other)
+    assert statuses == {"A": "changed", "B": "changed", "C": "unchanged"}
+    assert summary["new"] == 0 and summary["vanished"] == 0
+
+
+def test_duplicate_lead_uses_its_first_row(db):
+    base = _run(db, [("A", 0.5, "Medium")])
+    other = _run(db, [("A", 0.9, "High"), ("A", 0.1, "Low")])
+
+    changes, summary = db.compare_runs(base, other)
+    assert len(changes) == 1
+    assert (changes[0]['new_score'], changes[0]['new_priority']) == (0.9, "High")
+    assert summary["priority_migrations"] == {"Medium->High": 1}
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from backend.core import run_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_store, "RUN_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(run_store, "ROW_GROUP_ROWS", 7)
+    return run_store
+
+
+def _rows(n):
+    return [{"LeadID": f"L{i}", "Source": ["Google", "Email"][i % 2], "TimeOnSite": i * 10} for i in range(n)]
+
+
+def test_paged_reads_span_row_groups_in_the_order_given(store):
+    rows = _rows(30)
+    path = store.write_run_payload(1, rows)
+    assert store.read_run_payload(path) == rows
+
+    indices = [29, 0, 6, 7, 15, 14]   # across four groups of 7, out of order
+    assert store.read_run_payload(path, indices) == [rows[i] for i in indices]
+    assert store.read_run_payload(path, []) == []
+
+
+def test_blank_and_mixed_values_survive(store):
+    rows = [
+        {"LeadID": "L0", "Score": 3, "Note": 1},
+        {"LeadID": "L1", "Score": "", "Note": "text"},   # fillna("") blank in a numeric column
+        {"LeadID": "L2", "Extra": "only here"},
+    ]
+    path = store.write_run_payload(2, rows)
+    back = store.read_run_payload(path)
+
+    assert [r["Score"] for r in back] == [3, None, None]
+    assert [r["Note"] for r in back] == ["1", "text", None]
+    assert back[2]["Extra"] == "only here" and back[0]["Extra"] is None
+
+
+def test_delete_run_payload(store):
+    path = store.write_run_payload(3, _rows(3))
+    assert os.path.exists(path) and not os.path.exists(path + ".tmp")
+    store.delete_run_payload(path)
+    store.delete_run_payload(path)   # already gone
+    store.delete_run_payload(None)
+    assert not os.path.exists(path)
@@ -0,0 +1,40 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import search
+
+
+def _seed(db):
+    run_id = db.save_prediction_run("crm.csv", 3, 0, 0, 0)
+    conn = db.get_db_connection()
+    with conn:
+        db.insert_leads(conn, [
+            {"run_id": run_id, "lead_data": {"LeadID": f"ACME-{i}", "Source": "Google", "Company": f"Acme {i}"},
+             "prediction_score": i / 10, "priority": "Low"}
+            for i in range(5)
+        ] + [
+            {"run_id": run_id, "lead_data": {"LeadID": "GLOBEX-1", "Source": "LinkedIn", "Company": "Globex"},
+             "prediction_score": 0.9, "priority": "High"}
+        ])
+
+
+def test_search_pages_with_next_offset(db):
+    _seed(db)
+    app = FastAPI()
+    app.include_router(search.router)
+    client = TestClient(app)
+
+    first = client.get("/search", params={"q": "acme", "limit": 3}).json()
+    assert len(first["results"]) == 3 and first["next_offset"] == 3
+    second = client.get("/search", params={"q": "acme", "limit": 3, "offset": first["next_offset"]}).json()
+    assert len(second["results"]) == 2 and second["next_offset"] is None
+
+    ids = {r["lead_id"] for r in first["results"] + second["results"]}
+    assert ids == {f"ACME-{i}" for i in range(5)}
+
+
+def test_search_prefix_and_literal_operators(db):
+    _seed(db)
+    assert [r["lead_id"] for r in db.search_leads("glob")] == ["GLOBEX-1"]
+    # FTS5 syntax in user input is matched literally, not parsed
+    assert db.search_leads('globex" OR "acme') == []
@@ -12,6 +12,9 @@ import HistoryPage from './pages/HistoryPage';
 import { useLeads } from './hooks/useLeads';
 import client from './api/client';
 
+// Leads per history request: the first page shows immediately, the rest streams in
+const HISTORY_PAGE_SIZE = 1000;
+
 function App() {
   const [view, setView] = useState('home');
   const [isMobileOpen, setIsMobileOpen] = useState(false);
@@ -50,6 +53,8 @@ function App() {
   // Cache for history details to avoid re-fetching
   const historyCache = useRef({});
   const [loadingHistoryId, setLoadingHistoryId] = useState(null);
+  // Run whose pages are being streamed in; a click on another run stops the stream
+  const activeHistoryId = useRef(null);
 
   // Load history for charts on mount
   useEffect(() => {
@@ -64,42 +69,84 @@ function App() {
 
   // handleSearch removed
 
+  // Summary rows (no raw CSV fields), one keyset page at a time
+  const fetchHistoryPage = (runId, cursor) => client.get(`/prediction-history/${runId}`, {
+    params: { limit: HISTORY_PAGE_SIZE, include_raw: false, cursor }
+  });
+
   const handleHistoryClick = async (runId) => {
+    activeHistoryId.current = runId;
     if (historyCache.current[runId]) {
       const data = historyCache.current[runId];
       updateStateFromHistory(data);
+      if (data.next_cursor) loadRemainingPages(runId, data);
       return;
     }
 
     setLoadingHistoryId(runId);
+    let restored = false;
     try {
-      const res = await client.get(`/prediction-history/${runId}`);
+      let res;
+      try {
+        res = await fetchHistoryPage(runId);
+      } catch (err) {
+        // 409: the run's leads were moved to the archive by the retention policy
+        if (err.response?.status !== 409) throw err;
+        if (!window.confirm("This run has been archived. Restore it now? Large runs can take a moment.")) return false;
+        await client.post(`/prediction-history/${runId}/restore`);
+        restored = true;
+        res = await fetchHistoryPage(runId);
+      }
       const data = res.data;
 
       // Cache it
       historyCache.current[runId] = data;
 
+      // First page renders now; the rest is appended as it arrives
       updateStateFromHistory(data);
+      if (data.next_cursor) loadRemainingPages(runId, data);
     } catch (err) {
       console.error(err);
       // Could show a toast here
     } finally {
       setLoadingHistoryId(null);
     }
+    return restored;
   };
 
-  const updateStateFromHistory = (data) => {
-    const leads = data.results;
-    const high = leads.filter(l => l.priority === 'High');
+  const loadRemainingPages = async (runId, data) => {
+    if (data.streaming) return; // already being fetched (run clicked again)
+    data.streaming = true;
+    try {
+      while (data.next_cursor && activeHistoryId.current === runId) {
+        const res = await fetchHistoryPage(runId, data.next_cursor);
+        data.results = [...data.results, ...res.data.results];
+        data.next_cursor = res.data.next_cursor;
+        if (activeHistoryId.current === runId) setLeadsFromHistory(data.results);
+      }
+    } catch (err) {
+      console.error(err);
+    } finally {
+      data.streaming = false;
+    }
+  };
 
+  const setLeadsFromHistory = (leads) => {
     setAllLeads(leads);
-    setHighPriorityLeads(high);
+    setHighPriorityLeads(leads.filter(l => l.priority === 'High'));
+  };
+
+  const updateStateFromHistory = (data) => {
+    const counts = data.distribution;
+
+    setLeadsFromHistory(data.results);
     setCurrentFilename(data.filename);
+    // Whole-run counts from the run record, not just the pages loaded so far
     setMetrics({
-      total: leads.length,
-      high: high.length,
-      medium: leads.filter(l => l.priority === 'Medium').length,
-      low: leads.filter(l => l.priority === 'Low').length,
+      total: data.total_leads ?? data.results.length,
+      high: counts.High,
+      medium: counts.Medium,
+      low: counts.Low,
       accuracy: data.accuracy_metrics
     });
 
@@ -107,6 +154,7 @@ function App() {
   };
 
   const onAnalyzeWrapper = async () => {
+    activeHistoryId.current = null; // a fresh analysis replaces any run being streamed in
     const success = await analyzeLeads();
     if (success) {
       // refreshNotifications removed
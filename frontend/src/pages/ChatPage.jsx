@@ -1,6 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Bot, Send } from 'lucide-react';
-import client from '../api/client';
+import { API_URL } from '../api/client';
 import { cn } from '../lib/utils';
 
 const ChatPage = ({ metrics, filename, chatMessages, setChatMessages }) => {
@@ -23,12 +23,45 @@ const ChatPage = ({ metrics, filename, chatMessages, setChatMessages }) => {
 
         try {
             const context = `Total: ${metrics?.total}, High Prio: ${metrics?.high}`;
-            const res = await client.post(`/chat`, {
-                message: msg,
-                context,
-                filename: filename
+            // Server-sent events: render the answer as it is generated
+            const res = await fetch(`${API_URL}/chat/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: msg, context, filename })
             });
-            setChatMessages(prev => [...prev, { role: 'assistant', content: res.data.response }]);
+            if (!res.ok || !res.body) throw new Error(`Chat stream failed: ${res.status}`);
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let started = false;
+            const appendToken = (token) => {
+                if (!started) {
+                    started = true;
+                    setIsChatLoading(false);
+                    setChatMessages(prev => [...prev, { role: 'assistant', content: token }]);
+                    return;
+                }
+                setChatMessages(prev => {
+                    const last = prev[prev.length - 1];
+                    return [...prev.slice(0, -1), { ...last, content: last.content + token }];
+                });
+            };
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const event of events) {
+                    const data = event.split('\n').find(line => line.startsWith('data: '));
+                    if (event.startsWith('event: token') && data) {
+                        appendToken(JSON.parse(data.slice(6)).token);
+                    }
+                }
+            }
+            if (!started) throw new Error('Empty chat stream');
         } catch (err) {
             setChatMessages(prev => [...prev, { role: 'assistant', content: "Connection error. Please try again." }]);
         } finally {
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import client from '../api/client';
-import { Clock, FileText, ChevronRight, Loader2 } from 'lucide-react';
+import { Clock, FileText, ChevronRight, Loader2, Archive } from 'lucide-react';
 
 const HistoryPage = ({ setView, handleHistoryClick, loadingHistoryId }) => {
     const [history, setHistory] = useState([]);
@@ -20,6 +20,13 @@ const HistoryPage = ({ setView, handleHistoryClick, loadingHistoryId }) => {
     // We can add caching here or in a hook later.
     // For now, implementing the UI.
 
+    const openRun = async (runId) => {
+        const restored = await handleHistoryClick(runId);
+        if (restored) {
+            setHistory((runs) => runs.map((r) => (r.run_id === runId ? { ...r, archived_at: null } : r)));
+        }
+    };
+
     return (
         <div className="max-w-4xl mx-auto space-y-6">
             <div className="flex items-center justify-between">
@@ -40,7 +47,7 @@ const HistoryPage = ({ setView, handleHistoryClick, loadingHistoryId }) => {
                         return (
                             <div
                                 key={run.run_id}
-                                onClick={() => !isLoading && handleHistoryClick(run.run_id)}
+                                onClick={() => !isLoading && openRun(run.run_id)}
                                 className={`bg-white p-6 rounded-xl border border-slate-200 hover:shadow-md transition-shadow cursor-pointer flex items-center justify-between group ${isLoading ? 'opacity-70 pointer-events-none' : ''}`}
                             >
                                 <div className="flex items-center gap-4">
@@ -50,6 +57,11 @@ const HistoryPage = ({ setView, handleHistoryClick, loadingHistoryId }) => {
                                     <div>
                                         <h4 className="font-bold text-slate-800">{run.filename}</h4>
                                         <p className="text-xs text-slate-500">{new Date(run.timestamp).toLocaleString()}</p>
+                                        {run.archived_at && (
+                                            <span className="inline-flex items-center gap-1 mt-1 text-xs font-medium text-amber-700 bg-amber-50 px-2 py-0.5 rounded" title="Leads are archived; opening the run restores them">
+                                                <Archive size={12} /> Archived
+                                            </span>
+                                        )}
                                     </div>
                                 </div>
 
@@ -65,7 +77,7 @@ const HistoryPage = ({ setView, handleHistoryClick, loadingHistoryId }) => {
                                     <button
                                         onClick={(e) => {
                                             e.stopPropagation();
-                                            if (!isLoading) handleHistoryClick(run.run_id);
+                                            if (!isLoading) openRun(run.run_id);
                                         }}
                                         disabled={isLoading}
                                         className="p-2 hover:bg-slate-100 rounded-full transition-colors"
@@ -8,6 +8,8 @@ const SearchPage = ({ searchQuery }) => {
     const [searchResults, setSearchResults] = useState([]);
     const [loading, setLoading] = useState(false);
     const [touched, setTouched] = useState(false);
+    const [nextOffset, setNextOffset] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     // Effect to trigger search when query changes (or could be prop based)
     React.useEffect(() => {
@@ -16,8 +18,9 @@ const SearchPage = ({ searchQuery }) => {
             setLoading(true);
             setTouched(true);
             try {
-                const res = await client.get(`/search?q=${searchQuery}`);
+                const res = await client.get('/search', { params: { q: searchQuery } });
                 setSearchResults(res.data.results);
+                setNextOffset(res.data.next_offset);
             } catch (e) {
                 console.error(e);
             } finally {
@@ -29,6 +32,19 @@ const SearchPage = ({ searchQuery }) => {
         return () => clearTimeout(handler);
     }, [searchQuery]);
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const res = await client.get('/search', { params: { q: searchQuery, offset: nextOffset } });
+            setSearchResults(prev => [...prev, ...res.data.results]);
+            setNextOffset(res.data.next_offset);
+        } catch (e) {
+            console.error(e);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
 
     return (
         <div className="max-w-7xl mx-auto space-y-6">
@@ -82,6 +98,17 @@ const SearchPage = ({ searchQuery }) => {
                             </tbody>
                         </table>
                     </div>
+                    {nextOffset !== null && (
+                        <div className="p-4 border-t border-slate-100 text-center">
+                            <button
+                                onClick={loadMore}
+                                disabled={loadingMore}
+                                className="text-sm font-medium text-primary-600 hover:text-primary-700 disabled:opacity-50"
+                            >
+                                {loadingMore ? 'Loading...' : 'Load more'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
         </div>
@@ -1,41 +1,38 @@
+import argparse
 import sqlite3
+import sys
+
+# Schema changes now live in backend/core/migrations.py; this script just applies them.
+from backend.core.migrations import migrate, get_schema_version, LATEST_VERSION, MIGRATIONS
+
+parser = argparse.ArgumentParser(description="Apply pending schema migrations to the leads database.")
+parser.add_argument('--db', help="Database path (default: backend/data/leads.db)")
+parser.add_argument('--status', action='store_true', help="Only show the current schema version")
+args = parser.parse_args()
+
+if args.db:
+    db_path = args.db
+else:
+    # Not backend.core.database: importing it runs every pending migration
+    from backend.core.config import DB_PATH as db_path
+
+conn = sqlite3.connect(db_path)
+current = get_schema_version(conn)
+print(f'Database: {db_path}')
+print(f'Schema version: {current} (latest: {LATEST_VERSION})')
+
+if args.status:
+    for version, description, _ in MIGRATIONS:
+        mark = '✓' if version <= current else ' '
+        print(f'  [{mark}] {version}: {description}')
+    conn.close()
+    sys.exit(0)
 
-# Connect to the database
-conn = sqlite3.connect('leads.db')
-cursor = conn.cursor()
-
-print('Adding missing columns to leads table...')
-
-# Add missing columns to leads table
 try:
-    cursor.execute('ALTER TABLE leads ADD COLUMN run_id INTEGER')
-    print('✓ Added run_id column')
-except sqlite3.OperationalError as e:
-    print(f'  run_id: {e}')
-
-try:
-    cursor.execute('ALTER TABLE leads ADD COLUMN priority TEXT')
-    print('✓ Added priority column')
-except sqlite3.OperationalError as e:
-    print(f'  priority: {e}')
-
-try:
-    cursor.execute('ALTER TABLE leads ADD COLUMN raw_data TEXT')
-    print('✓ Added raw_data column')
-except sqlite3.OperationalError as e:
-    print(f'  raw_data: {e}')
-
-conn.commit()
-conn.close()
-
-print('\n✓ Database migration complete!')
-print('\nVerifying columns...')
+    new_version = migrate(conn)
+except sqlite3.Error:
+    conn.close()
+    sys.exit(1)
 
-# Verify
-conn = sqlite3.connect('leads.db')
-cursor = conn.cursor()
-cursor.execute('PRAGMA table_info(leads)')
-print('\nLeads table columns:')
-for row in cursor.fetchall():
-    print(f'  • {row[1]} ({row[2]})')
 conn.close()
+print(f'\n✓ Database at schema version {new_version}')